@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import resource
+import subprocess
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import settings
+from settings import logger
+
+# Summaries shipped with the repository, used when PDF_DIR is not mounted
+REPO_PDF_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Data", "Summary_docs"))
+
+
+def _digest(text: str) -> int:
+    """Stable hash of a string, unlike hash() it does not change between runs"""
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+@dataclass
+class OfflineResponse:
+    """Same fields as LLM.LLMResponse without importing gpt4all"""
+    success: bool
+    data: Union[str, List[str], None]
+    error: Optional[str] = None
+    error_type: Optional[str] = None
+
+
+class OfflineLLM:
+    """Deterministic stand-in for LLM.LLM, keeps the first distinct keywords"""
+
+    def keyword_completion(self, keywords: List[str]) -> OfflineResponse:
+        unique = list(dict.fromkeys(k.strip() for k in keywords if k.strip()))
+        return OfflineResponse(success=True, data=unique[:settings.NUMBER_OF_KEYWORDS])
+
+
+class OfflineBrowser:
+    """Deterministic stand-in for Browsing.browser, no Selenium or Google search"""
+
+    PAGES = [
+        "This paper studies adversarial examples against medical image classifiers.",
+        "We present a data poisoning attack applied at training time.",
+        "A survey of deep learning in radiology without any security discussion.",
+    ]
+
+    def check_desc(self, query: str) -> bool:
+        return _digest(query) % 2 == 0
+
+    def check_link(self, url: str) -> bool:
+        return True
+
+    def get_page(self, url: str) -> str:
+        return self.PAGES[_digest(url) % len(self.PAGES)]
+
+
+class OfflineScraper:
+    """Deterministic stand-in for Scholar_scraper.scholarly_scraper, no Google Scholar"""
+
+    def get_info(self, query: str) -> List[List[str]]:
+        seed = _digest(query)
+        return [
+            [f"Paper {seed % 1000}-{i} on {query}", f"Abstract of paper {i} about {query}",
+             f"https://papers.example/{seed}/{i}"]
+            for i in range(settings.NUMBER_OF_PAPERS)
+        ]
+
+
+class StageTimer:
+    """Accumulates wall time and call counts of wrapped functions by stage name"""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.paragraphs = 0
+
+    def wrap(self, stage: str, function: Callable) -> Callable:
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.seconds[stage] = self.seconds.get(stage, 0.0) + time.perf_counter() - start
+                self.calls[stage] = self.calls.get(stage, 0) + 1
+        return timed
+
+    def wrap_iterator(self, stage: str, function: Callable) -> Callable:
+        """Like wrap for functions returning iterators, the time spent producing each item is counted on
+        whichever thread consumes them"""
+        def timed(*args, **kwargs):
+            items = iter(function(*args, **kwargs))
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(items)
+                except StopIteration:
+                    return
+                finally:
+                    self.seconds[stage] = self.seconds.get(stage, 0.0) + time.perf_counter() - start
+                yield item
+        return timed
+
+    def reset(self) -> None:
+        self.seconds = {}
+        self.calls = {}
+        self.paragraphs = 0
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+
+
+def git_commit() -> str:
+    """Commit of the working tree the benchmark runs on"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def list_pdfs(pdf_dir: str, limit: int = 0) -> List[str]:
+    """Submission numbers of the PDFs in a directory"""
+    ids = sorted(f[:-4] for f in os.listdir(pdf_dir) if f.lower().endswith(".pdf"))
+    return ids[:limit] if limit > 0 else ids
+
+
+def benchmark_pipeline(args: argparse.Namespace) -> Dict[str, Any]:
+    """Runs Levels 1 to 4 over the summaries with offline stand-ins and reports timings"""
+    import pandas as pd
+    import Model
+
+    pdf_dir = args.pdf_dir or (settings.PDF_DIR if os.path.isdir(settings.PDF_DIR) else REPO_PDF_DIR)
+    settings.PDF_DIR = os.path.join(pdf_dir, "")
+    if args.model:
+        settings.NLP_MODEL = args.model
+    if not args.cache:
+        # Nothing is read from or written to the stores of the production runs, so every run sees the same input
+        settings.QA_CACHE_ENABLED = False
+        settings.TEXT_CACHE_ENABLED = False
+        settings.OCR_CACHE_ENABLED = False
+        settings.BOILERPLATE_ENABLED = False
+
+    ids = list_pdfs(settings.PDF_DIR, args.limit)
+    if not ids:
+        raise SystemExit(f"No PDFs found in {settings.PDF_DIR}")
+
+    timer = StageTimer()
+
+    # Medical Futurist data is left empty so every run sees the same input
+    Model.medfut_data = pd.DataFrame(columns=["Submission Number", "AI_Algo", "Name of device", "Desc"])
+
+    analyser = Model.Analyser(Model.LEVELS)
+    analyser.browser = OfflineBrowser()
+    analyser.scraper = OfflineScraper()
+    analyser.LLM = OfflineLLM()
+    Model.Analyser_1 = analyser
+
+    start = time.perf_counter()
+    analyser.nlp_model  # Model loading is reported separately from the levels
+    load_seconds = time.perf_counter() - start
+
+    level_1 = analyser.level_1
+
+    def counted(pages):
+        for page in pages:
+            timer.paragraphs += 1
+            yield page
+
+    def counted_level_1(pages):
+        if isinstance(pages, list):
+            timer.paragraphs += len(pages)
+            return level_1(pages)
+        # Streamed pages are counted as Level 1 consumes them
+        return level_1(counted(pages))
+
+    analyser.level_1 = timer.wrap("level_1", counted_level_1)
+    analyser.level_2_alt = timer.wrap("level_2_alt", analyser.level_2_alt)
+    analyser.level_2 = timer.wrap("level_2", analyser.level_2)
+    analyser.level_3 = timer.wrap("level_3", analyser.level_3)
+    analyser.level_4 = timer.wrap("level_4", analyser.level_4)
+    extractor = Model.get_extractor()
+    extractor.extract = timer.wrap("extraction", extractor.extract)
+    # Streamed documents are read through iter_pages on a background thread, overlapping level_1
+    extractor.iter_pages = timer.wrap_iterator("extraction", extractor.iter_pages)
+    table_reader = Model.get_table_reader()
+    table_reader.document_tables = timer.wrap("tables", table_reader.document_tables)
+
+    runs = []
+    try:
+        for repeat in range(args.repeat):
+            timer.reset()
+            documents = []
+            run_start = time.perf_counter()
+            for index in ids:
+                doc_start = time.perf_counter()
+                results, _ = Model.process_document(index)
+                documents.append({
+                    "id": index,
+                    "seconds": round(time.perf_counter() - doc_start, 4),
+                    "level_1": results[0] if results else "",
+                })
+            total = time.perf_counter() - run_start
+            runs.append({
+                "repeat": repeat,
+                "total_seconds": round(total, 4),
+                "documents_per_min": round(len(ids) * 60 / total, 3) if total else 0.0,
+                "paragraphs": timer.paragraphs,
+                "paragraphs_per_s": round(timer.paragraphs / timer.seconds["level_1"], 3)
+                if timer.seconds.get("level_1") else 0.0,
+                "stage_seconds": {k: round(v, 4) for k, v in timer.seconds.items()},
+                "stage_calls": dict(timer.calls),
+                "documents": documents,
+            })
+            logger.info(
+                f"Run {repeat + 1}/{args.repeat}: {total:.2f}s, {runs[-1]['documents_per_min']} documents/min, "
+                f"{runs[-1]['paragraphs_per_s']} paragraphs/s"
+            )
+    finally:
+        extractor.close()
+
+    return {
+        "benchmark": "pipeline",
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "documents": len(ids),
+        "pdf_dir": settings.PDF_DIR,
+        "settings": {
+            "NLP_MODEL": settings.NLP_MODEL,
+            "QA_BACKEND": getattr(settings, 'QA_BACKEND', 'pytorch'),
+            "QA_BATCH_SIZE": getattr(settings, 'QA_BATCH_SIZE', 1),
+            "CHUNKING_ENABLED": getattr(settings, 'CHUNKING_ENABLED', False),
+            "RETRIEVAL_TOP_K": getattr(settings, 'RETRIEVAL_TOP_K', 0),
+            "SECTION_ROUTING_ENABLED": getattr(settings, 'SECTION_ROUTING_ENABLED', False),
+            "QA_CACHE_ENABLED": getattr(settings, 'QA_CACHE_ENABLED', False),
+            "EXTRACTION_WORKERS": getattr(settings, 'EXTRACTION_WORKERS', 1),
+            "TEXT_CACHE_ENABLED": getattr(settings, 'TEXT_CACHE_ENABLED', False),
+            "TABLES_ENABLED": getattr(settings, 'TABLES_ENABLED', False),
+            "PDF_BACKEND": getattr(settings, 'PDF_BACKEND', "pymupdf-dict"),
+            "BOILERPLATE_ENABLED": getattr(settings, 'BOILERPLATE_ENABLED', False),
+            "OCR_CACHE_ENABLED": getattr(settings, 'OCR_CACHE_ENABLED', False),
+        },
+        "model_load_seconds": round(load_seconds, 4),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "runs": runs,
+    }
+
+
+def legacy_clean(paragraph: str) -> str:
+    """The four pass cleaner PDF_Reader_2 used before PDF_Reader_2.CLEANER, kept as reference"""
+    if paragraph == None or paragraph.strip() == "":
+        return ""
+    paragraph = re.sub(r"[^\x00-\x7F]", " ", paragraph)
+    paragraph = re.sub(r"[Kk][0-9]+", " ", paragraph)
+    paragraph = paragraph.replace("\n", " ")
+    paragraph = re.sub("[,;:.\n\t\r)(*%]+", " ", paragraph)
+    paragraph = re.sub(r"the", " ", paragraph)
+    paragraph = re.sub(r"an", " ", paragraph)
+    return paragraph
+
+
+def raw_lines(paths: List[str]) -> List[str]:
+    """Uncleaned text of the first span of every line, as passed to the cleaner during extraction"""
+    import fitz
+
+    lines = []
+    for path in paths:
+        with fitz.open(path) as document:
+            for page in document:
+                for block in page.get_text("dict")["blocks"]:
+                    if block["type"] == 0:
+                        lines += [line["spans"][0]["text"] for line in block["lines"] if line["spans"]]
+    return lines
+
+
+def benchmark_cleaner(args: argparse.Namespace) -> Dict[str, Any]:
+    """Compares lines per second of the single pass cleaner against the legacy four pass cleaner"""
+    import PDF_Reader_2
+
+    pdf_dir = args.pdf_dir or (settings.PDF_DIR if os.path.isdir(settings.PDF_DIR) else REPO_PDF_DIR)
+    paths = [os.path.join(pdf_dir, f"{index}.pdf") for index in list_pdfs(pdf_dir, args.limit)]
+    corpus = raw_lines(paths)
+    if not corpus:
+        raise SystemExit(f"No text found in the PDFs of {pdf_dir}")
+    lines = (corpus * (args.lines // len(corpus) + 1))[:args.lines]
+
+    mismatches = sum(legacy_clean(line) != PDF_Reader_2.CLEANER(line) for line in corpus)
+    if mismatches:
+        logger.error(f"{mismatches} of {len(corpus)} lines are cleaned differently")
+
+    timings = {}
+    for name, cleaner in (("legacy", legacy_clean), ("compiled", PDF_Reader_2.CLEANER)):
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            for line in lines:
+                cleaner(line)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+
+    report = {
+        "benchmark": "cleaner",
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "documents": len(paths),
+        "corpus_lines": len(corpus),
+        "lines": len(lines),
+        "mismatches": mismatches,
+        "legacy_lines_per_s": round(len(lines) / timings["legacy"], 1),
+        "compiled_lines_per_s": round(len(lines) / timings["compiled"], 1),
+        "speedup": round(timings["legacy"] / timings["compiled"], 3),
+    }
+    logger.info(
+        f"Legacy: {report['legacy_lines_per_s']:.0f} lines/s | Compiled: {report['compiled_lines_per_s']:.0f} lines/s | "
+        f"Speedup: {report['speedup']:.2f}x | Mismatches: {mismatches}"
+    )
+    return report
+
+
+def read_with_backend(backend: str, paths: List[str], repeat: int) -> Dict[str, Any]:
+    """Reads the PDFs with a backend, run in a fresh process so its peak memory is its own"""
+    import PDF_Backends
+    import PDF_Extractor
+
+    baseline = peak_rss_mb()
+    best = float("inf")
+    documents = []
+    for _ in range(repeat):
+        documents = []
+        start = time.perf_counter()
+        for path in paths:
+            with PDF_Backends.open_reader(path, backend) as reader:
+                documents.append([reader.page_content(i) for i in range(PDF_Extractor.FIRST_PAGE, reader.page_nos())])
+        best = min(best, time.perf_counter() - start)
+    return {"seconds": best, "peak_rss_mb": peak_rss_mb() - baseline, "documents": documents}
+
+
+def text_similarity(lines: List[str], reference: List[str]) -> float:
+    """Share of the words of two texts they have in common, 1 for the same words in any order"""
+    words = Counter(" ".join(lines).split())
+    reference_words = Counter(" ".join(reference).split())
+    total = sum(words.values()) + sum(reference_words.values())
+    return 2 * sum((words & reference_words).values()) / total if total else 1.0
+
+
+def benchmark_backends(args: argparse.Namespace) -> Dict[str, Any]:
+    """Compares pages per second, memory and output of the PDF backends against the current reader"""
+    import PDF_Backends
+
+    pdf_dir = args.pdf_dir or (settings.PDF_DIR if os.path.isdir(settings.PDF_DIR) else REPO_PDF_DIR)
+    paths = [os.path.join(pdf_dir, f"{index}.pdf") for index in list_pdfs(pdf_dir, args.limit)]
+    # The reference is read first, the others are only compared once it is known
+    backends = [PDF_Backends.DEFAULT_BACKEND] + [
+        backend for backend in args.backends or list(PDF_Backends.BACKENDS) if backend != PDF_Backends.DEFAULT_BACKEND
+    ]
+
+    context = multiprocessing.get_context("fork")
+    outputs = {}
+    for backend in backends:
+        with context.Pool(1) as pool:
+            try:
+                outputs[backend] = pool.apply(read_with_backend, (backend, paths, args.repeat))
+            except Exception as e:
+                logger.error(f"Backend {backend} failed: {type(e).__name__}: {e}")
+        if backend == PDF_Backends.DEFAULT_BACKEND and backend not in outputs:
+            raise SystemExit(f"Reference backend {backend} could not read the summaries in {pdf_dir}, "
+                             f"the other backends cannot be compared")
+
+    reference = outputs[PDF_Backends.DEFAULT_BACKEND]["documents"]
+    results = {}
+    for backend, output in outputs.items():
+        pages = sum(len(document) for document in output["documents"])
+        similarities = [
+            text_similarity([line for lines, _ in document for line in lines],
+                            [line for lines, _ in expected for line in lines])
+            for document, expected in zip(output["documents"], reference)
+        ]
+        results[backend] = {
+            "pages_per_s": round(pages / output["seconds"], 1) if output["seconds"] else 0.0,
+            "peak_rss_mb": round(output["peak_rss_mb"], 1),
+            "similarity": round(sum(similarities) / len(similarities), 4) if similarities else 1.0,
+            "headings": sum(len(headings) for document in output["documents"] for _, headings in document),
+        }
+        logger.info(
+            f"{backend}: {results[backend]['pages_per_s']:.0f} pages/s | Memory: +{results[backend]['peak_rss_mb']:.1f} MB | "
+            f"Similarity: {results[backend]['similarity']:.3f} | Headings: {results[backend]['headings']}"
+        )
+
+    acceptable = [backend for backend in results if results[backend]["similarity"] >= args.min_similarity]
+    fastest = max(acceptable, key=lambda backend: results[backend]["pages_per_s"], default=None)
+    if fastest is None:
+        logger.warning(f"No backend reached a similarity of {args.min_similarity}")
+    else:
+        logger.info(f"Fastest backend with a similarity of at least {args.min_similarity}: {fastest}, set PDF_BACKEND "
+                    f"in settings.py" + ("" if PDF_Backends.finds_headings(fastest) else " (no section headings)"))
+    return {
+        "benchmark": "backends",
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "documents": len(paths),
+        "pages": sum(len(document) for document in reference),
+        "reference": PDF_Backends.DEFAULT_BACKEND,
+        "min_similarity": args.min_similarity,
+        "fastest_acceptable": fastest,
+        "backends": results,
+    }
+
+
+def write_report(report: Dict[str, Any], out: Optional[str]) -> str:
+    """Writes a report as JSON, by default into DATA_DIR/Benchmarks"""
+    if not out:
+        directory = os.path.join(settings.DATA_DIR, "Benchmarks")
+        out = os.path.join(directory, f"{report['benchmark']}_{time.strftime('%Y%m%d_%H%M%S')}_{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    logger.success(f"Benchmark results written to {out}")
+    return out
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the analysis pipeline")
+    parser.add_argument("--out", metavar="JSON", help="Result file (default: DATA_DIR/Benchmarks/<name>_<time>_<commit>.json)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    pipeline = commands.add_parser("pipeline", help="Levels 1 to 4 over the summaries with offline web and LLM stand-ins")
+    pipeline.add_argument("--pdf-dir", help="Directory of summaries (default: PDF_DIR, else Data/Summary_docs)")
+    pipeline.add_argument("--limit", type=int, default=0, help="Only the first N summaries")
+    pipeline.add_argument("--repeat", type=int, default=1, help="Number of runs over the summaries")
+    pipeline.add_argument("--model", help="Question answering model or local path (default: NLP_MODEL)")
+    pipeline.add_argument("--cache", action="store_true", help="Keep the QA answer, extracted text and OCR caches and the boilerplate index enabled")
+    pipeline.set_defaults(run=benchmark_pipeline)
+
+    cleaner = commands.add_parser("cleaner", help="Lines per second of the text cleaner against the legacy cleaner")
+    cleaner.add_argument("--pdf-dir", help="Directory of summaries (default: PDF_DIR, else Data/Summary_docs)")
+    cleaner.add_argument("--limit", type=int, default=0, help="Only the first N summaries")
+    cleaner.add_argument("--lines", type=int, default=200000, help="Number of lines cleaned per measurement")
+    cleaner.add_argument("--repeat", type=int, default=3, help="Measurements per cleaner, the fastest is kept")
+    cleaner.set_defaults(run=benchmark_cleaner)
+
+    backends = commands.add_parser("backends", help="Pages per second, memory and text similarity of the PDF backends")
+    backends.add_argument("--pdf-dir", help="Directory of summaries (default: PDF_DIR, else Data/Summary_docs)")
+    backends.add_argument("--limit", type=int, default=0, help="Only the first N summaries")
+    backends.add_argument("--backends", nargs="+", metavar="NAME", help="Backends to compare (default: all)")
+    backends.add_argument("--repeat", type=int, default=3, help="Reads of the summaries per backend, the fastest is kept")
+    backends.add_argument("--min-similarity", type=float, default=0.95,
+                          help="Similarity to the current output a backend needs to be recommended")
+    backends.set_defaults(run=benchmark_backends)
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    write_report(arguments.run(arguments), arguments.out)
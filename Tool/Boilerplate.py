@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+import hashlib
+import math
+import os
+import sqlite3
+import sys
+import numpy as np
+from settings import logger
+from typing import Callable, Dict, List, Optional
+
+# Prime just below 2**32, so a * x + b of 32 bit values never overflows uint64
+_PRIME = np.uint64(4294967291)
+
+# Words per shingle
+SHINGLE_WORDS = 3
+
+
+class BoilerplateIndex:
+    """
+    Corpus wide index of lines that repeat across submissions, such as the 807.92 template text and
+    substantial equivalence statements.
+
+    Each line is reduced to a MinHash signature over its word shingles and the signature is split
+    into LSH bands stored in SQLite together with the submission it came from. A line is boilerplate
+    when one of its bands is shared with enough other submissions, so near duplicates with small
+    differences (names, dates, numbers) are caught as well. Lines shorter than min_words, such as device
+    classes or standard names that many submissions share but that may answer a question, are never
+    boilerplate. Submissions are added incrementally.
+    """
+
+    def __init__(self, path: str, num_perm: int = 32, bands: int = 8, min_documents: int = 5,
+                 min_fraction: float = 0.2, min_words: int = 10):
+        """
+        Initializes the index at the given database path.
+
+        Args:
+            path (str): Path to the SQLite database file, created if missing.
+            num_perm (int): Number of MinHash permutations.
+            bands (int): Number of LSH bands, num_perm must be a multiple of it.
+            min_documents (int): Minimum number of other submissions sharing a line for it to be boilerplate.
+            min_fraction (float): Minimum fraction of the other submissions sharing a line for it to be boilerplate.
+            min_words (int): Minimum number of words of a boilerplate line, at least SHINGLE_WORDS.
+        """
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.path = path
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.min_documents = min_documents
+        self.min_fraction = min_fraction
+        self.min_words = max(SHINGLE_WORDS, min_words)
+
+        # Fixed seed so signatures stay comparable across runs
+        generator = np.random.RandomState(1)
+        self.a = generator.randint(1, 2 ** 31, size=(num_perm, 1)).astype(np.uint64)
+        self.b = generator.randint(0, 2 ** 31, size=(num_perm, 1)).astype(np.uint64)
+
+        self.connection = None
+        self.pid = None
+        self.lines_seen = 0
+        self.lines_dropped = 0
+        self.chars_seen = 0
+        self.chars_dropped = 0
+
+    def __connect(self) -> sqlite3.Connection:
+        """
+        Returns the connection of the current process, opening it if needed.
+
+        Returns:
+            sqlite3.Connection: Connection to the index database.
+        """
+        # Connections must not be shared with forked processes
+        if self.connection is None or self.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.connection = sqlite3.connect(self.path, timeout=30)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS documents (doc TEXT PRIMARY KEY, lines INTEGER NOT NULL)")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "band INTEGER NOT NULL, key INTEGER NOT NULL, doc TEXT NOT NULL, "
+                "PRIMARY KEY (band, key, doc)) WITHOUT ROWID"
+            )
+            self.connection.commit()
+            self.pid = os.getpid()
+        return self.connection
+
+    def band_keys(self, line: str) -> List[int]:
+        """
+        Computes the LSH band keys of a line.
+
+        Args:
+            line (str): A cleaned line.
+
+        Returns:
+            List[int]: One key per band, empty for lines shorter than min_words.
+        """
+        words = line.lower().split()
+        if len(words) < self.min_words:
+            return []
+        shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+        hashes = np.array(
+            [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles],
+            dtype=np.uint64,
+        ) % _PRIME
+        signature = ((self.a * hashes + self.b) % _PRIME).min(axis=1)
+        keys = []
+        for band in range(self.bands):
+            digest = hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8)
+            keys.append(int.from_bytes(digest.digest(), "little", signed=True))
+        return keys
+
+    def contains(self, doc: str) -> bool:
+        """
+        Checks whether a submission is already indexed.
+
+        Args:
+            doc (str): Submission number.
+
+        Returns:
+            bool: True if the submission was added before.
+        """
+        try:
+            return self.__connect().execute("SELECT 1 FROM documents WHERE doc=?", (doc,)).fetchone() is not None
+        except sqlite3.Error as e:
+            logger.warning(f"Boilerplate index lookup failed: {e}")
+            return False
+
+    def add(self, doc: str, lines: List[str]) -> None:
+        """
+        Adds the lines of a submission to the index, submissions already indexed are left unchanged.
+
+        Args:
+            doc (str): Submission number.
+            lines (List[str]): The cleaned lines of the submission.
+        """
+        try:
+            connection = self.__connect()
+            if self.contains(doc):
+                return
+            keys = {(band, key) for line in lines for band, key in enumerate(self.band_keys(line))}
+            connection.executemany("INSERT OR IGNORE INTO buckets VALUES (?, ?, ?)",
+                                   [(band, key, doc) for band, key in keys])
+            connection.execute("INSERT OR REPLACE INTO documents VALUES (?, ?)", (doc, len(lines)))
+            connection.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Boilerplate index update failed for {doc}: {e}")
+
+    def mask(self, doc: str, lines: List[str]) -> List[bool]:
+        """
+        Marks the boilerplate lines of a submission, the submission itself is not counted.
+
+        Args:
+            doc (str): Submission number.
+            lines (List[str]): The cleaned lines to check.
+
+        Returns:
+            List[bool]: True for each line shared with enough other submissions.
+        """
+        flags = [False] * len(lines)
+        try:
+            connection = self.__connect()
+            others = connection.execute("SELECT COUNT(*) FROM documents WHERE doc != ?", (doc,)).fetchone()[0]
+            threshold = max(self.min_documents, math.ceil(self.min_fraction * others))
+            if others < threshold:
+                return flags
+
+            counts: Dict[tuple, int] = {}
+            for i, line in enumerate(lines):
+                for band, key in enumerate(self.band_keys(line)):
+                    if (band, key) not in counts:
+                        counts[(band, key)] = connection.execute(
+                            "SELECT COUNT(*) FROM buckets WHERE band=? AND key=? AND doc != ?", (band, key, doc)
+                        ).fetchone()[0]
+                    if counts[(band, key)] >= threshold:
+                        flags[i] = True
+                        break
+        except sqlite3.Error as e:
+            logger.warning(f"Boilerplate index lookup failed for {doc}: {e}")
+        return flags
+
+    def filter(self, doc: str, pages: List[list], key: Optional[Callable] = None) -> List[list]:
+        """
+        Drops the boilerplate lines of a submission and counts the text saved.
+
+        Args:
+            doc (str): Submission number.
+            pages (List[list]): The cleaned lines of each page of the submission, or items holding them.
+            key (Optional[Callable]): Returns the line of an item, None when the pages hold the lines themselves.
+
+        Returns:
+            List[list]: The lines or items of each page that are not boilerplate, in order.
+        """
+        key = key or (lambda item: item)
+        flags = iter(self.mask(doc, [key(item) for items in pages for item in items]))
+        kept = []
+        for items in pages:
+            kept.append([])
+            for item in items:
+                line = key(item)
+                self.lines_seen += 1
+                self.chars_seen += len(line)
+                if next(flags):
+                    self.lines_dropped += 1
+                    self.chars_dropped += len(line)
+                else:
+                    kept[-1].append(item)
+        return kept
+
+    def report(self) -> str:
+        """
+        Summarizes the lines and text dropped since the index was opened.
+
+        Returns:
+            str: Human readable summary.
+        """
+        share = self.chars_dropped / self.chars_seen if self.chars_seen else 0.0
+        return (f"Boilerplate filter dropped {self.lines_dropped} of {self.lines_seen} lines "
+                f"({share:.1%} of the text)")
+
+    def close(self) -> None:
+        """
+        Closes the connection of the current process.
+        """
+        if self.connection is not None and self.pid == os.getpid():
+            self.connection.close()
+        self.connection = None
+        self.pid = None
+
+
+if __name__ == "__main__":
+    # Add the summaries of a directory to the index and report how much of their text is boilerplate
+    import settings
+    import PDF_Extractor
+    import Text_Cache
+
+    pdf_dir = sys.argv[1] if len(sys.argv) > 1 else settings.PDF_DIR
+    paths = sorted(os.path.join(pdf_dir, f) for f in os.listdir(pdf_dir) if f.lower().endswith(".pdf"))
+    cache = Text_Cache.TextCache(settings.TEXT_CACHE_DIR) if getattr(settings, 'TEXT_CACHE_ENABLED', False) else None
+    extractor = PDF_Extractor.Extractor(getattr(settings, 'EXTRACTION_WORKERS', 1), cache=cache,
+                                        backend=getattr(settings, 'PDF_BACKEND', "pymupdf-dict"))
+    index = BoilerplateIndex(
+        settings.BOILERPLATE_FILE,
+        num_perm=getattr(settings, 'BOILERPLATE_NUM_PERM', 32),
+        bands=getattr(settings, 'BOILERPLATE_BANDS', 8),
+        min_documents=getattr(settings, 'BOILERPLATE_MIN_DOCUMENTS', 5),
+        min_fraction=getattr(settings, 'BOILERPLATE_MIN_FRACTION', 0.2),
+        min_words=getattr(settings, 'BOILERPLATE_MIN_WORDS', 10),
+    )
+
+    documents = {}
+    for path, content in zip(paths, extractor.iter_documents(paths, "lines")):
+        if content is not None:
+            doc = os.path.splitext(os.path.basename(path))[0]
+            documents[doc] = [line for _, line in content]
+            index.add(doc, documents[doc])
+    extractor.close()
+
+    for doc, lines in documents.items():
+        index.filter(doc, [lines])
+    logger.info(f"{index.report()} over {len(documents)} submissions in {pdf_dir}")
+    index.close()
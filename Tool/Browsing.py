@@ -15,6 +15,7 @@ import time
 import settings
 import csv
 import requests
+import HTTP_Session
 import bs4
 import sys
 from typing import Iterator
@@ -196,9 +197,7 @@ class browser:
         """
         logger.debug("Checking if {} is valid".format(url))
         try:
-            request = requests.get(url, timeout=10, headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            })
+            request = HTTP_Session.get_session().get(url, timeout=10)
             if request.status_code == 404:
                 logger.error("Invalid URL - 404")
                 return False
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+from settings import logger
+from typing import Iterable, Iterator, List, Optional, Tuple
+from Retriever import Passage
+
+# Lines measured by the tokenizer in one call
+MEASURE_BATCH = 64
+
+
+class Chunker:
+    """
+    Packs the lines of a document into contexts that fit a single question answering window.
+
+    Lines are measured with the tokenizer of the QA model and packed until the token budget
+    is reached. Consecutive chunks share up to overlap tokens of trailing lines so answers
+    spanning a chunk boundary are not lost.
+    """
+
+    def __init__(self, tokenizer, budget: int, overlap: int = 32):
+        """
+        Initializes the chunker.
+
+        Args:
+            tokenizer (transformers.PreTrainedTokenizerFast): Tokenizer of the QA model.
+            budget (int): Maximum number of context tokens per chunk.
+            overlap (int): Maximum number of tokens repeated from the end of the previous chunk.
+        """
+        self.tokenizer = tokenizer
+        self.budget = budget
+        self.overlap = min(overlap, budget // 2)
+
+    @staticmethod
+    def budget_for(tokenizer, questions: List[str], max_seq_len: int) -> int:
+        """
+        Computes the number of context tokens that fit in one window next to any of the questions.
+
+        Args:
+            tokenizer (transformers.PreTrainedTokenizerFast): Tokenizer of the QA model.
+            questions (List[str]): The questions asked over the chunks.
+            max_seq_len (int): Window length of the QA engine.
+
+        Returns:
+            int: The context token budget.
+        """
+        max_seq_len = min(max_seq_len, tokenizer.model_max_length)
+        question_len = max((len(tokenizer(q, add_special_tokens=False)["input_ids"]) for q in questions), default=0)
+        return max_seq_len - question_len - tokenizer.num_special_tokens_to_add(pair=True)
+
+    def chunk(self, lines: List[str]) -> List[str]:
+        """
+        Packs lines into chunks.
+
+        Args:
+            lines (List[str]): The lines of the document in reading order.
+
+        Returns:
+            List[str]: Chunks of newline separated lines, each within the token budget.
+        """
+        chunks = list(self.iter_chunks(lines))
+        logger.debug(f"Packed {len(lines)} lines into {len(chunks)} chunks of at most {self.budget} tokens")
+        return chunks
+
+    def iter_chunks(self, lines: Iterable[str]) -> Iterator[str]:
+        """
+        Packs lines into chunks while they are produced, each chunk is yielded as soon as it is full.
+
+        Args:
+            lines (Iterable[str]): The lines of the document in reading order.
+
+        Returns:
+            Iterator[str]: The same chunks as chunk, in order.
+        """
+        for chunk, _ in self.__pack((line, None) for line in lines):
+            yield chunk
+
+    def iter_tagged_chunks(self, lines: Iterable[Tuple[str, str]]) -> Iterator[Passage]:
+        """
+        Packs lines tagged with their section into the same chunks as iter_chunks, each chunk carries the
+        sections of the lines packed into it.
+
+        Args:
+            lines (Iterable[Tuple[str, str]]): (line, section) of the document in reading order.
+
+        Returns:
+            Iterator[Passage]: The chunks with the sections of their lines, in order.
+        """
+        for chunk, sections in self.__pack(lines):
+            yield Passage(chunk, sections)
+
+    def __pack(self, lines: Iterable[Tuple[str, Optional[str]]]) -> Iterator[Tuple[str, List[str]]]:
+        """
+        Packs tagged lines into chunks.
+
+        Args:
+            lines (Iterable[Tuple[str, Optional[str]]]): (line, tag) of the document in reading order.
+
+        Returns:
+            Iterator[Tuple[str, List[str]]]: Each chunk with the distinct tags of its lines in order.
+        """
+        current = []
+        current_len = 0
+        for piece, length, tag in self.__pieces(lines):
+            if current and current_len + length > self.budget:
+                yield self.__join(current)
+                # Carry the trailing lines of the finished chunk over as overlap
+                carried = []
+                carried_len = 0
+                for p, p_len, p_tag in reversed(current):
+                    if carried_len + p_len > self.overlap or carried_len + p_len + length > self.budget:
+                        break
+                    carried.insert(0, (p, p_len, p_tag))
+                    carried_len += p_len
+                current, current_len = carried, carried_len
+            current.append((piece, length, tag))
+            current_len += length
+        if current:
+            yield self.__join(current)
+
+    @staticmethod
+    def __join(pieces: List[tuple]) -> Tuple[str, List[str]]:
+        """
+        Joins the pieces of a chunk.
+
+        Args:
+            pieces (List[tuple]): (piece, token count, tag) of the chunk.
+
+        Returns:
+            Tuple[str, List[str]]: The newline separated chunk and the distinct tags of its pieces in order.
+        """
+        return "\n".join(p for p, _, _ in pieces) + "\n", list(dict.fromkeys(t for _, _, t in pieces))
+
+    def __pieces(self, lines: Iterable[Tuple[str, Optional[str]]]) -> Iterator[Tuple[str, int, Optional[str]]]:
+        """
+        Measures lines in batches and splits the ones longer than the budget.
+
+        Args:
+            lines (Iterable[Tuple[str, Optional[str]]]): (line, tag) of the lines to measure.
+
+        Returns:
+            Iterator[Tuple[str, int, Optional[str]]]: (piece, token count, tag) of each line or part of a line.
+        """
+        batch = []
+        for line in lines:
+            batch.append(line)
+            if len(batch) < MEASURE_BATCH:
+                continue
+            yield from self.__measure(batch)
+            batch = []
+        yield from self.__measure(batch)
+
+    def __measure(self, lines: List[Tuple[str, Optional[str]]]) -> List[Tuple[str, int, Optional[str]]]:
+        """
+        Measures a batch of lines and splits the ones longer than the budget.
+
+        Args:
+            lines (List[Tuple[str, Optional[str]]]): (line, tag) of the lines to measure.
+
+        Returns:
+            List[Tuple[str, int, Optional[str]]]: (piece, token count, tag) of each line or part of a line.
+        """
+        pieces = []
+        for (line, tag), length in zip(lines, self.__lengths([line for line, _ in lines])):
+            if length <= self.budget:
+                pieces.append((line, length, tag))
+            else:
+                pieces.extend((piece, piece_len, tag) for piece, piece_len in self.__split(line))
+        return pieces
+
+    def __lengths(self, lines: List[str]) -> List[int]:
+        """
+        Measures lines in tokens.
+
+        Args:
+            lines (List[str]): The lines to measure.
+
+        Returns:
+            List[int]: Token count of each line, plus one for the separating newline.
+        """
+        if not lines:
+            return []
+        encoded = self.tokenizer(lines, add_special_tokens=False, verbose=False)["input_ids"]
+        # Byte level tokenizers such as RoBERTa's turn the newline into a token of its own
+        return [len(ids) + 1 for ids in encoded]
+
+    def __split(self, line: str) -> List[tuple]:
+        """
+        Splits a line longer than the budget at token boundaries.
+
+        Args:
+            line (str): The line to split.
+
+        Returns:
+            List[tuple]: (piece, token count) of each part of the line.
+        """
+        encoding = self.tokenizer(line, add_special_tokens=False, return_offsets_mapping=True,
+                                  verbose=False).encodings[0]
+        size = self.budget - 1
+        pieces = []
+        for start in range(0, len(encoding.ids), size):
+            offsets = encoding.offsets[start:start + size]
+            pieces.append((line[offsets[0][0]:offsets[-1][1]], len(offsets) + 1))
+        return pieces
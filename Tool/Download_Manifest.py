@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from settings import logger
+from typing import Dict, Optional, Tuple
+
+# Fields recorded per submission, in column order
+FIELDS = ("submission", "page_url", "pdf_url", "etag", "last_modified", "size", "sha256", "outcome", "checked")
+
+
+class DownloadManifest:
+    """
+    Record of the summary downloads stored in SQLite, so refresh runs only fetch what changed.
+
+    Every submission has one row holding the page it was resolved from, the URL of its PDF, the ETag and
+    Last-Modified validators the server sent with it, the size and sha256 of the saved file, the outcome
+    ("pdf", "html" for the fallback page or "failed") and when it was last checked. The hits and misses of
+    the URL templates summaries were tried at directly are counted as well. Download threads share the
+    connection under a lock.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initializes the manifest at the given database path.
+
+        Args:
+            path (str): Path to the SQLite database file, created if missing.
+        """
+        self.path = path
+        self.connection = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def __connect(self) -> sqlite3.Connection:
+        """
+        Returns the connection of the current process, opening it if needed. Called with the lock held.
+
+        Returns:
+            sqlite3.Connection: Connection to the manifest database.
+        """
+        # Connections must not be shared with forked processes
+        if self.connection is None or self.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS downloads ("
+                "submission TEXT PRIMARY KEY, page_url TEXT NOT NULL, pdf_url TEXT, etag TEXT, last_modified TEXT, "
+                "size INTEGER, sha256 TEXT, outcome TEXT NOT NULL, checked REAL NOT NULL)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS strategies ("
+                "template TEXT PRIMARY KEY, hits INTEGER NOT NULL, misses INTEGER NOT NULL)"
+            )
+            self.connection.commit()
+            self.pid = os.getpid()
+        return self.connection
+
+    @staticmethod
+    def file_hash(path: str) -> str:
+        """
+        Hashes the content of a file.
+
+        Args:
+            path (str): Path to the file.
+
+        Returns:
+            str: Hex sha256 digest of the file.
+        """
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def get(self, submission: str) -> Optional[dict]:
+        """
+        Looks up the last download of a submission.
+
+        Args:
+            submission (str): Submission number.
+
+        Returns:
+            Optional[dict]: The recorded FIELDS, None if the submission was never recorded.
+        """
+        try:
+            with self.lock:
+                row = self.__connect().execute(
+                    f"SELECT {', '.join(FIELDS)} FROM downloads WHERE submission = ?", (submission,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Download manifest lookup failed for {submission}: {e}")
+            return None
+        return dict(zip(FIELDS, row)) if row is not None else None
+
+    def put(self, submission: str, page_url: str, outcome: str, pdf_url: Optional[str] = None,
+            etag: Optional[str] = None, last_modified: Optional[str] = None, filename: Optional[str] = None,
+            sha256: Optional[str] = None) -> None:
+        """
+        Records the outcome of a download, replacing the previous one.
+
+        Args:
+            submission (str): Submission number.
+            page_url (str): Page the PDF was resolved from.
+            outcome (str): "pdf", "html" or "failed".
+            pdf_url (Optional[str]): URL the PDF was downloaded from.
+            etag (Optional[str]): ETag header of the PDF, or of the page for the HTML fallback.
+            last_modified (Optional[str]): Last-Modified header of the PDF, or of the page for the HTML fallback.
+            filename (Optional[str]): Saved file, its size and sha256 are recorded.
+            sha256 (Optional[str]): sha256 of the saved file if already known.
+        """
+        size = None
+        try:
+            if filename is not None and os.path.exists(filename):
+                size = os.path.getsize(filename)
+                sha256 = sha256 or self.file_hash(filename)
+            with self.lock:
+                connection = self.__connect()
+                connection.execute(
+                    f"INSERT OR REPLACE INTO downloads ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})",
+                    (submission, page_url, pdf_url, etag, last_modified, size, sha256, outcome, time.time()),
+                )
+                connection.commit()
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Download manifest update failed for {submission}: {e}")
+
+    def touch(self, submission: str) -> None:
+        """
+        Records that a submission was checked and found unchanged.
+
+        Args:
+            submission (str): Submission number.
+        """
+        try:
+            with self.lock:
+                connection = self.__connect()
+                connection.execute("UPDATE downloads SET checked = ? WHERE submission = ?", (time.time(), submission))
+                connection.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Download manifest update failed for {submission}: {e}")
+
+    def strategies(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Looks up the URL templates summaries were found at.
+
+        Returns:
+            Dict[str, Tuple[int, int]]: (hits, misses) by template.
+        """
+        try:
+            with self.lock:
+                rows = self.__connect().execute("SELECT template, hits, misses FROM strategies").fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Download manifest lookup of URL templates failed: {e}")
+            return {}
+        return {template: (hits, misses) for template, hits, misses in rows}
+
+    def record_strategy(self, template: str, hit: bool) -> None:
+        """
+        Counts a summary found, or not found, at a URL template.
+
+        Args:
+            template (str): The URL template.
+            hit (bool): Whether the summary was found there.
+        """
+        try:
+            with self.lock:
+                connection = self.__connect()
+                connection.execute(
+                    "INSERT INTO strategies VALUES (?, ?, ?) ON CONFLICT (template) DO UPDATE SET "
+                    "hits = hits + excluded.hits, misses = misses + excluded.misses",
+                    (template, int(hit), int(not hit)),
+                )
+                connection.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Download manifest update of URL template {template} failed: {e}")
+
+    def close(self) -> None:
+        """
+        Closes the connection of the current process.
+        """
+        with self.lock:
+            if self.connection is not None and self.pid == os.getpid():
+                self.connection.close()
+            self.connection = None
+            self.pid = None
@@ -1,6 +1,15 @@
 #!/usr/bin/env python3
+import asyncio
+import collections
+import concurrent.futures
+import hashlib
+import itertools
+import Download_Manifest
+import HTTP_Session
 import pandas as pd
 import settings
+import tempfile
+import threading
 import time
 import os
 import requests
@@ -10,6 +19,45 @@ from openpyxl import load_workbook
 from settings import logger
 from urllib.parse import urljoin, urlparse
 
+# Bytes read from a download at a time, memory use does not depend on the size of the PDF
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+
+# Bodies of unwanted responses up to this size, such as error pages, are read so their connection is reused
+DRAIN_LIMIT = 1 << 16
+
+# A complete PDF ends with %%EOF within its last 1024 bytes
+PDF_TRAILER_BYTES = 1024
+
+# Added to the headers of the shared session on every FDA request
+FDA_HEADERS = {'Referer': 'https://www.accessdata.fda.gov/'}
+
+class HostRateLimiter:
+    """Spaces out requests to the same host across threads, at most rate requests per second per host"""
+    
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_slot = {}
+        self.lock = threading.Lock()
+    
+    def wait(self, url: str) -> None:
+        """Block until the next request slot of the host of url"""
+        if self.interval <= 0:
+            return
+        host = urlparse(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def rate_limited_get(session: requests.Session, url: str, limiter: HostRateLimiter = None, **kwargs) -> requests.Response:
+    """GET a url once the rate limit of its host allows it"""
+    if limiter is not None:
+        limiter.wait(url)
+    headers = {**FDA_HEADERS, **kwargs.pop('headers', {})}
+    return session.get(url, headers=headers, **kwargs)
+
 def load_target_submission_ids(input_file_path: str) -> set:
     """Load target submission IDs from input.txt file"""
     target_ids = set()
@@ -169,21 +217,12 @@ def find_fda_summary_links(html_content: str, base_url: str) -> list:
     
     return summary_links
 
-def download_pdf_requests_only(page_url: str, filename: str, max_retries: int = 3) -> bool:
-    """Download PDF using requests only"""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'DNT': '1',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
-        'Referer': 'https://www.accessdata.fda.gov/',
-    }
-    
-    session = requests.Session()
-    session.headers.update(headers)
+def download_pdf_requests_only(page_url: str, filename: str, max_retries: int = 3, limiter: HostRateLimiter = None,
+                               record: dict = None, html_fallback: bool = True) -> bool:
+    """Download PDF using requests only, over the connections shared by all downloads.
+    The outcome, resolved PDF URL, validators and sha256 of what was saved are put in record when given.
+    Without html_fallback nothing is saved when no PDF is found"""
+    session = HTTP_Session.get_session()
     
     for attempt in range(max_retries):
         try:
@@ -192,15 +231,14 @@ def download_pdf_requests_only(page_url: str, filename: str, max_retries: int =
             if attempt > 0:
                 time.sleep(5 * attempt)
             
-            response = session.get(page_url, timeout=30, allow_redirects=True)
-            response.raise_for_status()
+            response, first, chunks = stream_get(session, page_url, limiter, timeout=30, allow_redirects=True)
             
             content_type = response.headers.get('content-type', '').lower()
-            if 'application/pdf' in content_type or response.content.startswith(b'%PDF'):
+            if 'application/pdf' in content_type or first.startswith(b'%PDF'):
                 logger.info("Page directly returns PDF content")
-                return save_pdf_content(response.content, filename)
+                return save_pdf_response(response, first, chunks, filename, record)
             
-            html_content = response.text
+            html_content = read_text(response, first, chunks)
             pdf_links = find_pdf_links_in_html(html_content, page_url)
             
             logger.info(f"Found {len(pdf_links)} potential PDF links")
@@ -220,28 +258,31 @@ def download_pdf_requests_only(page_url: str, filename: str, max_retries: int =
                 try:
                     logger.info(f"Trying PDF link {i+1}/{len(pdf_links)}: {pdf_url}")
                     
-                    pdf_response = session.get(pdf_url, timeout=45, allow_redirects=True)
-                    pdf_response.raise_for_status()
+                    pdf_response, pdf_first, pdf_chunks = stream_get(session, pdf_url, limiter, timeout=45, allow_redirects=True)
                     
                     if 'text/html' in pdf_response.headers.get('content-type', '').lower():
                         logger.info("Got HTML response, looking for PDF links...")
-                        summary_pdf_links = find_pdf_links_in_html(pdf_response.text, pdf_url)
+                        summary_pdf_links = find_pdf_links_in_html(read_text(pdf_response, pdf_first, pdf_chunks), pdf_url)
                         
                         for summary_pdf_url in summary_pdf_links:
                             try:
                                 logger.info(f"Trying summary PDF: {summary_pdf_url}")
-                                summary_pdf_response = session.get(summary_pdf_url, timeout=45, allow_redirects=True)
-                                summary_pdf_response.raise_for_status()
+                                summary_pdf_response, summary_first, summary_chunks = stream_get(
+                                    session, summary_pdf_url, limiter, timeout=45, allow_redirects=True
+                                )
                                 
-                                if summary_pdf_response.content.startswith(b'%PDF'):
+                                if summary_first.startswith(b'%PDF'):
                                     logger.info(f"SUCCESS: Found valid PDF at {summary_pdf_url}")
-                                    return save_pdf_content(summary_pdf_response.content, filename)
+                                    return save_pdf_response(summary_pdf_response, summary_first, summary_chunks, filename, record)
+                                release_response(summary_pdf_response, summary_chunks)
                             except:
                                 continue
                     
-                    elif pdf_response.content.startswith(b'%PDF'):
+                    elif pdf_first.startswith(b'%PDF'):
                         logger.info(f"SUCCESS: Found valid PDF at {pdf_url}")
-                        return save_pdf_content(pdf_response.content, filename)
+                        return save_pdf_response(pdf_response, pdf_first, pdf_chunks, filename, record)
+                    else:
+                        release_response(pdf_response, pdf_chunks)
                         
                 except requests.exceptions.RequestException as e:
                     logger.debug(f"Failed to download {pdf_url}: {str(e)}")
@@ -250,8 +291,11 @@ def download_pdf_requests_only(page_url: str, filename: str, max_retries: int =
                     logger.debug(f"Unexpected error with {pdf_url}: {str(e)}")
                     continue
             
-            if attempt == max_retries - 1:
+            if attempt == max_retries - 1 and html_fallback:
                 logger.warning("No PDFs found, saving HTML as fallback")
+                if record is not None:
+                    record.update(outcome='html', pdf_url=None, etag=response.headers.get('ETag'),
+                                  last_modified=response.headers.get('Last-Modified'), sha256=None)
                 return save_html_as_fallback(html_content, filename.replace('.pdf', '.html'))
                 
         except requests.exceptions.RequestException as e:
@@ -261,27 +305,109 @@ def download_pdf_requests_only(page_url: str, filename: str, max_retries: int =
     
     return False
 
-def save_pdf_content(pdf_content: bytes, filename: str) -> bool:
-    """Save PDF content to file"""
+def stream_get(session: requests.Session, url: str, limiter: HostRateLimiter = None, **kwargs) -> tuple:
+    """GET a url as a stream and return the response, its first chunk and an iterator over the other chunks.
+    Only the first chunk is read, so the body can be told apart as PDF or HTML before it is downloaded"""
+    response = rate_limited_get(session, url, limiter, stream=True, **kwargs)
     try:
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        response.raise_for_status()
+    except requests.exceptions.HTTPError:
+        release_response(response)
+        raise
+    try:
+        chunks = response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE)
+        first = next(chunks, b'')
+    except BaseException:
+        response.close()
+        raise
+    return response, first, chunks
+
+def release_response(response: requests.Response, chunks=None) -> None:
+    """Close a streamed response whose body is not needed. A body of at most DRAIN_LIMIT bytes is read to the
+    end first, since closing a response with unread content drops its connection instead of pooling it"""
+    try:
+        if int(response.headers.get('Content-Length') or 0) <= DRAIN_LIMIT:
+            drained = 0
+            for chunk in chunks if chunks is not None else response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                drained += len(chunk)
+                if drained > DRAIN_LIMIT:
+                    break
+    except (requests.exceptions.RequestException, ValueError):
+        pass
+    finally:
+        response.close()
+
+def read_text(response: requests.Response, first: bytes, chunks) -> str:
+    """Read the rest of a streamed HTML response and decode it"""
+    return (first + b''.join(chunks)).decode(response.encoding or 'utf-8', errors='replace')
+
+def save_pdf_response(response: requests.Response, first: bytes, chunks, filename: str, record: dict = None) -> bool:
+    """Stream the PDF of a response to filename and put where it came from and its sha256 in record when given"""
+    try:
+        sha256 = save_pdf_stream(itertools.chain([first], chunks), filename)
+    finally:
+        response.close()
+    if sha256 is None:
+        return False
+    if record is not None:
+        record.update(outcome='pdf', pdf_url=response.url, etag=response.headers.get('ETag'),
+                      last_modified=response.headers.get('Last-Modified'), sha256=sha256)
+    return True
+
+def save_pdf_stream(chunks, filename: str, unchanged_sha256: str = None) -> str:
+    """Write PDF chunks to a temporary file next to filename while hashing them, and rename it over filename
+    once the %PDF header, the %%EOF trailer and the size are valid, so an interrupted download never leaves a
+    truncated PDF behind. Returns the sha256 of the PDF, or None if it is invalid. A PDF whose sha256 is
+    unchanged_sha256 is not written"""
+    tmp_path = None
+    try:
+        directory = os.path.dirname(filename) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(filename) + ".", suffix=".part")
         
-        with open(filename, 'wb') as f:
-            f.write(pdf_content)
+        digest = hashlib.sha256()
+        size = 0
+        head = b''
+        tail = b''
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                if len(head) < len(b'%PDF'):
+                    head += chunk[:len(b'%PDF') - len(head)]
+                    if len(head) == len(b'%PDF') and head != b'%PDF':
+                        break
+                f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+                tail = (tail + chunk)[-PDF_TRAILER_BYTES:]
+            f.flush()
+            os.fsync(f.fileno())
+        
+        if head != b'%PDF':
+            logger.error(f"Downloaded file is not a PDF: {filename}")
+            return None
+        if b'%%EOF' not in tail:
+            logger.error(f"Downloaded PDF is truncated, no %%EOF trailer: {filename} ({size:,} bytes)")
+            return None
+        if size <= 1000:
+            logger.error(f"Generated PDF is too small: {filename} ({size} bytes)")
+            return None
+        
+        sha256 = digest.hexdigest()
+        if sha256 == unchanged_sha256:
+            return sha256
+        os.replace(tmp_path, filename)
+        tmp_path = None
+        logger.info(f"Successfully saved PDF: {filename} ({size:,} bytes)")
+        return sha256
         
-        file_size = os.path.getsize(filename)
-        if file_size > 1000:
-            logger.info(f"Successfully saved PDF: {filename} ({file_size:,} bytes)")
-            return True
-        else:
-            logger.error(f"Generated PDF is too small: {filename} ({file_size} bytes)")
-            if os.path.exists(filename):
-                os.remove(filename)
-            return False
-            
     except Exception as e:
         logger.error(f"Error saving PDF: {str(e)}")
-        return False
+        return None
+    finally:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
 def save_html_as_fallback(html_content: str, filename: str) -> bool:
     """Save HTML content as fallback"""
@@ -318,10 +444,8 @@ def generate_common_fda_pdf_urls(base_url: str, submission_id: str) -> list:
     base_domain = "https://www.accessdata.fda.gov"
     pdf_urls = []
     
-    year_match = re.search(r'(\d{2})(\d+)$', submission_id)
-    if year_match:
-        year_part = year_match.group(1)
-        
+    year_part = submission_year(submission_id)
+    if year_part:
         patterns = [
             f"{base_domain}/cdrh_docs/pdf{year_part}/{submission_id}.pdf",
             f"{base_domain}/cdrh_docs/pdf{year_part}/{submission_id}_summary.pdf",
@@ -335,17 +459,238 @@ def generate_common_fda_pdf_urls(base_url: str, submission_id: str) -> list:
     
     return pdf_urls
 
-def process_single_submission(submission_data: tuple) -> tuple:
-    """Process a single submission"""
+def submission_year(submission_id: str) -> str:
+    """Two digit year of a submission number used in the FDA document folders, None if it has none"""
+    year_match = re.search(r'(\d{2})(\d+)$', submission_id)
+    return year_match.group(1) if year_match else None
+
+class SummaryResolver:
+    """Learns the URL templates summaries are found at, such as cdrh_docs/pdf{yy}/{id}.pdf, and tries the
+    most successful ones directly before the submission page is scraped. Hits and misses are kept in the
+    download manifest when there is one, so what was learned carries over to the next runs"""
+    
+    # Tried in this order until enough summaries were found to rank the templates
+    SEED_TEMPLATES = [
+        "https://www.accessdata.fda.gov/cdrh_docs/pdf{yy}/{id}.pdf",
+        "https://www.accessdata.fda.gov/cdrh_docs/pdf{yy}/{id}_summary.pdf",
+        "https://www.accessdata.fda.gov/cdrh_docs/pdf{yy}/{id}a000.pdf",
+    ]
+    
+    def __init__(self, manifest: Download_Manifest.DownloadManifest = None, max_tries: int = 2, min_rate: float = 0.2):
+        self.manifest = manifest
+        self.max_tries = max_tries
+        self.min_rate = min_rate
+        self.counts = {template: [0, 0] for template in self.SEED_TEMPLATES}
+        if manifest is not None:
+            for template, (hits, misses) in manifest.strategies().items():
+                if '{yy}' in template:
+                    self.counts[template] = [hits, misses]
+        self.lock = threading.Lock()
+        self.direct = 0
+        self.requests = 0
+    
+    @staticmethod
+    def template(url: str, submission_id: str) -> str:
+        """URL template of a summary URL, None if the URL does not name the submission or is not in the folder
+        of its year. Other folders, such as the pdf3/ of older years or reviews/ for De Novo requests, only
+        hold some kinds of submissions and would be tried for all of them"""
+        year = submission_year(submission_id)
+        if not year or submission_id not in url or '{' in url or '}' in url or f'/pdf{year}/' not in url:
+            return None
+        return url.replace(submission_id, '{id}').replace(f'/pdf{year}/', '/pdf{yy}/')
+    
+    def candidates(self, submission_id: str) -> list:
+        """(template, url) of the direct URLs to try for a submission, best first"""
+        year = submission_year(submission_id)
+        with self.lock:
+            # Smoothed hit rate, templates never tried keep their seed order
+            ranked = sorted(self.counts.items(), key=lambda item: -(item[1][0] + 1) / (item[1][0] + item[1][1] + 2))
+        urls = []
+        for template, (hits, misses) in ranked:
+            if len(urls) >= self.max_tries:
+                break
+            if (hits + 1) / (hits + misses + 2) < self.min_rate or ('{yy}' in template and not year):
+                continue
+            urls.append((template, template.format(id=submission_id, yy=year)))
+        return urls
+    
+    def record(self, template: str, hit: bool) -> None:
+        """Count a summary found, or not found, at a template"""
+        with self.lock:
+            counts = self.counts.setdefault(template, [0, 0])
+            counts[0 if hit else 1] += 1
+        if self.manifest is not None:
+            self.manifest.record_strategy(template, hit)
+    
+    def learn(self, submission_id: str, pdf_url: str) -> None:
+        """Count the URL a scraped summary was found at, so its template is tried directly next time"""
+        template = self.template(pdf_url, submission_id)
+        if template is not None:
+            self.record(template, True)
+    
+    def download(self, submission_id: str, filename: str, limiter: HostRateLimiter = None, record: dict = None) -> bool:
+        """Download a summary from the best direct URLs without scraping its page. Every try is a streamed GET
+        whose body is only downloaded when its first chunk is a PDF, so a miss costs one short request and a hit
+        is the download itself"""
+        session = HTTP_Session.get_session()
+        for template, url in self.candidates(submission_id):
+            with self.lock:
+                self.requests += 1
+            try:
+                response, first, chunks = stream_get(session, url, limiter, timeout=45, allow_redirects=True)
+            except requests.exceptions.RequestException as e:
+                logger.debug(f"No summary at {url}: {str(e)}")
+                self.record(template, False)
+                continue
+            if not first.startswith(b'%PDF'):
+                release_response(response, chunks)
+                self.record(template, False)
+                continue
+            if save_pdf_response(response, first, chunks, filename, record):
+                logger.info(f"RESOLVED: {submission_id} directly at {url}")
+                self.record(template, True)
+                with self.lock:
+                    self.direct += 1
+                return True
+            self.record(template, False)
+        return False
+    
+    def log_stats(self, downloads: int) -> None:
+        """Log how many downloads were resolved without scraping and the best templates"""
+        logger.info(f"Resolved {self.direct} of {downloads} downloads directly with {self.requests} requests")
+        with self.lock:
+            ranked = sorted(self.counts.items(), key=lambda item: -item[1][0])[:3]
+        for template, (hits, misses) in ranked:
+            logger.info(f"URL template {template}: {hits} hits, {misses} misses")
+
+def refresh_submission(entry: dict, pdf_filename: str, limiter: HostRateLimiter,
+                       manifest: Download_Manifest.DownloadManifest) -> str:
+    """Revalidate a previously downloaded submission with a conditional GET of its recorded URL.
+    Returns 'unchanged', 'success' when a changed PDF was saved, or None when the submission has to be resolved again"""
+    submission_number = entry['submission']
+    if entry['outcome'] == 'pdf':
+        url, local_file = entry['pdf_url'], pdf_filename
+        if not os.path.exists(local_file) or os.path.getsize(local_file) != entry['size']:
+            return None
+        if not url:
+            # PDFs kept from before the manifest whose URL was not found are only resolved again every few days
+            recheck_days = getattr(settings, 'DOWNLOAD_HTML_RECHECK_DAYS', 7)
+            if time.time() - entry['checked'] >= recheck_days * 86400:
+                return None
+            logger.info(f"UNCHANGED: {submission_number} - PDF without a known URL checked less than {recheck_days} days ago")
+            return 'unchanged'
+    elif entry['outcome'] == 'html':
+        url, local_file = entry['page_url'], pdf_filename.replace('.pdf', '.html')
+        if not os.path.exists(local_file):
+            return None
+        recheck_days = getattr(settings, 'DOWNLOAD_HTML_RECHECK_DAYS', 7)
+        if not entry['etag'] and not entry['last_modified']:
+            # Without validators the page has to be scraped again, fallbacks are only rechecked every few days
+            if time.time() - entry['checked'] >= recheck_days * 86400:
+                return None
+            logger.info(f"UNCHANGED: {submission_number} - HTML fallback checked less than {recheck_days} days ago")
+            return 'unchanged'
+    else:
+        return None
+    
+    headers = {}
+    if entry['etag']:
+        headers['If-None-Match'] = entry['etag']
+    if entry['last_modified']:
+        headers['If-Modified-Since'] = entry['last_modified']
+    try:
+        response = rate_limited_get(HTTP_Session.get_session(), url, limiter, headers=headers, stream=True,
+                                    timeout=45, allow_redirects=True)
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Conditional request for {submission_number} failed, resolving it again: {str(e)}")
+        return None
+    
+    with response:
+        if response.status_code == 304:
+            logger.info(f"UNCHANGED: {submission_number} - 304 Not Modified")
+            manifest.touch(submission_number)
+            return 'unchanged'
+        if response.status_code != 200 or entry['outcome'] != 'pdf':
+            release_response(response)
+            return None
+        
+        # Servers sending no validators return the whole PDF, which is only written when its content changed
+        try:
+            sha256 = save_pdf_stream(response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE), pdf_filename,
+                                     unchanged_sha256=entry['sha256'])
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Conditional download of {submission_number} failed, resolving it again: {str(e)}")
+            return None
+    if sha256 is None:
+        return None
+    if sha256 == entry['sha256']:
+        logger.info(f"UNCHANGED: {submission_number} - same sha256")
+        manifest.touch(submission_number)
+        return 'unchanged'
+    logger.info(f"UPDATED: {submission_number} - summary changed since the last download")
+    manifest.put(submission_number, entry['page_url'], 'pdf', pdf_url=response.url, etag=response.headers.get('ETag'),
+                 last_modified=response.headers.get('Last-Modified'), filename=pdf_filename, sha256=sha256)
+    return 'success'
+
+def backfill_submission(submission_number: str, page_url: str, pdf_filename: str, limiter: HostRateLimiter,
+                        manifest: Download_Manifest.DownloadManifest, resolver: SummaryResolver = None) -> str:
+    """Record a PDF downloaded before the manifest existed, so later runs revalidate it. Its URL is resolved
+    once like for a new download, which also brings the file up to date, and the existing PDF is kept when no
+    summary is found. Returns 'success' when the summary changed, 'unchanged' otherwise"""
+    local_sha256 = manifest.file_hash(pdf_filename)
+    record = {}
+    if not (resolver is not None and resolver.download(submission_number, pdf_filename, limiter, record)):
+        record = {}
+        success = download_pdf_requests_only(page_url, pdf_filename, limiter=limiter, record=record, html_fallback=False)
+        if success and resolver is not None:
+            resolver.learn(submission_number, record['pdf_url'])
+    
+    if record.get('outcome') != 'pdf':
+        logger.warning(f"BACKFILLED: {submission_number} - summary URL not found, keeping the existing PDF")
+        manifest.put(submission_number, page_url, 'pdf', filename=pdf_filename, sha256=local_sha256)
+        return 'unchanged'
+    manifest.put(submission_number, page_url, 'pdf', pdf_url=record['pdf_url'], etag=record.get('etag'),
+                 last_modified=record.get('last_modified'), filename=pdf_filename, sha256=record['sha256'])
+    if record['sha256'] == local_sha256:
+        logger.info(f"BACKFILLED: {submission_number} - existing PDF recorded from {record['pdf_url']}")
+        return 'unchanged'
+    logger.info(f"UPDATED: {submission_number} - summary changed since it was downloaded")
+    return 'success'
+
+def process_single_submission(submission_data: tuple, limiter: HostRateLimiter = None,
+                              manifest: Download_Manifest.DownloadManifest = None, resolver: SummaryResolver = None) -> tuple:
+    """Process a single submission, revalidating it instead when the manifest has a previous download and
+    recording it when it was downloaded before the manifest existed. New submissions are tried at the learned
+    direct URLs before their page is scraped"""
     submission_number, page_url, pdf_filename = submission_data
     
     logger.info(f"STARTING: {submission_number}")
     
-    if os.path.exists(pdf_filename) and os.path.getsize(pdf_filename) > 1000:
+    entry = manifest.get(submission_number) if manifest is not None else None
+    if entry is not None:
+        result_type = refresh_submission(entry, pdf_filename, limiter, manifest)
+        if result_type is not None:
+            return (result_type, submission_number)
+    elif os.path.exists(pdf_filename) and os.path.getsize(pdf_filename) > 1000:
+        if manifest is not None:
+            return (backfill_submission(submission_number, page_url, pdf_filename, limiter, manifest, resolver), submission_number)
         logger.info(f"SKIPPED: {submission_number} - File already exists")
         return ('skipped', submission_number)
     
-    success = download_pdf_requests_only(page_url, pdf_filename)
+    record = {}
+    success = resolver is not None and resolver.download(submission_number, pdf_filename, limiter, record)
+    if not success:
+        record = {}
+        success = download_pdf_requests_only(page_url, pdf_filename, limiter=limiter, record=record)
+        if success and resolver is not None and record.get('outcome') == 'pdf':
+            resolver.learn(submission_number, record['pdf_url'])
+    
+    if manifest is not None:
+        outcome = record.get('outcome', 'pdf') if success else 'failed'
+        saved = pdf_filename if outcome == 'pdf' else pdf_filename.replace('.pdf', '.html')
+        manifest.put(submission_number, page_url, outcome, pdf_url=record.get('pdf_url'), etag=record.get('etag'),
+                     last_modified=record.get('last_modified'), filename=saved if success else None,
+                     sha256=record.get('sha256'))
     
     if success:
         logger.info(f"COMPLETED: {submission_number}")
@@ -354,6 +699,32 @@ def process_single_submission(submission_data: tuple) -> tuple:
         logger.error(f"FAILED: {submission_number}")
         return ('failed', submission_number)
 
+async def download_submissions(submissions: list, concurrency: int, limiter: HostRateLimiter,
+                               manifest: Download_Manifest.DownloadManifest = None, resolver: SummaryResolver = None) -> list:
+    """Process submissions concurrently, at most concurrency at a time, and return (result type, submission number) in completion order"""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    
+    async def download(submission_data: tuple) -> tuple:
+        async with semaphore:
+            try:
+                # The requests based download blocks, so it runs on a thread of the default executor
+                return await asyncio.to_thread(process_single_submission, submission_data, limiter, manifest, resolver)
+            except Exception as e:
+                logger.error(f"Error processing submission {submission_data[0]}: {str(e)}")
+                return ('failed', submission_data[0])
+    
+    loop = asyncio.get_running_loop()
+    # The default executor would otherwise cap the downloads running at once below concurrency
+    loop.set_default_executor(concurrent.futures.ThreadPoolExecutor(max_workers=max(1, concurrency)))
+    
+    results = []
+    tasks = [asyncio.create_task(download(submission_data)) for submission_data in submissions]
+    for task in asyncio.as_completed(tasks):
+        results.append(await task)
+        counts = collections.Counter(result_type for result_type, _ in results)
+        logger.info(f"PROGRESS: {len(results)}/{len(submissions)} | SUCCESS:{counts['success']} FAILURE:{counts['failed']} SKIPPED:{counts['skipped']} UNCHANGED:{counts['unchanged']}")
+    return results
+
 def download_reports() -> None:
     """Main function for downloading PDFs"""
     logger.info("Starting PDF downloads from Excel submission numbers")
@@ -376,60 +747,60 @@ def download_reports() -> None:
     os.makedirs(pdf_dir, exist_ok=True)
     logger.info(f"Download directory: {os.path.abspath(pdf_dir)}")
     
-    successful_downloads = 0
-    failed_downloads = 0
-    skipped_existing = 0
-    filtered_out = 0
-    
     process_limit = getattr(settings, 'PROCESS_LIMIT', 10)
-    processed = 0
-    
-    logger.info(f"Processing up to {process_limit} submissions that match target IDs")
+    filtered_out = 0
+    submissions = []
     
     for index, row in data.iterrows():
-        if processed >= process_limit:
+        if len(submissions) >= process_limit:
             break
-            
-        try:
-            submission_number = str(row["Submission Number"]).strip()
-            
-            if not submission_number or submission_number.lower() in ['nan', 'none', '']:
-                logger.debug(f"Skipping invalid submission number: {submission_number}")
-                continue
-            
-            if submission_number not in target_ids:
-                filtered_out += 1
-                logger.debug(f"FILTERED OUT: {submission_number} - Not in target list")
-                continue
-            
-            pdf_filename = os.path.join(pdf_dir, f"{submission_number}.pdf")
-            
-            page_url = f"https://www.accessdata.fda.gov/scripts/cdrh/cfdocs/cfPMN/pmn.cfm?ID={submission_number}"
-            logger.info(f"PROCESSING {processed+1}/{process_limit}: {submission_number}")
-            logger.info(f"URL: {page_url}")
-            
-            result_type, result_submission = process_single_submission((submission_number, page_url, pdf_filename))
-            
-            if result_type == 'success':
-                successful_downloads += 1
-            elif result_type == 'skipped':
-                skipped_existing += 1
-            else:
-                failed_downloads += 1
-            
-            logger.info(f"PROGRESS: {processed+1}/{process_limit} | SUCCESS:{successful_downloads} FAILURE:{failed_downloads} SKIPPED:{skipped_existing}")
-            
-            processed += 1
-            
-            if processed < process_limit:
-                logger.info("Waiting 3 seconds...")
-                time.sleep(3)
-            
-        except Exception as e:
-            logger.error(f"Error processing submission {submission_number}: {str(e)}")
-            failed_downloads += 1
-            processed += 1
+        
+        submission_number = str(row["Submission Number"]).strip()
+        
+        if not submission_number or submission_number.lower() in ['nan', 'none', '']:
+            logger.debug(f"Skipping invalid submission number: {submission_number}")
+            continue
+        
+        if submission_number not in target_ids:
+            filtered_out += 1
+            logger.debug(f"FILTERED OUT: {submission_number} - Not in target list")
             continue
+        
+        pdf_filename = os.path.join(pdf_dir, f"{submission_number}.pdf")
+        page_url = f"https://www.accessdata.fda.gov/scripts/cdrh/cfdocs/cfPMN/pmn.cfm?ID={submission_number}"
+        submissions.append((submission_number, page_url, pdf_filename))
+    
+    concurrency = getattr(settings, 'DOWNLOAD_CONCURRENCY', 8)
+    rate = getattr(settings, 'DOWNLOAD_RATE_PER_HOST', 2.0)
+    logger.info(f"Processing {len(submissions)} submissions that match target IDs, {concurrency} at a time and at most {rate} requests/s per host")
+    
+    manifest = None
+    if getattr(settings, 'DOWNLOAD_MANIFEST_ENABLED', False):
+        manifest = Download_Manifest.DownloadManifest(settings.DOWNLOAD_MANIFEST_FILE)
+    
+    resolver = None
+    if getattr(settings, 'DOWNLOAD_DIRECT_TRIES', 0) > 0:
+        resolver = SummaryResolver(manifest, max_tries=settings.DOWNLOAD_DIRECT_TRIES,
+                                   min_rate=getattr(settings, 'DOWNLOAD_DIRECT_MIN_RATE', 0.2))
+    
+    start = time.monotonic()
+    try:
+        results = asyncio.run(download_submissions(submissions, concurrency, HostRateLimiter(rate), manifest, resolver))
+    finally:
+        if manifest is not None:
+            manifest.close()
+    elapsed = time.monotonic() - start
+    
+    processed = len(results)
+    successful_downloads = sum(result_type == 'success' for result_type, _ in results)
+    skipped_existing = sum(result_type == 'skipped' for result_type, _ in results)
+    unchanged = sum(result_type == 'unchanged' for result_type, _ in results)
+    failed_downloads = processed - successful_downloads - skipped_existing - unchanged
+    downloaded = {submission_number for result_type, submission_number in results if result_type == 'success'}
+    downloaded_bytes = sum(
+        os.path.getsize(pdf_filename) for submission_number, _, pdf_filename in submissions
+        if submission_number in downloaded and os.path.exists(pdf_filename)
+    )
     
     logger.info("="*60)
     logger.info("FINAL DOWNLOAD SUMMARY:")
@@ -439,7 +810,13 @@ def download_reports() -> None:
     logger.info(f"Successful downloads: {successful_downloads}")
     logger.info(f"Failed downloads: {failed_downloads}")
     logger.info(f"Skipped (already exist): {skipped_existing}")
-    logger.info(f"Success rate: {(successful_downloads/(processed-skipped_existing)*100):.1f}%" if processed > skipped_existing else "N/A")
+    logger.info(f"Unchanged since the last download: {unchanged}")
+    logger.info(f"Success rate: {(successful_downloads/(processed-skipped_existing-unchanged)*100):.1f}%" if processed > skipped_existing + unchanged else "N/A")
+    HTTP_Session.log_stats()
+    if resolver is not None:
+        resolver.log_stats(successful_downloads)
+    logger.info(f"Throughput: {processed} submissions in {elapsed:.1f}s ({processed / max(elapsed, 1e-9):.2f} submissions/s, "
+                f"{downloaded_bytes / 1e6 / max(elapsed, 1e-9):.2f} MB/s downloaded)")
     logger.info("="*60)
 
 if __name__ == "__main__":
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+import os
+import threading
+from collections import defaultdict
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from settings import logger
+
+# Headers of every request, callers add their own such as a Referer
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'DNT': '1',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+# Session of the current process, created on first use
+_session = None
+_pid = None
+_lock = threading.Lock()
+
+
+def create_session(pool_connections: int = 10, pool_maxsize: int = 10, keep_alive: bool = True) -> requests.Session:
+    """
+    Creates a session whose connections are pooled per host.
+
+    Args:
+        pool_connections (int): Number of hosts whose connection pools are kept.
+        pool_maxsize (int): Connections kept open to each host, at least the number of threads using the session.
+        keep_alive (bool): False asks servers to close every connection after its response.
+
+    Returns:
+        requests.Session: The session.
+    """
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session.headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the session shared by all plain HTTP fetches of the current process, creating it on first use
+    with the pool settings of settings.py. Its connection pools are thread safe, so download threads share it.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    global _session, _pid
+    with _lock:
+        # Connections must not be shared with forked processes
+        if _session is None or _pid != os.getpid():
+            import settings
+            _session = create_session(
+                pool_connections=getattr(settings, 'HTTP_POOL_CONNECTIONS', 10),
+                pool_maxsize=getattr(settings, 'HTTP_POOL_MAXSIZE', 10),
+                keep_alive=getattr(settings, 'HTTP_KEEP_ALIVE', True),
+            )
+            _pid = os.getpid()
+        return _session
+
+
+def connection_stats(session: Optional[requests.Session] = None) -> Dict[str, Dict[str, int]]:
+    """
+    Counts the requests and the connections opened for them per host.
+
+    Args:
+        session (Optional[requests.Session]): Session to inspect, the shared session by default.
+
+    Returns:
+        Dict[str, Dict[str, int]]: "requests", "connections" and "reused" (requests sent over an already open
+        connection) by host, for the hosts whose pools are still kept.
+    """
+    if session is None:
+        if _session is None or _pid != os.getpid():
+            return {}
+        session = _session
+    stats = defaultdict(lambda: {"requests": 0, "connections": 0, "reused": 0})
+    for adapter in set(session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = stats[pool.host]
+            host["requests"] += pool.num_requests
+            host["connections"] += pool.num_connections
+    for host in stats.values():
+        host["reused"] = max(0, host["requests"] - host["connections"])
+    return dict(stats)
+
+
+def log_stats() -> None:
+    """
+    Logs the connection reuse of the shared session per host.
+    """
+    for host, stats in sorted(connection_stats().items()):
+        share = stats["reused"] / stats["requests"] * 100 if stats["requests"] else 0.0
+        logger.info(f"HTTP {host}: {stats['requests']} requests over {stats['connections']} connections "
+                    f"({share:.0f}% reused)")
+
+
+def close() -> None:
+    """
+    Closes the pooled connections of the shared session.
+    """
+    global _session, _pid
+    with _lock:
+        if _session is not None and _pid == os.getpid():
+            _session.close()
+        _session = None
+        _pid = None
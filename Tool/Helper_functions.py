@@ -1,7 +1,9 @@
 import os
+import queue
 import re
 import settings
-from typing import Any
+import threading
+from typing import Any, Iterable, Iterator
 from settings import logger
 
 
@@ -23,6 +25,57 @@ def check_pdf_path(index: str) -> bool:
     return True
 
 
+def prefetch(iterable: Iterable[Any], maxsize: int = 8) -> Iterator[Any]:
+    """
+    Iterate over an iterable that is consumed on a background thread, so producing the next items overlaps with
+    the work done on the current one
+
+    Args:
+        iterable (Iterable[Any]): Items to produce
+        maxsize (int): Maximum number of produced items waiting to be consumed
+
+    Returns:
+        Iterator[Any]: The items in order, an exception of the producer is raised when it is reached
+    """
+    items = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        error = None
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except BaseException as e:
+            error = e
+        finally:
+            # Whatever ends the producer, including KeyboardInterrupt or SystemExit, wakes the consumer up
+            put((done, error))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        # Lets the producer finish when the consumer stops early
+        stop.set()
+
+
 def check_presence(element: Any, array: list[Any]) -> bool:
     """
     Check for presence of element in an 2D array
@@ -1,26 +1,34 @@
 #!/usr/bin/env python3
-import pandas as pd
-import transformers
+from __future__ import annotations
 import csv
+import itertools
 import time
+import argparse
+import multiprocessing
 import os
 import re
 import sys
 import traceback
-from typing import Optional, Tuple, List, Union
+from typing import Optional, Tuple, List, Union, Dict, Iterable, Iterator, TYPE_CHECKING
 
+# Heavy libraries (pandas, transformers, torch, selenium, gpt4all, scholarly) are imported
+# where they are first needed so the command line starts without loading them
 try:
     import settings
-    import Browsing
-    import PDF_Reader_2
-    import Scholar_scraper
+    import QA_Cache
+    import Text_Cache
+    import Boilerplate
+    import Retriever
+    import Chunker
     import Helper_functions
-    import LLM
     from settings import logger
 except ImportError as e:
     print(f"Critical import error: {e}")
     sys.exit(1)
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 # For logger to recognize correct timezone
 try:
     os.environ['TZ'] = getattr(settings, 'TIMEZONE', 'UTC')
@@ -62,6 +70,8 @@ def safe_file_operations():
 
 def safe_data_loading():
     """Load input data with error handling"""
+    import pandas as pd
+    
     try:
         data = pd.read_excel(settings.EXCEL_FILE)
         if data.empty:
@@ -85,12 +95,36 @@ def safe_data_loading():
     
     return data, medfut_data
 
-# Initialize file operations and data loading
-csvfile, writer = safe_file_operations()
-data, medfut_data = safe_data_loading()
+# Analysis levels in execution order
+LEVELS = ["1", "2alt", "2", "3", "4"]
+
+# File operations and data loading are initialized by initialize_io when a run starts
+csvfile = None
+writer = None
+data = None
+medfut_data = None
+
+# Pool extracting PDF text, started on first use
+extractor = None
+
+# Index of template lines shared across submissions, opened on first use
+boilerplate = None
+
+# PyMuPDF table finder, created on first use
+table_reader = None
+
+def initialize_io() -> None:
+    """Open the output csv file and load the input data"""
+    global csvfile, writer, data, medfut_data
+    if csvfile is None:
+        csvfile, writer = safe_file_operations()
+    if data is None:
+        data, medfut_data = safe_data_loading()
 
 def fetch_medfut_data(index: str) -> Tuple[Optional[str], Optional[str]]:
     """Fetches the AI algorithm and description from the Medical Futurist dataset with error handling"""
+    import pandas as pd
+    
     try:
         algorithm = None
         description = None
@@ -122,8 +156,213 @@ def fetch_medfut_data(index: str) -> Tuple[Optional[str], Optional[str]]:
         
     return algorithm, description
 
-def process_document(index: str) -> Tuple[List[str], List[str]]:
-    """Process the document with comprehensive error handling and ensure complete analysis"""
+def get_extractor():
+    """Returns the PDF text extractor, creating it on first use"""
+    global extractor
+    if extractor is None:
+        import PDF_Backends
+        import PDF_Extractor
+        backend = getattr(settings, 'PDF_BACKEND', PDF_Backends.DEFAULT_BACKEND)
+        if getattr(settings, 'SECTION_ROUTING_ENABLED', False) and not PDF_Backends.finds_headings(backend):
+            logger.warning(f"PDF backend {backend} finds no section headings, every question is answered over the whole document")
+        extractor = PDF_Extractor.Extractor(
+            workers=getattr(settings, 'EXTRACTION_WORKERS', 1),
+            max_open_docs=getattr(settings, 'EXTRACTION_MAX_OPEN_DOCS', 4),
+            pages_per_task=getattr(settings, 'EXTRACTION_PAGES_PER_TASK', 8),
+            cache=Text_Cache.TextCache(settings.TEXT_CACHE_DIR) if getattr(settings, 'TEXT_CACHE_ENABLED', False) else None,
+            backend=backend,
+            ocr=get_ocr(),
+        )
+    return extractor
+
+def get_ocr():
+    """Returns the OCR fallback for scanned summaries, or None when it is disabled"""
+    if not getattr(settings, 'OCR_ENABLED', False):
+        return None
+    import OCR
+    ocr = OCR.OCRFallback(
+        workers=getattr(settings, 'OCR_WORKERS', 1),
+        language=getattr(settings, 'OCR_LANGUAGE', 'eng'),
+        dpi=getattr(settings, 'OCR_DPI', 300),
+        tessdata=getattr(settings, 'OCR_TESSDATA', None),
+        min_chars=getattr(settings, 'OCR_MIN_CHARS', 20),
+        cache=OCR.OCRCache(settings.OCR_CACHE_DIR) if getattr(settings, 'OCR_CACHE_ENABLED', False) else None,
+    )
+    # Streamed pages are recognized on the prefetch thread, which must not fork while Level 1 runs inference
+    ocr.start()
+    return ocr
+
+def get_boilerplate() -> Optional[Boilerplate.BoilerplateIndex]:
+    """Returns the boilerplate index, opening it on first use, or None when the filter is disabled"""
+    global boilerplate
+    if boilerplate is None and getattr(settings, 'BOILERPLATE_ENABLED', False):
+        boilerplate = Boilerplate.BoilerplateIndex(
+            settings.BOILERPLATE_FILE,
+            num_perm=getattr(settings, 'BOILERPLATE_NUM_PERM', 32),
+            bands=getattr(settings, 'BOILERPLATE_BANDS', 8),
+            min_documents=getattr(settings, 'BOILERPLATE_MIN_DOCUMENTS', 5),
+            min_fraction=getattr(settings, 'BOILERPLATE_MIN_FRACTION', 0.2),
+            min_words=getattr(settings, 'BOILERPLATE_MIN_WORDS', 10),
+        )
+    return boilerplate
+
+def get_table_reader():
+    """Returns the table reader, creating it on first use"""
+    global table_reader
+    if table_reader is None:
+        import Table_Reader
+        table_reader = Table_Reader.Table_Reader(
+            cache=Text_Cache.TextCache(settings.TABLE_CACHE_DIR) if getattr(settings, 'TEXT_CACHE_ENABLED', False) else None,
+        )
+    return table_reader
+
+def table_contexts(path: str) -> Iterator[Retriever.Passage]:
+    """Rows of the ruled tables of a document packed into chunks, or one context per table, of the "table" section.
+    Tables are read when the first context is requested"""
+    if not getattr(settings, 'TABLES_ENABLED', False):
+        return
+    try:
+        tables = [get_table_reader().row_lines(table["rows"]) for table in get_table_reader().document_tables(path)]
+    except Exception as e:
+        logger.error(f"Table extraction failed for {path}: {e}")
+        return
+    
+    logger.debug(f"Adding {sum(map(len, tables))} rows of {len(tables)} tables to pages")
+    if getattr(settings, 'CHUNKING_ENABLED', False):
+        chunker = globals()['Analyser_1'].nlp_model.chunker
+        yield from chunker.iter_tagged_chunks((line, Retriever.TABLE_SECTION) for lines in tables for line in lines)
+    else:
+        for lines in tables:
+            yield Retriever.Passage("".join(line + "\n" for line in lines), [Retriever.TABLE_SECTION])
+
+def level_1_windows(pages: int) -> int:
+    """Upper bound of model windows Level 1 runs over a number of chunks"""
+    top_k = getattr(settings, 'RETRIEVAL_TOP_K', 0)
+    per_question = min(pages, top_k) if top_k > 0 else pages
+    return per_question * (len(settings.ALGORITHM_QUESTIONS) + 1)
+
+def remove_boilerplate(index: str, pages: Iterable[list], key=None, stats: Optional[dict] = None) -> Iterator[list]:
+    """Drops the template lines of each page as pages arrive, the submission is added to the boilerplate index once all are seen.
+    Pages hold lines, or items whose line is returned by key. The characters seen and kept are put in stats when given"""
+    index_db = get_boilerplate()
+    if index_db is None:
+        yield from pages
+        return
+    
+    seen = []
+    dropped = 0
+    kept_chars = 0
+    for lines in pages:
+        seen += map(key, lines) if key else lines
+        try:
+            kept = index_db.filter(index, [lines], key)[0]
+        except Exception as e:
+            logger.warning(f"Boilerplate filter failed for {index}, keeping the page: {e}")
+            kept = lines
+        dropped += len(lines) - len(kept)
+        kept_chars += sum(map(len, map(key, kept) if key else kept))
+        yield kept
+    
+    index_db.add(index, seen)
+    logger.info(f"Boilerplate filter dropped {dropped} of {len(seen)} lines of {index}")
+    if stats is not None:
+        stats.update(seen_chars=sum(map(len, seen)), kept_chars=kept_chars)
+
+def windows_saved(passages: int, stats: dict) -> int:
+    """Model windows the boilerplate filter saved, estimated from the share of the text it dropped rather than by
+    packing the unfiltered document again"""
+    seen, kept = stats.get('seen_chars', 0), stats.get('kept_chars', 0)
+    if not passages or not kept or kept >= seen:
+        return 0
+    return level_1_windows(round(passages * seen / kept)) - level_1_windows(passages)
+
+def log_windows_saved(index: str, passages: Iterable[str], stats: dict) -> Iterator[str]:
+    """Passes streamed passages through and logs the model windows the boilerplate filter saved once all were produced"""
+    count = 0
+    for passage in passages:
+        count += 1
+        yield passage
+    if stats:
+        logger.info(f"Boilerplate filter saved {windows_saved(count, stats)} model windows of {index}")
+
+def extraction_mode() -> str:
+    """Lines are extracted when they are packed into chunks, otherwise one paragraph per page. Section routing needs the section of every line"""
+    if getattr(settings, 'SECTION_ROUTING_ENABLED', False):
+        return "sections"
+    return "lines" if getattr(settings, 'CHUNKING_ENABLED', False) else "paragraphs"
+
+def section_passages(items: Iterable[Tuple[int, str, str]]) -> Iterator[Retriever.Passage]:
+    """Packs (page number, line, section) into chunks, or one paragraph per page, tagged with the sections of their lines"""
+    if getattr(settings, 'CHUNKING_ENABLED', False):
+        chunker = globals()['Analyser_1'].nlp_model.chunker
+        yield from chunker.iter_tagged_chunks((line, section) for _, line, section in items)
+        return
+    for _, page in itertools.groupby(items, key=lambda item: item[0]):
+        page = list(page)
+        yield Retriever.Passage("".join(line + "\n" for _, line, _ in page), dict.fromkeys(section for _, _, section in page))
+
+def stream_pages(index: str, path: str) -> Iterator[str]:
+    """Pages of a document read on a background thread, packed into chunks as they arrive when chunking is enabled"""
+    pages = Helper_functions.prefetch(
+        get_extractor().iter_pages(path), getattr(settings, 'STREAM_QUEUE_PAGES', 8)
+    )
+    # Filtered on the consuming thread, SQLite connections belong to the thread that opened them
+    stats = {}
+    if extraction_mode() == "sections":
+        import PDF_Extractor
+        items = (item for item in PDF_Extractor.tag_sections(pages) if item[1])
+        page_items = (list(page) for _, page in itertools.groupby(items, key=lambda item: item[0]))
+        page_items = remove_boilerplate(index, page_items, key=lambda item: item[1], stats=stats)
+        return log_windows_saved(index, section_passages(item for items in page_items for item in items), stats)
+    
+    page_lines = remove_boilerplate(index, (lines for lines, _ in pages), stats=stats)
+    if extraction_mode() == "lines":
+        # Tokenizers are not shared between threads, so chunks are packed on the consuming thread
+        lines = (line for lines in page_lines for line in lines if line)
+        return log_windows_saved(index, globals()['Analyser_1'].nlp_model.chunker.iter_chunks(lines), stats)
+    return log_windows_saved(index, ("".join(line + "\n" for line in lines) for lines in page_lines), stats)
+
+def extract_pages(index: str, path: str, content: Optional[list], description: Optional[str]) -> List[str]:
+    """Extract the whole document, or use its already extracted content, and return the pages given to Level 1"""
+    try:
+        if content is None:
+            content = get_extractor().extract(path, extraction_mode())
+        if content is None:
+            raise ValueError("text could not be extracted")
+        if extraction_mode() == "sections":
+            stats = {}
+            [items] = remove_boilerplate(index, [content], key=lambda item: item[1], stats=stats)
+            pages = list(section_passages(items))
+            sections = {section for _, _, section in items if section}
+            logger.info(f"Split {len(items)} lines of {len(sections)} sections into {len(pages)} passages, "
+                        f"Level 1 needs at most {level_1_windows(len(pages))} model windows")
+            if stats:
+                logger.info(f"Boilerplate filter saved {windows_saved(len(pages), stats)} model windows")
+        elif extraction_mode() == "lines":
+            chunker = globals()['Analyser_1'].nlp_model.chunker
+            stats = {}
+            [lines] = remove_boilerplate(index, [[line for _, line in content]], stats=stats)
+            pages = chunker.chunk(lines)
+            logger.info(f"Chunked {len(lines)} lines into {len(pages)} chunks, "
+                        f"Level 1 needs at most {level_1_windows(len(pages))} model windows")
+            if stats:
+                logger.info(f"Boilerplate filter saved {windows_saved(len(pages), stats)} model windows")
+        else:
+            page_lines = [paragraph.split("\n")[:-1] for paragraph in content]
+            pages = ["".join(line + "\n" for line in lines) for lines in remove_boilerplate(index, page_lines)]
+        logger.debug(f"Extracted {len(pages)} paragraphs from PDF")
+    except Exception as e:
+        logger.error(f"PDF extraction failed for {index}: {e}")
+        pages = []
+    
+    pages += table_contexts(path)
+    if description:
+        pages.append(description)
+        logger.debug("Added Medical Futurist description to pages")
+    return pages
+
+def process_document(index: str, content: Optional[list] = None) -> Tuple[List[str], List[str]]:
+    """Process the document with comprehensive error handling and ensure complete analysis, content is its already extracted text"""
     try:
         path = f"{settings.PDF_DIR}{index}.pdf"
         
@@ -137,19 +376,23 @@ def process_document(index: str) -> Tuple[List[str], List[str]]:
         algorithm, description = fetch_medfut_data(index)
         
         # Step 2: Extract PDF content
-        try:
-            pdf = PDF_Reader_2.Reader(path)
-            pages = pdf.extract_paragraphs()
-            logger.debug(f"Extracted {len(pages)} paragraphs from PDF")
-        except Exception as e:
-            logger.error(f"PDF extraction failed for {index}: {e}")
-            pages = []
-        
-        if description:
-            pages.append(description)
-            logger.debug("Added Medical Futurist description to pages")
+        if content is None and getattr(settings, 'STREAMING_ENABLED', False):
+            try:
+                # Level 1 answers the first pages while the next ones are still being read
+                pages = stream_pages(index, path)
+                first = next(pages, None)
+                if first is None:
+                    pages = list(table_contexts(path)) + ([description] if description else [])
+                else:
+                    pages = itertools.chain([first], pages, table_contexts(path), [description] if description else [])
+                    logger.debug("Streaming pages from PDF")
+            except Exception as e:
+                logger.error(f"PDF extraction failed for {index}: {e}")
+                pages = [description] if description else []
+        else:
+            pages = extract_pages(index, path, content, description)
         
-        if not pages:
+        if isinstance(pages, list) and not pages:
             logger.warning(f"No content extracted from {index}")
             return ["No content extracted"], ["No search results available"]
         
@@ -173,46 +416,60 @@ def process_document(index: str) -> Tuple[List[str], List[str]]:
         
         logger.debug(f"All answers: {all_answers}")
         
+        analyser = globals()['Analyser_1']
+        
         # Step 5: Level 2 Alternative Analysis (LLM filtering)
-        try:
-            logger.info("Starting Level 2 Alternative Analysis...")
-            alt_keywords = globals()['Analyser_1'].level_2_alt(all_answers) if all_answers else []
-            logger.success(f"Level 2 Alt completed with {len(alt_keywords)} keywords")
-        except Exception as e:
-            logger.error(f"Level 2 alt analysis failed: {e}")
-            alt_keywords = []
+        alt_keywords = []
+        if analyser.runs("2alt"):
+            try:
+                logger.info("Starting Level 2 Alternative Analysis...")
+                alt_keywords = analyser.level_2_alt(all_answers) if all_answers else []
+                logger.success(f"Level 2 Alt completed with {len(alt_keywords)} keywords")
+            except Exception as e:
+                logger.error(f"Level 2 alt analysis failed: {e}")
+                alt_keywords = []
         
         # Step 6: Level 2 Analysis (Browser validation)
-        try:
-            logger.info("Starting Level 2 Analysis...")
-            filtered_answer = globals()['Analyser_1'].level_2(all_answers) if all_answers else []
-            logger.success(f"Level 2 completed with {len(filtered_answer)} filtered results")
-        except Exception as e:
-            logger.error(f"Level 2 analysis failed: {e}")
-            filtered_answer = []
+        filtered_answer = []
+        if analyser.runs("2"):
+            try:
+                logger.info("Starting Level 2 Analysis...")
+                filtered_answer = analyser.level_2(all_answers) if all_answers else []
+                logger.success(f"Level 2 completed with {len(filtered_answer)} filtered results")
+            except Exception as e:
+                logger.error(f"Level 2 analysis failed: {e}")
+                filtered_answer = []
         
         # Step 7: Combine results for Level 3
         combined_answer = filtered_answer.copy()
         for answer in alt_keywords:
             combined_answer.append((0.9, answer))
         
+        # Without any Level 2 the best Level 1 answers are searched
+        if not analyser.runs("2") and not analyser.runs("2alt"):
+            combined_answer = all_answers[:getattr(settings, 'NUMBER_OF_KEYWORDS', 10)]
+        
         # Step 8: Level 3 Analysis (Paper search)
-        try:
-            logger.info("Starting Level 3 Analysis...")
-            all_papers = globals()['Analyser_1'].level_3(combined_answer) if combined_answer else []
-            logger.success(f"Level 3 completed")
-        except Exception as e:
-            logger.error(f"Level 3 analysis failed: {e}")
-            all_papers = []
+        all_papers = []
+        if analyser.runs("3"):
+            try:
+                logger.info("Starting Level 3 Analysis...")
+                all_papers = analyser.level_3(combined_answer) if combined_answer else []
+                logger.success(f"Level 3 completed")
+            except Exception as e:
+                logger.error(f"Level 3 analysis failed: {e}")
+                all_papers = []
         
         # Step 9: Level 4 Analysis (Attack classification)
-        try:
-            logger.info("Starting Level 4 Analysis...")
-            attack_papers, rejections = globals()['Analyser_1'].level_4(all_papers) if all_papers else ([], [])
-            logger.success(f"Level 4 completed")
-        except Exception as e:
-            logger.error(f"Level 4 analysis failed: {e}")
-            attack_papers, rejections = [], []
+        attack_papers, rejections = all_papers, []
+        if analyser.runs("4"):
+            try:
+                logger.info("Starting Level 4 Analysis...")
+                attack_papers, rejections = analyser.level_4(all_papers) if all_papers else ([], [])
+                logger.success(f"Level 4 completed")
+            except Exception as e:
+                logger.error(f"Level 4 analysis failed: {e}")
+                attack_papers, rejections = [], []
         
         # Step 10: Compile results
         try:
@@ -235,10 +492,10 @@ def process_document(index: str) -> Tuple[List[str], List[str]]:
         
         # Step 11: Process search results
         try:
-            search_results = process_search_results(attack_papers, filtered_answer)
+            search_results = process_search_results(attack_papers, combined_answer)
             if rejections:
                 search_results.append("Rejected Papers:")
-                search_results.extend(process_search_results(rejections, filtered_answer))
+                search_results.extend(process_search_results(rejections, combined_answer))
             
             if not search_results:
                 search_results = ["No security vulnerabilities found"]
@@ -289,13 +546,13 @@ def process_search_results(results: List, answers: List[Tuple[float, str]]) -> L
         logger.error(f"Error processing search results: {e}")
         return ["Error processing search results"]
 
-def create_row(index: str, row: pd.Series) -> bool:
-    """Creates a row in the csv file with error handling and ensures data is written"""
+def build_row(index: str, row: pd.Series, content: Optional[list] = None) -> Tuple[List[str], bool]:
+    """Analyses the document and builds its csv row, an error row is returned if processing fails"""
     try:
         logger.info(f"Creating CSV row for {index}...")
         
         # Process the document
-        results, search_results = process_document(index)
+        results, search_results = process_document(index, content)
         
         # Build the CSV row
         csv_row = [
@@ -322,41 +579,117 @@ def create_row(index: str, row: pd.Series) -> bool:
         else:
             csv_row.append("No security attacks found")
         
-        # Write to CSV
-        logger.info(f"Writing row to CSV for {index}")
-        writer.writerow(csv_row)
-        csvfile.flush()  # Force write to disk
-        
-        logger.success(f"✅ Successfully written {index} to CSV")
-        print(f"✅ Row created for {index} - Data saved to {settings.CSV_FILE}")
-        
-        return True
+        return csv_row, True
         
     except Exception as e:
         logger.error(f"Failed to create row for {index}: {e}")
         logger.error(traceback.format_exc())
         
-        # Write error row to maintain CSV structure
-        try:
-            error_row = [
-                str(index), 
-                "Error", 
-                "Error", 
-                "Error", 
-                "Error", 
-                f"Processing failed: {str(e)[:100]}", 
-                "Error in analysis", 
-                "Error in analysis", 
-                "Error in analysis",
-                "No attacks found due to processing error"
-            ]
-            writer.writerow(error_row)
-            csvfile.flush()
-            logger.warning(f"⚠️ Error row written for {index}")
-        except Exception as write_error:
-            logger.error(f"Failed to write error row: {write_error}")
+        # Error row to maintain CSV structure
+        error_row = [
+            str(index), 
+            "Error", 
+            "Error", 
+            "Error", 
+            "Error", 
+            f"Processing failed: {str(e)[:100]}", 
+            "Error in analysis", 
+            "Error in analysis", 
+            "Error in analysis",
+            "No attacks found due to processing error"
+        ]
+        return error_row, False
+
+def write_row(index: str, csv_row: List[str], success: bool) -> None:
+    """Writes a row to the csv file, only the main process writes"""
+    try:
+        logger.info(f"Writing row to CSV for {index}")
+        writer.writerow(csv_row)
+        csvfile.flush()  # Force write to disk
         
-        return False
+        if success:
+            logger.success(f"✅ Successfully written {index} to CSV")
+            print(f"✅ Row created for {index} - Data saved to {settings.CSV_FILE}")
+        else:
+            logger.warning(f"⚠️ Error row written for {index}")
+    except Exception as write_error:
+        logger.error(f"Failed to write row: {write_error}")
+
+def create_row(index: str, row: pd.Series, content: Optional[list] = None) -> bool:
+    """Creates a row in the csv file with error handling and ensures data is written"""
+    csv_row, success = build_row(index, row, content)
+    write_row(index, csv_row, success)
+    return success
+
+def _init_worker(torch_threads: int) -> None:
+    """Prepares a forked worker, the models are inherited from the main process"""
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except Exception as e:
+        logger.warning(f"Could not set torch threads: {e}")
+    
+    # Workers extract their own documents, a daemon process cannot start an extraction pool
+    global extractor
+    extractor = None
+    settings.EXTRACTION_WORKERS = 1
+    settings.OCR_WORKERS = 1
+    
+    # A Selenium session cannot be shared between processes, each worker opens its own when needed
+    try:
+        analyser = globals()['Analyser_1']
+        inherited = analyser._browser
+        if inherited is not None and hasattr(inherited, 'driver'):
+            del inherited.driver  # Keep the parent's session alive when the copy is collected
+        analyser.browser = None
+    except Exception as e:
+        logger.error(f"Worker {os.getpid()} could not reset the Selenium session: {e}")
+
+def _worker_build_row(item: Tuple[str, pd.Series]) -> Tuple[str, List[str], bool]:
+    """Builds the csv row of a submission inside a worker"""
+    index, row = item
+    csv_row, success = build_row(index, row)
+    return index, csv_row, success
+
+def run_submissions(submissions: List[Tuple[str, pd.Series]], workers: int = 1) -> Tuple[int, int]:
+    """Processes submissions one by one or on a pool of forked workers, rows are written by the main process"""
+    processed = 0
+    failed = 0
+    
+    if workers <= 1 or len(submissions) <= 1:
+        # Text of the next documents is extracted on the extraction pool while the current one is analysed
+        paths = [f"{settings.PDF_DIR}{index}.pdf" for index, _ in submissions]
+        documents = get_extractor().iter_documents(paths, extraction_mode())
+        for i, ((index, row), content) in enumerate(zip(submissions, documents)):
+            print(f"\n📄 Processing {i+1}/{len(submissions)}: {index}")
+            if create_row(index, row, content):
+                processed += 1
+                print(f"✅ {index} completed ({processed}/{len(submissions)})")
+            else:
+                failed += 1
+                print(f"❌ {index} failed")
+        if boilerplate is not None:
+            logger.info(boilerplate.report())
+        return processed, failed
+    
+    workers = min(workers, len(submissions))
+    torch_threads = getattr(settings, 'WORKER_TORCH_THREADS', 0) or max(1, (os.cpu_count() or 1) // workers)
+    print(f"\n🔀 Processing on {workers} workers with {torch_threads} torch threads each")
+    
+    # Fork so the workers share the already loaded model weights copy-on-write
+    globals()['Analyser_1'].preload()
+    context = multiprocessing.get_context("fork")
+    with context.Pool(workers, initializer=_init_worker, initargs=(torch_threads,)) as pool:
+        for index, csv_row, success in pool.imap_unordered(_worker_build_row, submissions):
+            write_row(index, csv_row, success)
+            if success:
+                processed += 1
+                print(f"✅ {index} completed ({processed}/{len(submissions)})")
+            else:
+                failed += 1
+                print(f"❌ {index} failed")
+    
+    return processed, failed
 
 class Model:
     """Enhanced Model class with error handling"""
@@ -364,6 +697,8 @@ class Model:
     def __init__(self, model_name: str):
         """Constructor with error handling"""
         try:
+            import transformers
+            import QA_Engine
             logger.info(f"Loading Model {model_name}...")
             self.model_name = model_name
             self.nlp = transformers.pipeline(
@@ -372,6 +707,46 @@ class Model:
                 tokenizer=model_name,
                 return_all_scores=False
             )
+            self.backend = getattr(settings, 'QA_BACKEND', 'pytorch')
+            self.cache_key = model_name
+            qa_model = self.nlp.model
+            if self.backend == "onnx":
+                import QA_Onnx
+                quantize = getattr(settings, 'QA_ONNX_QUANTIZE', True)
+                qa_model = QA_Onnx.load_onnx_model(self.nlp.model, self.nlp.tokenizer, model_name, quantize)
+                # Quantized answers differ slightly so they are cached separately
+                self.cache_key = f"{model_name}|onnx{'-int8' if quantize else ''}"
+                logger.info(f"Using ONNX Runtime backend: {qa_model.path}")
+            
+            max_seq_len = getattr(settings, 'QA_MAX_SEQ_LEN', 384)
+            doc_stride = getattr(settings, 'QA_DOC_STRIDE', 128)
+            max_answer_len = getattr(settings, 'QA_MAX_ANSWER_LEN', 15)
+            # Answers depend on how paragraphs are windowed and decoded, so other settings are cached separately
+            self.cache_key = f"{self.cache_key}|seq{max_seq_len}-stride{doc_stride}-answer{max_answer_len}"
+            
+            self.engine = QA_Engine.QAEngine(
+                qa_model,
+                self.nlp.tokenizer,
+                batch_size=getattr(settings, 'QA_BATCH_SIZE', 16),
+                max_seq_len=max_seq_len,
+                doc_stride=doc_stride,
+                max_answer_len=max_answer_len,
+            )
+            self.chunker = Chunker.Chunker(
+                self.nlp.tokenizer,
+                Chunker.Chunker.budget_for(
+                    self.nlp.tokenizer,
+                    settings.ALGORITHM_QUESTIONS + [settings.QUESTION_4],
+                    getattr(settings, 'QA_MAX_SEQ_LEN', 384)
+                ),
+                overlap=getattr(settings, 'CHUNK_OVERLAP_TOKENS', 32)
+            )
+            self.cache = None
+            if getattr(settings, 'QA_CACHE_ENABLED', False):
+                self.cache = QA_Cache.QACache(
+                    settings.QA_CACHE_FILE,
+                    max_entries=getattr(settings, 'QA_CACHE_MAX_ENTRIES', 500000)
+                )
             logger.success(f"Model {model_name} loaded successfully")
         except Exception as e:
             logger.error(f"Failed to load model {model_name}: {e}")
@@ -379,59 +754,250 @@ class Model:
 
     def analyse_pages(self, pages: List[str], question: str) -> List[Tuple[float, str]]:
         """Analyse pages with comprehensive error handling"""
+        if not question:
+            logger.warning("Empty pages or question provided")
+            return []
+        return self.analyse_questions(pages, [question]).get(question, [])
+
+    def analyse_questions(self, pages: Iterable[str], questions: List[str]) -> Dict[str, List[Tuple[float, str]]]:
+        """Answer several questions over the same pages in one pass, results are returned per question.
+        Pages that are not a list are answered in batches while they are produced, see __stream_results"""
         try:
-            logger.debug(f"Analysing Pages for the question {question}...")
-            answer = []
+            logger.debug(f"Analysing Pages for the questions {questions}...")
+            answers = {question: [] for question in questions}
             
-            if not pages or not question:
+            if isinstance(pages, list) and not pages or not questions:
                 logger.warning("Empty pages or question provided")
-                return answer
+                return answers
             
-            for input_paragraph in pages:
-                try:
-                    if not input_paragraph or input_paragraph.strip() == "":
-                        continue
-                    
-                    QA_input = {"question": question, "context": input_paragraph}
-                    res = self.nlp(QA_input)
-                    
-                    if res and res.get("score", 0) > 1e-2:
-                        score = float(res["score"])
-                        ans_text = str(res["answer"]).strip().replace("\n", " ")
-                        logger.debug(f"{score}: {ans_text}")
-                        answer.append((score, ans_text))
-                        
-                except Exception as e:
-                    logger.warning(f"Error processing paragraph: {e}")
-                    continue
+            if isinstance(pages, list):
+                contexts = [p for p in pages if p and p.strip() != ""]
+                index = self.__index(contexts)
+                pairs = []
+                for question in questions:
+                    routed = self.__route_contexts(contexts, question)
+                    pairs.extend((question, contexts[i]) for i in self.__select_contexts(contexts, routed, question, index))
+                results = zip(pairs, self.__cached_run(pairs))
+            else:
+                results = self.__stream_results(pages, questions)
             
-            answer.sort(reverse=True)
+            for (question, _), res in results:
+                if res and res[0] > 1e-2:
+                    score = float(res[0])
+                    ans_text = str(res[1]).strip().replace("\n", " ")
+                    logger.debug(f"{score}: {ans_text}")
+                    answers[question].append((score, ans_text))
+            
+            for question in questions:
+                answers[question].sort(reverse=True)
             logger.debug("Analysed Pages")
-            return answer
+            return answers
             
         except Exception as e:
-            logger.error(f"Error in analyse_pages: {e}")
-            return []
+            logger.error(f"Error in analyse_questions: {e}")
+            return {question: [] for question in questions}
+
+    def __stream_results(self, pages: Iterable[str], questions: List[str]) -> List[Tuple[Tuple[str, str], Optional[Tuple[float, str]]]]:
+        """Answer questions over pages while they are produced. Each question keeps the RETRIEVAL_TOP_K paragraphs of its
+        sections that BM25 ranks best so far, see Retriever.StreamingTopK, and paragraphs entering a selection are answered
+        every STREAM_BATCH_PAGES pages, so only the selected paragraphs are held. Answers of paragraphs evicted later are
+        dropped. When no section of a question has been seen, its best paragraphs of the whole document are answered at the end"""
+        top_k = getattr(settings, 'RETRIEVAL_TOP_K', 0)
+        batch_pages = max(1, getattr(settings, 'STREAM_BATCH_PAGES', 4))
+        index = Retriever.StreamingBM25()
+        keys, selections, fallbacks = {}, {}, {}
+        for question in questions:
+            keywords = getattr(settings, 'QUESTION_SECTIONS', {}).get(question) if getattr(settings, 'SECTION_ROUTING_ENABLED', False) else None
+            keys[question] = Retriever.section_keys(keywords or [])
+            query = f"{question} {getattr(settings, 'RETRIEVAL_KEYWORDS', {}).get(question, '')}"
+            selections[question] = Retriever.StreamingTopK(index, query, top_k)
+            # Routing falls back to the whole document until a text passage of one of the sections arrives
+            fallbacks[question] = Retriever.StreamingTopK(index, query, top_k) if keys[question] else None
+        
+        contexts = {}
+        results = {}
+        pending = []
+        
+        def run(pairs: List[Tuple[str, int]]) -> None:
+            pairs = [pair for pair in dict.fromkeys(pairs) if pair not in results]
+            if not pairs:
+                return
+            for pair, res in zip(pairs, self.__cached_run([(question, contexts[position]) for question, position in pairs])):
+                results[pair] = res
+        
+        position = -1
+        for position, page in enumerate(p for p in pages if p and p.strip() != ""):
+            tf = index.add(page)
+            contexts[position] = page
+            for question in questions:
+                match = Retriever.section_match(page, keys[question]) if keys[question] else None
+                if match is not False:
+                    selected, evicted = selections[question].offer(position, tf)
+                    if selected:
+                        pending.append((question, position))
+                    if evicted is not None:
+                        results.pop((question, evicted), None)
+                if fallbacks[question] is not None:
+                    if match and not Retriever.table_only(page):
+                        fallbacks[question] = None
+                    else:
+                        fallbacks[question].offer(position, tf)
+            if (position + 1) % batch_pages == 0:
+                run([(question, p) for question, p in pending if p in selections[question]])
+                pending = []
+                # Only paragraphs still selected for some question are kept
+                for p in list(contexts):
+                    if not any(p in selections[q] or fallbacks[q] is not None and p in fallbacks[q] for q in questions):
+                        del contexts[p]
+        run([(question, p) for question, p in pending if p in selections[question]])
+        
+        final = {}
+        for question in questions:
+            if fallbacks[question] is not None:
+                final[question] = fallbacks[question].positions()
+                run([(question, p) for p in final[question]])
+            else:
+                final[question] = selections[question].positions()
+        logger.debug(f"Streamed {position + 1} paragraphs, answered {len(results)} question/paragraph pairs")
+        return [((question, contexts[p]), results.get((question, p))) for question in questions for p in final[question]]
+
+    def __index(self, contexts: List[str]) -> Optional[Retriever.BM25Index]:
+        """BM25 index of the paragraphs of a document, built once and queried for every question, None without retrieval"""
+        top_k = getattr(settings, 'RETRIEVAL_TOP_K', 0)
+        if top_k <= 0 or len(contexts) <= top_k:
+            return None
+        try:
+            return Retriever.BM25Index(contexts)
+        except Exception as e:
+            logger.warning(f"Retrieval index failed, using all paragraphs: {e}")
+            return None
+
+    def __route_contexts(self, contexts: List[str], question: str) -> List[int]:
+        """Indices of the paragraphs of the sections the question is about, see QUESTION_SECTIONS"""
+        keywords = getattr(settings, 'QUESTION_SECTIONS', {}).get(question)
+        if not getattr(settings, 'SECTION_ROUTING_ENABLED', False) or not keywords:
+            return list(range(len(contexts)))
+        
+        routed = Retriever.route_indices(contexts, keywords)
+        logger.debug(f"Section routing kept {len(routed)} of {len(contexts)} paragraphs for: {question}")
+        return routed
+
+    def __select_contexts(self, contexts: List[str], routed: List[int], question: str,
+                          index: Optional[Retriever.BM25Index]) -> List[int]:
+        """Indices of the routed paragraphs the BM25 index of the document ranks best for the question"""
+        top_k = getattr(settings, 'RETRIEVAL_TOP_K', 0)
+        if index is None or len(routed) <= top_k:
+            return routed
+        
+        try:
+            query = f"{question} {getattr(settings, 'RETRIEVAL_KEYWORDS', {}).get(question, '')}"
+            selected = index.top_k(query, top_k, routed)
+            logger.debug(f"Retrieval kept {len(selected)} of {len(routed)} paragraphs for: {question}")
+            return selected
+        except Exception as e:
+            logger.warning(f"Retrieval failed, using all paragraphs: {e}")
+            return routed
+
+    def __cached_run(self, pairs: List[Tuple[str, str]]) -> List[Optional[Tuple[float, str]]]:
+        """Run the engine only on the pairs missing from the answer cache"""
+        if self.cache is None:
+            return self.engine.run(pairs)
+        
+        results = [None] * len(pairs)
+        cached = self.cache.get_many(self.cache_key, pairs)
+        for i, res in cached.items():
+            results[i] = res
+        
+        missing = [i for i in range(len(pairs)) if i not in cached]
+        if missing:
+            computed = self.engine.run([pairs[i] for i in missing])
+            entries = []
+            for i, res in zip(missing, computed):
+                results[i] = res
+                if res is not None:
+                    entries.append((pairs[i][0], pairs[i][1], res))
+            self.cache.put_many(self.cache_key, entries)
+        
+        logger.info(f"QA cache: {len(cached)} hits, {len(missing)} misses")
+        return results
 
 class Analyser:
     """Enhanced Analyser class with comprehensive error handling"""
 
-    def __init__(self):
-        """Constructor with error handling"""
+    def __init__(self, levels: Optional[List[str]] = None):
+        """Constructor with error handling, components are created the first time a level needs them"""
         try:
-            self.nlp_model = Model(settings.NLP_MODEL)
-            self.scraper = Scholar_scraper.scholarly_scraper()
-            self.browser = Browsing.browser()
-            self.LLM = LLM.LLM(settings.LLM_MODEL)
+            self.levels = set(levels or LEVELS)
+            self._nlp_model = None
+            self._scraper = None
+            self._browser = None
+            self._LLM = None
             self.initial_results = []
             self.filtered_results = []
             self.additional_results = []
             self.neglected_results = []
-            logger.success("Analyser initialized successfully")
+            logger.success(f"Analyser initialized for levels {', '.join(l for l in LEVELS if l in self.levels)}")
         except Exception as e:
             logger.error(f"Failed to initialize Analyser: {e}")
             raise
 
+    def runs(self, level: str) -> bool:
+        """Whether the level was selected for this run"""
+        return level in self.levels
+
+    def preload(self) -> None:
+        """Create the components shared by forked workers before the pool starts"""
+        self.nlp_model
+        if self.runs("2alt"):
+            self.LLM
+
+    @property
+    def nlp_model(self) -> Model:
+        """Question answering model used by Level 1"""
+        if self._nlp_model is None:
+            self._nlp_model = Model(settings.NLP_MODEL)
+        return self._nlp_model
+
+    @nlp_model.setter
+    def nlp_model(self, value) -> None:
+        self._nlp_model = value
+
+    @property
+    def scraper(self):
+        """Google Scholar scraper used by Level 3"""
+        if self._scraper is None:
+            import Scholar_scraper
+            self._scraper = Scholar_scraper.scholarly_scraper()
+        return self._scraper
+
+    @scraper.setter
+    def scraper(self, value) -> None:
+        self._scraper = value
+
+    @property
+    def browser(self):
+        """Selenium browser used by Level 2 and Level 4"""
+        if self._browser is None:
+            import Browsing
+            self._browser = Browsing.browser()
+        return self._browser
+
+    @browser.setter
+    def browser(self, value) -> None:
+        self._browser = value
+
+    @property
+    def LLM(self):
+        """GPT4All model used by the alternative Level 2"""
+        if self._LLM is None:
+            import LLM
+            self._LLM = LLM.LLM(settings.LLM_MODEL)
+        return self._LLM
+
+    @LLM.setter
+    def LLM(self, value) -> None:
+        self._LLM = value
+
     def level_1(self, pages: List[str]) -> List[Tuple[float, str]]:
         """Level 1 analysis with error handling"""
         try:
@@ -442,38 +1008,18 @@ class Analyser:
                 logger.error("No pages provided for analysis")
                 return answer
             
-            # Question 1: Algorithms
-            try:
-                answer_1 = self.nlp_model.analyse_pages(pages, settings.QUESTION_1)
-                answer.extend(answer_1)
-                logger.debug(f"Question 1 found {len(answer_1)} answers")
-            except Exception as e:
-                logger.error(f"Question 1 analysis failed: {e}")
-            
-            # Question 2: Techniques
-            try:
-                answer_2 = self.nlp_model.analyse_pages(pages, settings.QUESTION_2)
-                answer.extend(answer_2)
-                logger.debug(f"Question 2 found {len(answer_2)} answers")
-            except Exception as e:
-                logger.error(f"Question 2 analysis failed: {e}")
+            # All questions are answered in a single pass over the pages
+            algorithm_questions = list(settings.ALGORITHM_QUESTIONS)
+            results = self.nlp_model.analyse_questions(pages, algorithm_questions + [settings.QUESTION_4])
             
-            # Question 3: ML Techniques
-            try:
-                answer_3 = self.nlp_model.analyse_pages(pages, settings.QUESTION_3)
-                answer.extend(answer_3)
-                logger.debug(f"Question 3 found {len(answer_3)} answers")
-            except Exception as e:
-                logger.error(f"Question 3 analysis failed: {e}")
+            for i, question in enumerate(algorithm_questions):
+                question_answers = results.get(question, [])
+                answer.extend(question_answers)
+                logger.debug(f"Question {i+1} found {len(question_answers)} answers")
             
-            # Question 4: Input Format
-            try:
-                answer_4 = self.nlp_model.analyse_pages(pages, settings.QUESTION_4)
-                self.additional_results = answer_4
-                logger.debug(f"Question 4 found {len(answer_4)} answers")
-            except Exception as e:
-                logger.error(f"Question 4 analysis failed: {e}")
-                self.additional_results = []
+            # Input format answers are kept apart from the algorithm answers
+            self.additional_results = results.get(settings.QUESTION_4, [])
+            logger.debug(f"Question 4 found {len(self.additional_results)} answers")
             
             answer.sort(reverse=True)
             
@@ -792,62 +1338,106 @@ def process_individual_pdf(analyser):
         logger.error(f"Error processing individual PDF: {e}")
         print(f"❌ Error occurred: {e}")
 
-def process_range_pdfs(analyser):
+def process_range(start: int, end: int, workers: int = 1) -> None:
+    """Process the rows start to end of the Excel file"""
+    if start < 0 or end < start:
+        print("❌ Invalid range")
+        return
+    
+    if end >= len(data):
+        print(f"⚠️ End index {end} is beyond data range. Max index: {len(data)-1}")
+        end = len(data) - 1
+    
+    print(f"\n🔄 Processing {end-start+1} documents from index {start} to {end}...")
+    
+    submissions = []
+    failed = 0
+    
+    for i in range(start, end + 1):
+        try:
+            row = data.iloc[i]
+            index = str(row["Submission Number"])
+            
+            if not Helper_functions.check_pdf_path(index):
+                print(f"⚠️ Skipping {index} - PDF not found")
+                failed += 1
+                continue
+            
+            submissions.append((index, row))
+                
+        except Exception as e:
+            logger.error(f"Error processing index {i}: {e}")
+            failed += 1
+            print(f"❌ Error processing index {i}: {e}")
+            continue
+    
+    processed, run_failed = run_submissions(submissions, workers)
+    failed += run_failed
+    
+    # Final save
+    csvfile.flush()
+    print(f"\n🎉 Batch processing completed!")
+    print(f"✅ Successful: {processed}")
+    print(f"❌ Failed: {failed}")
+    print(f"📁 Results saved to: {settings.CSV_FILE}")
+
+def process_submission_ids(submission_ids: List[str], workers: int = 1) -> None:
+    """Process the given submission numbers"""
+    if not submission_ids:
+        print("❌ No submissions given")
+        return
+    
+    print(f"\n🔄 Processing {len(submission_ids)} submissions...")
+    
+    submissions = []
+    failed = 0
+    
+    for submission in submission_ids:
+        try:
+            if not Helper_functions.check_pdf_path(submission):
+                print(f"⚠️ Skipping {submission} - PDF not found")
+                failed += 1
+                continue
+            
+            matching_rows = data[data["Submission Number"] == submission]
+            if matching_rows.empty:
+                print(f"⚠️ Skipping {submission} - No data found in Excel file")
+                failed += 1
+                continue
+            
+            submissions.append((submission, matching_rows.iloc[0]))
+                
+        except Exception as e:
+            logger.error(f"Error processing submission {submission}: {e}")
+            failed += 1
+            print(f"❌ Error processing {submission}: {e}")
+            continue
+    
+    processed, run_failed = run_submissions(submissions, workers)
+    failed += run_failed
+    
+    # Final save
+    csvfile.flush()
+    print(f"\n🎉 Processing completed!")
+    print(f"✅ Successful: {processed}")
+    print(f"❌ Failed: {failed}")
+    print(f"📁 Results saved to: {settings.CSV_FILE}")
+
+def read_submission_file(path: str) -> List[str]:
+    """Read submission numbers from a file, one per line"""
+    if not os.path.exists(path):
+        print(f"❌ File not found: {path}")
+        return []
+    
+    with open(path, "r", encoding='utf-8') as file:
+        return [x.strip() for x in file.readlines() if x.strip()]
+
+def process_range_pdfs(analyser, workers: int = 1):
     """Process range of PDFs with validation and CSV writing"""
     try:
         start = int(input("Enter the start index: "))
         end = int(input("Enter the end index: "))
-        
-        if start < 0 or end < start:
-            print("❌ Invalid range")
-            return
-        
-        if end >= len(data):
-            print(f"⚠️ End index {end} is beyond data range. Max index: {len(data)-1}")
-            end = len(data) - 1
-        
-        print(f"\n🔄 Processing {end-start+1} documents from index {start} to {end}...")
-        
-        processed = 0
-        failed = 0
-        
-        for i in range(start, end + 1):
-            try:
-                row = data.iloc[i]
-                index = str(row["Submission Number"])
-                
-                print(f"\n📄 Processing {i+1}/{end+1}: {index}")
-                
-                if not Helper_functions.check_pdf_path(index):
-                    print(f"⚠️ Skipping {index} - PDF not found")
-                    failed += 1
-                    continue
-                
-                success = create_row(index, row)
-                if success:
-                    processed += 1
-                    print(f"✅ {index} completed ({processed}/{end-start+1})")
-                else:
-                    failed += 1
-                    print(f"❌ {index} failed")
-                    
-                # Save progress periodically
-                if processed % 5 == 0:
-                    csvfile.flush()
-                    print(f"💾 Progress saved - {processed} completed")
-                    
-            except Exception as e:
-                logger.error(f"Error processing index {i}: {e}")
-                failed += 1
-                print(f"❌ Error processing index {i}: {e}")
-                continue
-        
-        # Final save
-        csvfile.flush()
-        print(f"\n🎉 Batch processing completed!")
-        print(f"✅ Successful: {processed}")
-        print(f"❌ Failed: {failed}")
-        print(f"📁 Results saved to: {settings.CSV_FILE}")
+        process_range(start, end, workers)
         
     except ValueError:
         print("❌ Please enter valid numbers")
@@ -855,69 +1445,11 @@ def process_range_pdfs(analyser):
         logger.error(f"Error processing range: {e}")
         print(f"❌ Error occurred: {e}")
 
-def process_from_file(analyser):
+def process_from_file(analyser, workers: int = 1):
     """Process PDFs from input file with validation and CSV writing"""
     try:
         path = input("Enter the path to the file containing submission numbers: ").strip()
-        
-        if not os.path.exists(path):
-            print(f"❌ File not found: {path}")
-            return
-        
-        with open(path, "r", encoding='utf-8') as file:
-            submissions = [x.strip() for x in file.readlines() if x.strip()]
-        
-        if not submissions:
-            print("❌ No submissions found in file")
-            return
-        
-        print(f"\n🔄 Processing {len(submissions)} submissions from file...")
-        
-        processed = 0
-        failed = 0
-        
-        for i, submission in enumerate(submissions):
-            try:
-                print(f"\n📄 Processing {i+1}/{len(submissions)}: {submission}")
-                
-                if not Helper_functions.check_pdf_path(submission):
-                    print(f"⚠️ Skipping {submission} - PDF not found")
-                    failed += 1
-                    continue
-                
-                matching_rows = data[data["Submission Number"] == submission]
-                if matching_rows.empty:
-                    print(f"⚠️ Skipping {submission} - No data found in Excel file")
-                    failed += 1
-                    continue
-                
-                row = matching_rows.iloc[0]
-                success = create_row(submission, row)
-                
-                if success:
-                    processed += 1
-                    print(f"✅ {submission} completed ({processed}/{len(submissions)})")
-                else:
-                    failed += 1
-                    print(f"❌ {submission} failed")
-                
-                # Save progress periodically
-                if processed % 5 == 0:
-                    csvfile.flush()
-                    print(f"💾 Progress saved - {processed} completed")
-                    
-            except Exception as e:
-                logger.error(f"Error processing submission {submission}: {e}")
-                failed += 1
-                print(f"❌ Error processing {submission}: {e}")
-                continue
-        
-        # Final save
-        csvfile.flush()
-        print(f"\n🎉 File processing completed!")
-        print(f"✅ Successful: {processed}")
-        print(f"❌ Failed: {failed}")
-        print(f"📁 Results saved to: {settings.CSV_FILE}")
+        process_submission_ids(read_submission_file(path), workers)
         
     except Exception as e:
         logger.error(f"Error processing from file: {e}")
@@ -960,6 +1492,19 @@ def cleanup_resources():
     except Exception as e:
         logger.warning(f"Error cleaning up Analyser: {e}")
     
+    try:
+        if extractor is not None:
+            extractor.close()
+            logger.info("Extraction pool stopped")
+    except Exception as e:
+        logger.warning(f"Error stopping extraction pool: {e}")
+    
+    try:
+        if boilerplate is not None:
+            boilerplate.close()
+    except Exception as e:
+        logger.warning(f"Error closing boilerplate index: {e}")
+    
     try:
         if 'csvfile' in globals() and csvfile and not csvfile.closed:
             csvfile.close()
@@ -982,16 +1527,105 @@ def display_system_info():
     print("="*60)
 
 # Main execution with comprehensive error handling
+def ingest_documents(pdf_dir: str) -> None:
+    """Extracts every PDF of a directory into the text cache and the boilerplate index ahead of analysis runs"""
+    index_db = get_boilerplate()
+    if not getattr(settings, 'TEXT_CACHE_ENABLED', False) and index_db is None:
+        print("❌ The text cache and boilerplate filter are disabled, set TEXT_CACHE_ENABLED or BOILERPLATE_ENABLED in settings.py")
+        return
+    
+    paths = sorted(os.path.join(pdf_dir, f) for f in os.listdir(pdf_dir) if f.lower().endswith(".pdf"))
+    print(f"\n📚 Ingesting {len(paths)} PDFs from {pdf_dir} into {settings.TEXT_CACHE_DIR}")
+    
+    start = time.time()
+    failed = 0
+    pdf_extractor = get_extractor()
+    for i, content in enumerate(pdf_extractor.iter_documents(paths, "lines")):
+        if content is None:
+            failed += 1
+            print(f"❌ {os.path.basename(paths[i])} could not be read")
+        else:
+            if index_db is not None:
+                index_db.add(os.path.splitext(os.path.basename(paths[i]))[0], [line for _, line in content])
+            if getattr(settings, 'TABLES_ENABLED', False) and getattr(settings, 'TEXT_CACHE_ENABLED', False):
+                get_table_reader().document_tables(paths[i])
+        if (i + 1) % 100 == 0:
+            print(f"📄 {i + 1}/{len(paths)} PDFs ingested")
+    
+    elapsed = time.time() - start
+    print(f"✅ Ingested {len(paths) - failed}/{len(paths)} PDFs in {elapsed:.1f}s "
+          f"({pdf_extractor.cache_hits} already cached, {pdf_extractor.cache_misses - failed} extracted)")
+
+def parse_levels(value: str) -> List[str]:
+    """Parse and validate a comma separated list of levels"""
+    levels = [level.strip().lower() for level in value.split(",") if level.strip()]
+    unknown = [level for level in levels if level not in LEVELS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unknown levels {', '.join(unknown)}, choose from {','.join(LEVELS)}")
+    if "1" not in levels:
+        raise argparse.ArgumentTypeError("Level 1 is required by all other levels")
+    return levels
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse command line arguments, without any of --ids, --range or --file the interactive menu is shown"""
+    parser = argparse.ArgumentParser(description="Medical Device Analysis System")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--ids", nargs="+", metavar="ID", help="Submission numbers to analyse")
+    mode.add_argument("--range", nargs=2, type=int, metavar=("START", "END"),
+                      help="Analyse rows START to END of the Excel file")
+    mode.add_argument("--file", metavar="PATH", help="File with one submission number per line")
+    mode.add_argument("--ingest", nargs="?", const=settings.PDF_DIR, metavar="PDF_DIR",
+                      help=f"Only extract the text of all PDFs into the text cache (default: {settings.PDF_DIR})")
+    parser.add_argument("--out", metavar="CSV", help=f"Output csv file (default: {settings.CSV_FILE})")
+    parser.add_argument(
+        "--levels", type=parse_levels, default=list(getattr(settings, 'LEVELS', LEVELS)),
+        help=f"Comma separated levels to run out of {','.join(LEVELS)}, Level 1 is always needed (default: all)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=getattr(settings, 'WORKERS', 1),
+        help="Number of worker processes for range and file modes (default: %(default)s)"
+    )
+    return parser.parse_args()
+
+def run_batch(args: argparse.Namespace) -> None:
+    """Run the non interactive mode selected on the command line"""
+    if args.ids:
+        process_submission_ids(args.ids, args.workers)
+    elif args.range:
+        process_range(args.range[0], args.range[1], args.workers)
+    elif args.file:
+        process_submission_ids(read_submission_file(args.file), args.workers)
+
 def main():
     """Main execution function"""
+    args = parse_arguments()
+    
+    # Ingestion only needs the PDFs, neither the csv files nor the models
+    if args.ingest:
+        try:
+            ingest_documents(args.ingest)
+        except KeyboardInterrupt:
+            print("\n\n👋 Ingestion stopped by user")
+        finally:
+            cleanup_resources()
+        return
+    
     try:
+        if args.out:
+            settings.CSV_FILE = args.out
+        
+        initialize_io()
         display_system_info()
         
         print("\n🔄 Initializing Analyser...")
         global Analyser_1
-        Analyser_1 = Analyser()
+        Analyser_1 = Analyser(args.levels)
         print("✅ Analyser initialized successfully")
         
+        if args.ids or args.range or args.file:
+            run_batch(args)
+            return
+        
         while True:
             try:
                 inp = get_user_input()
@@ -1002,9 +1636,9 @@ def main():
                 elif inp == 1:
                     process_individual_pdf(Analyser_1)
                 elif inp == 2:
-                    process_range_pdfs(Analyser_1)
+                    process_range_pdfs(Analyser_1, args.workers)
                 elif inp == 3:
-                    process_from_file(Analyser_1)
+                    process_from_file(Analyser_1, args.workers)
                 
                 # Ask if user wants to continue
                 if inp != 4:
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+import gzip
+import hashlib
+import json
+import multiprocessing
+import multiprocessing.pool
+import os
+import sys
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import fitz
+import PDF_Backends
+from settings import logger
+
+# Bump when the recognized or cleaned text changes so older pages are recognized again
+FORMAT_VERSION = 1
+
+
+def has_text_layer(page: fitz.Page, min_chars: int = 20) -> bool:
+    """
+    Checks whether a page carries text, or is a scan that only holds images.
+
+    Args:
+        page (fitz.Page): The page.
+        min_chars (int): Characters below which the text is taken as a stamp, such as a page number, on a scan.
+
+    Returns:
+        bool: False for a page with images and almost no text.
+    """
+    if len(page.get_text("text").strip()) >= min_chars:
+        return True
+    return not page.get_images()
+
+
+def page_hash(document: fitz.Document, page_no: int, language: str, dpi: int) -> str:
+    """
+    Hashes what the recognized text of a page depends on, without rendering it.
+
+    Args:
+        document (fitz.Document): The open document.
+        page_no (int): The page number.
+        language (str): Tesseract language.
+        dpi (int): Resolution the page is rendered at.
+
+    Returns:
+        str: Hex sha256 of the content stream and raw images of the page and the OCR settings.
+    """
+    page = document.load_page(page_no)
+    digest = hashlib.sha256(f"{FORMAT_VERSION}:{language}:{dpi}:".encode())
+    digest.update(page.read_contents())
+    for image in page.get_images():
+        digest.update(document.xref_stream_raw(image[0]) or b"")
+    return digest.hexdigest()
+
+
+class OCRReader(PDF_Backends.MuPDFTextReader):
+    """
+    Reads the lines of a page from Tesseract through PyMuPDF's OCR text page, cleaned like the other readers.
+    """
+
+    def __init__(self, path: str, language: str = "eng", dpi: int = 300, tessdata: Optional[str] = None):
+        """
+        Opens the PDF for recognition.
+
+        Args:
+            path (str): The path to the PDF file.
+            language (str): Tesseract language.
+            dpi (int): Resolution the pages are rendered at.
+            tessdata (Optional[str]): Tesseract data directory, None to use TESSDATA_PREFIX.
+        """
+        super().__init__(path)
+        self.language = language
+        self.dpi = dpi
+        self.tessdata = tessdata
+
+    def page_text(self, page_no: int) -> list[str]:
+        page = self.reader.load_page(page_no)
+        textpage = page.get_textpage_ocr(language=self.language, dpi=self.dpi, full=True, tessdata=self.tessdata)
+        return page.get_text("text", textpage=textpage).splitlines()
+
+
+def _recognize(task: Tuple[str, int, str, int, Optional[str]]) -> Tuple[int, Optional[List[str]], Optional[str]]:
+    """Recognizes the cleaned lines of one page, errors are returned rather than raised"""
+    path, page_no, language, dpi, tessdata = task
+    try:
+        with OCRReader(path, language, dpi, tessdata) as reader:
+            return page_no, reader.page_content(page_no)[0], None
+    except Exception as e:
+        return page_no, None, f"{type(e).__name__}: {e}"
+
+
+class OCRCache:
+    """
+    On disk cache of recognized page text with one gzip compressed JSON file per page hash, so a scanned page
+    is only recognized once whatever document, backend or text cache version it is read through.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Initializes the cache in the given directory.
+
+        Args:
+            directory (str): Directory holding the pages, created if missing.
+        """
+        self.directory = directory
+
+    def __page_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json.gz")
+
+    def get(self, key: str) -> Optional[List[str]]:
+        """
+        Looks up the lines of a page.
+
+        Args:
+            key (str): Hash of the page, see page_hash.
+
+        Returns:
+            Optional[List[str]]: The cleaned lines, None on a miss.
+        """
+        try:
+            with gzip.open(self.__page_path(key), "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"OCR cache lookup failed for {key}: {e}")
+            return None
+
+    def put(self, key: str, lines: List[str]) -> None:
+        """
+        Stores the lines of a page atomically.
+
+        Args:
+            key (str): Hash of the page, see page_hash.
+            lines (List[str]): The cleaned lines.
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Written next to the page and renamed so concurrent readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as f:
+                    json.dump(lines, f, separators=(",", ":"))
+                os.replace(tmp_path, self.__page_path(key))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logger.warning(f"OCR cache update failed for {key}: {e}")
+
+
+class OCRFallback:
+    """
+    Recognizes the pages of scanned summaries that have no text layer.
+
+    Only pages the extraction left without lines are checked, and only those holding images and almost no
+    text are rendered and passed to Tesseract. Recognition runs on a pool of its own, bounded separately from
+    the extraction processes since each Tesseract call is far heavier than reading a text layer, and the
+    text of every recognized page is cached by page hash.
+    """
+
+    def __init__(self, workers: int = 1, language: str = "eng", dpi: int = 300, tessdata: Optional[str] = None,
+                 min_chars: int = 20, cache: Optional[OCRCache] = None):
+        """
+        Initializes the fallback.
+
+        Args:
+            workers (int): Number of OCR processes, 1 recognizes in the calling process.
+            language (str): Tesseract language.
+            dpi (int): Resolution the pages are rendered at.
+            tessdata (Optional[str]): Tesseract data directory, None to use TESSDATA_PREFIX.
+            min_chars (int): Characters below which a page with images is taken as scanned.
+            cache (Optional[OCRCache]): Cache of recognized pages, None to always recognize.
+        """
+        self.workers = max(1, workers)
+        self.language = language
+        self.dpi = dpi
+        self.tessdata = tessdata
+        self.min_chars = min_chars
+        self.cache = cache
+        self.pages_recognized = 0
+        self.cache_hits = 0
+        self.pool = None
+
+    def start(self) -> None:
+        """
+        Starts the worker pool, to be called from the main thread before pages are streamed. Forking while
+        another thread runs inference could copy locks held by torch or OpenMP into the workers.
+        """
+        if self.pool is None and self.workers > 1:
+            self.pool = multiprocessing.get_context("fork").Pool(self.workers)
+
+    def __pool(self) -> multiprocessing.pool.Pool:
+        """
+        Returns the worker pool, starting it on first use if start was not called.
+
+        Returns:
+            multiprocessing.pool.Pool: Pool of worker processes.
+        """
+        if self.pool is None:
+            # Only the main thread forks, workers started from other threads come from a clean server process
+            context = "fork" if threading.current_thread() is threading.main_thread() else "forkserver"
+            self.pool = multiprocessing.get_context(context).Pool(self.workers)
+        return self.pool
+
+    def scanned_pages(self, path: str, page_nos: List[int]) -> Dict[int, str]:
+        """
+        Finds the pages without a text layer.
+
+        Args:
+            path (str): Path of the document.
+            page_nos (List[int]): Page numbers to check.
+
+        Returns:
+            Dict[int, str]: Hash of every scanned page by page number.
+        """
+        scanned = {}
+        with fitz.open(path) as document:
+            for page_no in page_nos:
+                if not has_text_layer(document.load_page(page_no), self.min_chars):
+                    scanned[page_no] = page_hash(document, page_no, self.language, self.dpi)
+        return scanned
+
+    def recognize(self, path: str, page_nos: List[int]) -> Dict[int, List[str]]:
+        """
+        Recognizes the scanned ones among pages of a document.
+
+        Args:
+            path (str): Path of the document.
+            page_nos (List[int]): Page numbers the extraction found no lines on.
+
+        Returns:
+            Dict[int, List[str]]: Cleaned lines of every scanned page that could be recognized.
+        """
+        try:
+            scanned = self.scanned_pages(path, page_nos)
+        except Exception as e:
+            logger.error(f"Could not check {path} for scanned pages: {e}")
+            return {}
+
+        lines = {}
+        for page_no, key in scanned.items():
+            text = self.cache.get(key) if self.cache is not None else None
+            if text is not None:
+                self.cache_hits += 1
+                lines[page_no] = text
+        tasks = [(path, page_no, self.language, self.dpi, self.tessdata) for page_no in scanned if page_no not in lines]
+        if not tasks:
+            return lines
+
+        logger.info(f"Running OCR on {len(tasks)} scanned pages of {path}")
+        results = self.__pool().imap_unordered(_recognize, tasks) if self.workers > 1 and len(tasks) > 1 else map(_recognize, tasks)
+        for page_no, text, error in results:
+            if error is not None:
+                logger.error(f"OCR of page {page_no} of {path} failed: {error}")
+                continue
+            self.pages_recognized += 1
+            lines[page_no] = text
+            if self.cache is not None:
+                self.cache.put(scanned[page_no], text)
+        return lines
+
+    def fill(self, path: str, pages: List[Tuple[List[str], list]], first_page: int) -> List[Tuple[List[str], list]]:
+        """
+        Replaces the empty pages of a document by their recognized text.
+
+        Args:
+            path (str): Path of the document.
+            pages (List[Tuple[List[str], list]]): Lines and headings of each page from first_page on.
+            first_page (int): Page number of the first page.
+
+        Returns:
+            List[Tuple[List[str], list]]: The pages, recognized ones without headings.
+        """
+        empty = [page_no for page_no, (lines, _) in enumerate(pages, first_page) if not lines]
+        if not empty:
+            return pages
+        recognized = self.recognize(path, empty)
+        return [(recognized[page_no], []) if page_no in recognized else page
+                for page_no, page in enumerate(pages, first_page)]
+
+    def close(self) -> None:
+        """
+        Stops the worker pool.
+        """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+
+if __name__ == "__main__":
+    import settings
+
+    # Reports the scanned pages of the given summaries and their recognized text
+    ocr = OCRFallback(
+        workers=getattr(settings, "OCR_WORKERS", 1),
+        language=getattr(settings, "OCR_LANGUAGE", "eng"),
+        dpi=getattr(settings, "OCR_DPI", 300),
+        tessdata=getattr(settings, "OCR_TESSDATA", None),
+        min_chars=getattr(settings, "OCR_MIN_CHARS", 20),
+    )
+    try:
+        for path in sys.argv[1:]:
+            with fitz.open(path) as document:
+                page_count = document.page_count
+            recognized = ocr.recognize(path, list(range(page_count)))
+            print(f"{path}: {len(recognized)} of {page_count} pages scanned")
+            for page_no in sorted(recognized):
+                print(f"--- page {page_no}")
+                print("\n".join(recognized[page_no]))
+    finally:
+        ocr.close()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+import fitz
+import PDF_Reader_2
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Protocol, Type
+
+# Reader of the current output, the only one that sees fonts and so the only one that finds section headings
+DEFAULT_BACKEND = "pymupdf-dict"
+
+# Lines holding one of these words are page headers and footers, as skipped by PDF_Reader_2
+HEADER_WORDS = ("Page", "Premarket", "page")
+
+
+class PageReader(Protocol):
+    """
+    Common interface of the PDF readers used for text extraction.
+
+    page_content returns the cleaned lines of a page together with the (line index, level, heading) of the
+    section headings among them, readers that do not see fonts return no headings.
+    """
+
+    path: str
+
+    def page_nos(self) -> int:
+        ...
+
+    def page_content(self, page_no: int) -> tuple[list[str], list[tuple[int, int, str]]]:
+        ...
+
+    def close(self) -> None:
+        ...
+
+    def __enter__(self) -> "PageReader":
+        ...
+
+    def __exit__(self, *exc) -> None:
+        ...
+
+
+class LineReader(ABC):
+    """
+    Base of the readers that only get plain text lines from their library.
+
+    Subclasses implement page_nos, page_text and close, header and footer lines are skipped and the others cleaned with
+    PDF_Reader_2.CLEANER like in PDF_Reader_2.Reader.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initializes the reader with the given PDF file path.
+
+        Args:
+            path (str): The path to the PDF file.
+        """
+        self.path = path
+
+    def __enter__(self) -> "LineReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @abstractmethod
+    def close(self) -> None:
+        """
+        Closes the PDF document.
+        """
+
+    @abstractmethod
+    def page_nos(self) -> int:
+        """
+        Returns the total number of pages in the PDF.
+
+        Returns:
+            int: The number of pages.
+        """
+
+    @abstractmethod
+    def page_text(self, page_no: int) -> list[str]:
+        """
+        Extracts the raw lines of a page.
+
+        Args:
+            page_no (int): The page number.
+
+        Returns:
+            list[str]: The uncleaned lines of the page in reading order.
+        """
+
+    def page_content(self, page_no: int) -> tuple[list[str], list[tuple[int, int, str]]]:
+        """
+        Extracts the cleaned lines of a page, skipping page headers and footers.
+
+        Args:
+            page_no (int): The page number.
+
+        Returns:
+            tuple[list[str], list[tuple[int, int, str]]]: The cleaned lines of the page and no headings.
+        """
+        lines = []
+        for text in self.page_text(page_no):
+            if any(word in text for word in HEADER_WORDS):
+                continue
+            cleaned_text = PDF_Reader_2.CLEANER(text)
+            if cleaned_text != "":
+                lines.append(cleaned_text.strip())
+        return lines, []
+
+
+class MuPDFTextReader(LineReader):
+    """
+    Reads the lines of page.get_text("text"), the cheapest PyMuPDF mode.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.reader = fitz.open(path)
+
+    def page_nos(self) -> int:
+        return len(self.reader)
+
+    def page_text(self, page_no: int) -> list[str]:
+        return self.reader.load_page(page_no).get_text("text").splitlines()
+
+    def close(self) -> None:
+        self.reader.close()
+
+
+class MuPDFBlocksReader(MuPDFTextReader):
+    """
+    Reads the lines of the text blocks of page.get_text("blocks"), which keeps the block order of the
+    dict mode without building its spans.
+    """
+
+    def page_text(self, page_no: int) -> list[str]:
+        blocks = self.reader.load_page(page_no).get_text("blocks")
+        # Image blocks have type 1 in the last field
+        return [line for block in blocks if block[6] == 0 for line in block[4].splitlines()]
+
+
+class PypdfReader(LineReader):
+    """
+    Reads the lines of pypdf's extract_text, pure Python and slower than PyMuPDF.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        import pypdf
+        self.file = open(path, "rb")
+        try:
+            self.reader = pypdf.PdfReader(self.file)
+        except BaseException:
+            # A malformed PDF must not leave its file open
+            self.file.close()
+            raise
+
+    def page_nos(self) -> int:
+        return len(self.reader.pages)
+
+    def page_text(self, page_no: int) -> list[str]:
+        return (self.reader.pages[page_no].extract_text() or "").splitlines()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class PyPDF2Reader(PypdfReader):
+    """
+    Reads the lines of PyPDF2's extract_text, the library used by PDF_Reader.
+    """
+
+    def __init__(self, path: str):
+        LineReader.__init__(self, path)
+        import PyPDF2
+        self.file = open(path, "rb")
+        try:
+            self.reader = PyPDF2.PdfReader(self.file)
+        except BaseException:
+            # A malformed PDF must not leave its file open
+            self.file.close()
+            raise
+
+
+BACKENDS: Dict[str, Type] = {
+    "pymupdf-dict": PDF_Reader_2.Reader,
+    "pymupdf-blocks": MuPDFBlocksReader,
+    "pymupdf-text": MuPDFTextReader,
+    "pypdf": PypdfReader,
+    "pypdf2": PyPDF2Reader,
+}
+
+
+def open_reader(path: str, backend: str = DEFAULT_BACKEND) -> PageReader:
+    """
+    Opens a PDF with one of the BACKENDS.
+
+    Args:
+        path (str): The path to the PDF file.
+        backend (str): Name of the backend.
+
+    Returns:
+        PageReader: The open reader, to be closed by the caller or with a with statement.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend: {backend}, expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[backend](path)
+
+
+class ReaderPool:
+    """
+    Bounded pool of open readers, least recently used first.
+
+    Opening the documents of a long batch through the pool keeps at most max_open of them open, so file
+    descriptors and MuPDF memory stay flat instead of growing until the garbage collector closes them.
+    A pool belongs to one process and one thread at a time.
+    """
+
+    def __init__(self, max_open: int = 4, backend: str = DEFAULT_BACKEND):
+        """
+        Initializes an empty pool.
+
+        Args:
+            max_open (int): Maximum number of documents open at once.
+            backend (str): Name of the backend the documents are opened with.
+        """
+        self.max_open = max(1, max_open)
+        self.backend = backend
+        self.readers = OrderedDict()
+        self.opened = 0
+        self.evicted = 0
+
+    def get(self, path: str) -> PageReader:
+        """
+        Returns an open reader for a path, closing the least recently used document beyond the bound.
+
+        Args:
+            path (str): The path to the PDF file.
+
+        Returns:
+            PageReader: The reader, owned by the pool.
+        """
+        if path in self.readers:
+            self.readers.move_to_end(path)
+            return self.readers[path]
+        while len(self.readers) >= self.max_open:
+            _, evicted = self.readers.popitem(last=False)
+            evicted.close()
+            self.evicted += 1
+        reader = open_reader(path, self.backend)
+        self.readers[path] = reader
+        self.opened += 1
+        return reader
+
+    def close(self) -> None:
+        """
+        Closes every open document.
+        """
+        while self.readers:
+            _, reader = self.readers.popitem(last=False)
+            reader.close()
+
+    def __enter__(self) -> "ReaderPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def finds_headings(backend: str) -> bool:
+    """
+    Checks whether a backend detects the section headings needed for section routing.
+
+    Args:
+        backend (str): Name of the backend.
+
+    Returns:
+        bool: True for the PyMuPDF dict mode.
+    """
+    return backend == "pymupdf-dict"
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+import collections
+import multiprocessing
+import multiprocessing.pool
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import fitz
+import PDF_Backends
+from settings import logger
+
+# Readers opened by the current process
+_pool = PDF_Backends.ReaderPool()
+
+# Pages before this one are the cover letter of the summary and are skipped like in PDF_Reader_2
+FIRST_PAGE = 2
+
+# Documents submitted to the pool per worker ahead of the one being yielded
+PENDING_DOCS_PER_WORKER = 2
+
+# Empty pages held back per OCR worker while streaming a document, so they are recognized together on the OCR pool
+OCR_WINDOW_PER_WORKER = 4
+
+
+def _init_worker(max_open_docs: int, backend: str = PDF_Backends.DEFAULT_BACKEND) -> None:
+    """Sets the bound on open documents and the PDF backend of the current process"""
+    global _pool
+    _pool.close()
+    _pool = PDF_Backends.ReaderPool(max_open_docs, backend)
+
+
+def _close_readers() -> None:
+    """Closes every document opened by the current process"""
+    _pool.close()
+
+
+def _reader(path: str) -> PDF_Backends.PageReader:
+    """Returns an open reader for a path, closing the least recently used document beyond the bound"""
+    return _pool.get(path)
+
+
+def _extract_range(task: Tuple[int, str, int, int]) -> Tuple[int, int, Optional[List[tuple]], Optional[str]]:
+    """Extracts the lines and headings of pages [start, end) of a document, errors are returned rather than raised"""
+    doc_index, path, start, end = task
+    try:
+        reader = _reader(path)
+        return doc_index, start, [reader.page_content(i) for i in range(start, end)], None
+    except Exception as e:
+        return doc_index, start, None, f"{type(e).__name__}: {e}"
+
+
+def tag_sections(pages: Iterable[Tuple[List[str], list]]) -> Iterator[Tuple[int, str, str]]:
+    """
+    Tags every line of a document with the section it belongs to, lines before the first heading have an
+    empty section. Once a numbered heading was seen the other headings only name subsections, written as
+    "section / subsection", so bold labels and table headers do not split the numbered sections.
+
+    Args:
+        pages (Iterable[Tuple[List[str], list]]): Lines and (line index, level, heading) of each page from FIRST_PAGE on.
+
+    Returns:
+        Iterator[Tuple[int, str, str]]: (page number, line, section) of every line in reading order.
+    """
+    section = ""
+    parent = ""
+    for page_no, (lines, headings) in enumerate(pages, FIRST_PAGE):
+        starts = {index: (level, heading) for index, level, heading in headings}
+        for i, line in enumerate(lines):
+            if i in starts:
+                level, heading = starts[i]
+                if level == 1:
+                    parent = section = heading
+                else:
+                    section = f"{parent} / {heading}" if parent else heading
+            yield page_no, line, section
+
+
+class Extractor:
+    """
+    Extracts the text of PDF summaries on a pool of worker processes.
+
+    Documents are split into ranges of pages and the ranges of the next PENDING_DOCS_PER_WORKER documents
+    per worker are spread over the workers, so a single long document and a batch of short ones both keep
+    every worker busy while memory does not grow with the batch. Each worker keeps at most max_open_docs
+    documents open. Results are merged back in document and page order, so the output is the same as
+    reading the documents one by one with the reader of the backend. Documents are looked up in the text
+    cache as they are reached and those found there are not opened at all. Pages left without lines are passed to the OCR
+    fallback, if any, before documents are stored in the cache.
+    """
+
+    def __init__(self, workers: int = 1, max_open_docs: int = 4, pages_per_task: int = 8, cache=None,
+                 backend: str = PDF_Backends.DEFAULT_BACKEND, ocr=None):
+        """
+        Initializes the extractor.
+
+        Args:
+            workers (int): Number of worker processes, 1 extracts in the calling process.
+            max_open_docs (int): Maximum number of documents open at once in each process.
+            pages_per_task (int): Number of pages extracted by a worker in one task.
+            cache (Text_Cache.TextCache): Cache of extracted text, None to always extract.
+            backend (str): Name of the PDF reader in PDF_Backends.BACKENDS.
+            ocr (OCR.OCRFallback): Recognizes the pages of scanned documents, None to leave them empty.
+        """
+        if backend not in PDF_Backends.BACKENDS:
+            raise ValueError(f"Unknown PDF backend: {backend}")
+        self.workers = max(1, workers)
+        self.max_open_docs = max(1, max_open_docs)
+        self.pages_per_task = max(1, pages_per_task)
+        self.cache = cache
+        self.backend = backend
+        self.ocr = ocr
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.pool = None
+
+    def __document(self, doc_index: int, path: str) -> Tuple[Optional[tuple], Optional[List[Tuple[int, str, int, int]]]]:
+        """
+        Looks up a document in the cache, or splits it into page ranges.
+
+        Args:
+            doc_index (int): Index of the document in the batch.
+            path (str): Path of the document.
+
+        Returns:
+            Tuple[Optional[tuple], Optional[List[Tuple[int, str, int, int]]]]: The cached pages and headings, or
+            (document index, path, first page, end page) of every task of the document. Both are None for an
+            unreadable document.
+        """
+        if self.cache is not None:
+            text = self.cache.get(path, self.backend)
+            if text is not None:
+                self.cache_hits += 1
+                return text, None
+            self.cache_misses += 1
+        try:
+            # Opening only parses the cross reference table, pages are not loaded
+            with fitz.open(path) as document:
+                page_count = document.page_count
+        except Exception as e:
+            logger.error(f"Could not open {path}: {e}")
+            return None, None
+        return None, [(doc_index, path, start, min(start + self.pages_per_task, page_count))
+                      for start in range(FIRST_PAGE, page_count, self.pages_per_task)]
+
+    def __pool(self) -> multiprocessing.pool.Pool:
+        """
+        Returns the worker pool, starting it on first use.
+
+        Returns:
+            multiprocessing.pool.Pool: Pool of forked workers.
+        """
+        if self.pool is None:
+            context = multiprocessing.get_context("fork")
+            self.pool = context.Pool(self.workers, initializer=_init_worker, initargs=(self.max_open_docs, self.backend))
+        return self.pool
+
+    def iter_documents(self, paths: List[str], mode: str = "paragraphs") -> Iterator[Optional[list]]:
+        """
+        Extracts documents and yields their text in the order of paths as soon as each one is complete.
+
+        Args:
+            paths (List[str]): Paths of the documents.
+            mode (str): "paragraphs" for the output of Reader.extract_paragraphs, "lines" for Reader.extract_lines,
+                "sections" for (page number, line, section), see tag_sections.
+
+        Yields:
+            Optional[list]: The paragraphs or lines of each document, None if it could not be read.
+        """
+        if mode not in ("paragraphs", "lines", "sections"):
+            raise ValueError(f"Unknown extraction mode: {mode}")
+
+        # Documents are looked up in the cache and opened only as they are reached
+        documents = (self.__document(doc_index, path) for doc_index, path in enumerate(paths))
+        if self.workers <= 1:
+            _init_worker(self.max_open_docs, self.backend)
+            try:
+                for path, (cached, tasks) in zip(paths, documents):
+                    yield self.__finish(path, cached, None if tasks is None else list(map(_extract_range, tasks)), mode)
+            finally:
+                _close_readers()
+            return
+
+        # Only a window of documents ahead of the one being yielded is submitted, so neither the queued tasks
+        # nor the finished results waiting to be merged grow with the batch
+        window = collections.deque()
+        for path, (cached, tasks) in zip(paths, documents):
+            results = None if tasks is None else [self.__pool().apply_async(_extract_range, (task,)) for task in tasks]
+            window.append((path, cached, results))
+            if len(window) < self.workers * PENDING_DOCS_PER_WORKER:
+                continue
+            path, cached, results = window.popleft()
+            yield self.__finish(path, cached, None if results is None else [result.get() for result in results], mode)
+        while window:
+            path, cached, results = window.popleft()
+            yield self.__finish(path, cached, None if results is None else [result.get() for result in results], mode)
+
+    def __finish(self, path: str, cached: Optional[tuple], results: Optional[list], mode: str) -> Optional[list]:
+        """
+        Merges the page ranges of a document in page order and stores a new document in the cache.
+
+        Args:
+            path (str): Path of the document.
+            cached (Optional[tuple]): Pages and headings of the document if it was found in the cache.
+            results (Optional[list]): Outputs of _extract_range for every task of the document, None if it could not be opened.
+            mode (str): Output format, see iter_documents.
+
+        Returns:
+            Optional[list]: The text of the document, None if it could not be read.
+        """
+        if cached is not None:
+            return self.__assemble(*cached, mode)
+        if results is None:
+            return None
+        failed = False
+        for _, start, _, error in results:
+            if error is not None:
+                logger.error(f"Extraction of pages {start}+ of {path} failed: {error}")
+                failed = True
+        if failed:
+            return None
+        content = [page for _, _, pages, _ in sorted(results, key=lambda result: result[1]) for page in pages]
+        if self.ocr is not None:
+            content = self.ocr.fill(path, content, FIRST_PAGE)
+        pages = [lines for lines, _ in content]
+        headings = [page_headings for _, page_headings in content]
+        if self.cache is not None:
+            self.cache.put(path, pages, headings, backend=self.backend)
+        return self.__assemble(pages, headings, mode)
+
+    @staticmethod
+    def __assemble(pages: List[List[str]], headings: List[list], mode: str) -> list:
+        """
+        Formats the pages of a document.
+
+        Args:
+            pages (List[List[str]]): Lines of each page from FIRST_PAGE on.
+            headings (List[list]): (line index, level, heading) of the section headings of each page.
+            mode (str): Output format, see iter_documents.
+
+        Returns:
+            list: The paragraphs, (page number, line) or (page number, line, section) of the document.
+        """
+        if mode == "paragraphs":
+            return ["".join(line + "\n" for line in lines) for lines in pages]
+        if mode == "sections":
+            return [item for item in tag_sections(zip(pages, headings)) if item[1]]
+        return [(page_no, line) for page_no, lines in enumerate(pages, FIRST_PAGE) for line in lines if line]
+
+    def iter_pages(self, path: str) -> Iterator[Tuple[List[str], list]]:
+        """
+        Reads the lines of a document one page at a time in the calling thread, the whole document is stored
+        in the cache once the last page is read.
+
+        Args:
+            path (str): Path of the document.
+
+        Returns:
+            Iterator[Tuple[List[str], list]]: Cleaned lines and (line index, level, heading) of the section headings
+            of each page from FIRST_PAGE on.
+        """
+        if self.cache is not None:
+            text = self.cache.get(path, self.backend)
+            if text is not None:
+                self.cache_hits += 1
+                yield from zip(*text)
+                return
+            self.cache_misses += 1
+
+        # Opened here rather than through _reader, so no other thread shares the document
+        with PDF_Backends.open_reader(path, self.backend) as reader:
+            pages = []
+            # Pages before this index were yielded
+            done = 0
+            window = OCR_WINDOW_PER_WORKER * self.ocr.workers if self.ocr is not None else 1
+            for page_no in range(FIRST_PAGE, reader.page_nos()):
+                pages.append(reader.page_content(page_no))
+                if self.ocr is not None:
+                    if not pages[-1][0] and len(pages) - done < window:
+                        continue
+                    pages[done:] = self.ocr.fill(path, pages[done:], FIRST_PAGE + done)
+                yield from pages[done:]
+                done = len(pages)
+            if done < len(pages):
+                pages[done:] = self.ocr.fill(path, pages[done:], FIRST_PAGE + done)
+                yield from pages[done:]
+        if self.cache is not None:
+            self.cache.put(path, [lines for lines, _ in pages], [headings for _, headings in pages],
+                           backend=self.backend)
+
+    def extract(self, path: str, mode: str = "paragraphs") -> Optional[list]:
+        """
+        Extracts a single document, spreading its pages over the workers.
+
+        Args:
+            path (str): Path of the document.
+            mode (str): Output format, see iter_documents.
+
+        Returns:
+            Optional[list]: The paragraphs or lines of the document, None if it could not be read.
+        """
+        return next(self.iter_documents([path], mode))
+
+    def extract_many(self, paths: List[str], mode: str = "paragraphs") -> List[Optional[list]]:
+        """
+        Extracts a batch of documents.
+
+        Args:
+            paths (List[str]): Paths of the documents.
+            mode (str): Output format, see iter_documents.
+
+        Returns:
+            List[Optional[list]]: The text of each document in the order of paths.
+        """
+        return list(self.iter_documents(paths, mode))
+
+    def close(self) -> None:
+        """
+        Stops the worker pool and the OCR pool.
+        """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        if self.ocr is not None:
+            self.ocr.close()
@@ -49,7 +49,7 @@ class Reader:
 
     def extract_table(self, pg_no):
 
-        table = Table_Reader.tables(self.path, pg_no)
+        table = Table_Reader.Table_Reader().tables(self.path, pg_no)
         return table
 
     def remove_non_ascii(text):
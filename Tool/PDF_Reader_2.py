@@ -1,6 +1,65 @@
 #!/usr/bin/env python3
 import fitz
 import re
+from typing import Iterator, Optional
+
+
+class Cleaner:
+    """
+    Replaces characters and patterns of a text in a single pass.
+
+    Characters are first mapped through a str.translate table, then all patterns are joined into one
+    precompiled alternation. Joining gives the same result as applying the patterns one after another
+    only when no two patterns can match at the same position and no replacement can form a new
+    match, which holds for the patterns of CLEANER since they start with disjoint characters and
+    are replaced by spaces.
+    """
+
+    def __init__(self, patterns: list[str], replacement: str = " ", translation: dict = None):
+        """
+        Compiles the cleaner.
+
+        Args:
+            patterns (list[str]): Regular expressions to replace, leftmost match wins at equal positions.
+            replacement (str): Text each match is replaced with.
+            translation (dict): Characters to map before the patterns are applied.
+        """
+        self.table = str.maketrans(translation or {})
+        self.pattern = re.compile("|".join(f"(?:{p})" for p in patterns))
+        self.replacement = replacement
+
+    def __call__(self, text: str) -> str:
+        """
+        Cleans a text.
+
+        Args:
+            text (str): The text to be cleaned.
+
+        Returns:
+            str: The cleaned text, empty for None or blank input.
+        """
+        if text is None or text.strip() == "":
+            return ""
+        return self.pattern.sub(self.replacement, text.translate(self.table))
+
+
+# Non-ASCII characters, submission numbers, punctuation and grammar-related words, in the order the
+# original four passes removed them. Newlines are mapped one by one so they never merge into a
+# punctuation run.
+CLEANER = Cleaner(
+    [r"[^\x00-\x7F]", r"[Kk][0-9]+", r"[,;:.\t\r)(*%]+", r"the", r"an"],
+    translation={"\n": " "},
+)
+
+# A line is a section heading when it is bold or at least this many points larger than the body text
+HEADING_SIZE_DELTA = 1.5
+# Headings are short, longer bold lines are emphasised sentences
+HEADING_MAX_WORDS = 12
+# Headings start at or left of the margin of the body text, bold cells of tables further right are not headings
+HEADING_MAX_INDENT = 4
+# Numbered headings such as "3. Device Description" or "10 Performance Data" are top level sections, the
+# sizes of pages made of tables are too uneven to rank the others
+NUMBERED_HEADING = re.compile(r"\d{1,2}\.?\s+[A-Z]")
 
 
 class Reader:
@@ -22,6 +81,12 @@ class Reader:
         self.path = path
         self.reader = fitz.open(path)
 
+    def __enter__(self) -> "Reader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
     def page_nos(self) -> int:
         """
         Returns the total number of pages in the PDF.
@@ -29,7 +94,13 @@ class Reader:
         Returns:
             int: The total number of pages in the PDF.
         """
-        return len(self.reader.pages)
+        return len(self.reader)
+
+    def close(self) -> None:
+        """
+        Closes the PDF document.
+        """
+        self.reader.close()
 
     def extract_paragraphs(self) -> list[str]:
         """
@@ -38,112 +109,160 @@ class Reader:
         Returns:
             list[str]: A list of paragraphs extracted from the PDF.
         """
-        paragraphs = []
+        return list(self.iter_paragraphs())
+
+    def iter_paragraphs(self) -> Iterator[str]:
+        """
+        Extracts the paragraphs of the PDF one page at a time.
+
+        Returns:
+            Iterator[str]: The paragraph of each page, read when it is requested.
+        """
         for i in range(2, len(self.reader)):
-            page = self.reader.load_page(i)
             paragraph = ""
-            blocks = page.get_text("dict")["blocks"]
-            for b in blocks:
-                if b["type"] == 0:
-                    for l in b["lines"]:
-                        if (
-                            ("Page" in l["spans"][0]["text"])
-                            or ("Premarket" in l["spans"][0]["text"])
-                            or ("page" in l["spans"][0]["text"])
-                        ):
-                            continue
-                        cleaned_text = self.__clean_paragraph(
-                            l["spans"][0]["text"])
-                        if cleaned_text != "":
-                            paragraph += cleaned_text.strip() + "\n"
-            paragraphs.append(paragraph)
-        return paragraphs
+            for line in self.page_lines(i):
+                paragraph += line + "\n"
+            yield paragraph
 
-    # List of rows of tables obtained from the pdf
-    def extract_tables(self) -> list[list[str]]:
+    def extract_lines(self) -> list[tuple[int, str]]:
         """
-        Extracts and returns a list of rows of tables from the PDF.
+        Extracts and returns the cleaned lines of the PDF with their page numbers.
 
         Returns:
-            list[list[str]]: A list of rows of tables extracted from the PDF.
+            list[tuple[int, str]]: A list of (page number, line) in reading order.
+        """
+        return list(self.iter_lines())
+
+    def iter_lines(self) -> Iterator[tuple[int, str]]:
+        """
+        Extracts the cleaned lines of the PDF one page at a time.
+
+        Returns:
+            Iterator[tuple[int, str]]: (page number, line) in reading order, read when requested.
         """
-        tables = []
         for i in range(2, len(self.reader)):
-            page = self.reader.load_page(i)
-            tables += page.find_tables()  # list of tables on page i
-        for i in range(len(tables)):
-            tables[i] = tables[i].extract()
-            for j in tables[i]:
-                for k in range(len(j)):
-                    j[k] = self.__clean_paragraph(j[k])
-        return tables
+            for line in self.page_lines(i):
+                if line:
+                    yield i, line
 
-    def __clean_paragraph(self, paragraph) -> str:
+    def page_lines(self, page_no: int) -> list[str]:
         """
-        Cleans the given paragraph by removing non-ASCII characters, specific substrings, punctuation, and grammar-related words.
+        Extracts the cleaned, non empty lines of a page, skipping page headers and footers.
 
         Args:
-            paragraph (str): The paragraph to be cleaned.
+            page_no (int): The page number.
 
         Returns:
-            str: The cleaned paragraph.
+            list[str]: The cleaned lines of the page.
         """
-        if paragraph == None or paragraph.strip() == "":
-            return ""
-        paragraph = self.__remove_non_ascii(paragraph)
-        paragraph = self.__remove_sub_no(paragraph)
-        paragraph = self.__remove_punc(paragraph)
-        paragraph = self.__remove_grammar(paragraph)
-        # add more cleaning functions here
-        return paragraph
+        return self.page_content(page_no)[0]
 
-    def __remove_punc(self, text: str) -> str:
+    def page_content(self, page_no: int) -> tuple[list[str], list[tuple[int, int, str]]]:
         """
-        Removes punctuation from the given text.
+        Extracts the cleaned lines of a page together with the section headings among them, detected
+        from the font size and weight of the spans.
 
         Args:
-            text (str): The text to be cleaned.
+            page_no (int): The page number.
 
         Returns:
-            str: The cleaned text without punctuation.
+            tuple[list[str], list[tuple[int, int, str]]]: The cleaned lines of the page and (line index, level,
+            heading) of every line that starts a section, level 1 for numbered headings and 2 for the others.
         """
-        text = text.replace("\n", " ")
-        return re.sub("[,;:.\n\t\r)(*%]+", " ", text)
+        lines = []
+        headings = []
+        page = self.reader.load_page(page_no)
+        blocks = page.get_text("dict")["blocks"]
+        body_size, margin = self.__body_style(blocks)
+        for b in blocks:
+            if b["type"] == 0:
+                for l in b["lines"]:
+                    if (
+                        ("Page" in l["spans"][0]["text"])
+                        or ("Premarket" in l["spans"][0]["text"])
+                        or ("page" in l["spans"][0]["text"])
+                    ):
+                        continue
+                    cleaned_text = self.__clean_paragraph(
+                        l["spans"][0]["text"])
+                    if cleaned_text != "":
+                        if l["bbox"][0] <= margin + HEADING_MAX_INDENT:
+                            heading = self.__heading(l["spans"], body_size)
+                            if heading is not None:
+                                headings.append((len(lines), *heading))
+                        lines.append(cleaned_text.strip())
+        return lines, headings
 
-    def __remove_grammar(self, text: str) -> str:
+    @staticmethod
+    def __body_style(blocks: list) -> tuple[float, float]:
         """
-        Removes specific grammar-related words from the given text.
+        Finds the font size and left margin of the body text of a page.
 
         Args:
-            text (str): The text to be cleaned.
+            blocks (list): The blocks of page.get_text("dict").
 
         Returns:
-            str: The cleaned text without grammar-related words.
+            tuple[float, float]: The size and line start covering the most characters, 0 for a page without text.
         """
-        text = re.sub(r"the", " ", text)
-        text = re.sub(r"an", " ", text)
-        return text
+        sizes = {}
+        margins = {}
+        for b in blocks:
+            if b["type"] == 0:
+                for l in b["lines"]:
+                    margin = round(l["bbox"][0])
+                    for s in l["spans"]:
+                        size = round(s["size"], 1)
+                        sizes[size] = sizes.get(size, 0) + len(s["text"].strip())
+                        margins[margin] = margins.get(margin, 0) + len(s["text"].strip())
+        if not sizes:
+            return 0.0, 0.0
+        return max(sizes, key=sizes.get), max(margins, key=margins.get)
 
-    def __remove_sub_no(self, text: str) -> str:
+    def __heading(self, spans: list, body_size: float) -> Optional[tuple[int, str]]:
         """
-        Removes specific substrings from the given text.
+        Checks whether a line is a section heading.
 
         Args:
-            text (str): The text to be cleaned.
+            spans (list): The spans of the line.
+            body_size (float): Font size of the body text of the page.
 
         Returns:
-            str: The cleaned text without specific substrings.
+            Optional[tuple[int, str]]: The level and the cleaned text of all spans of the line, None if the
+            line is not a heading.
+        """
+        spans = [s for s in spans if s["text"].strip()]
+        if not spans:
+            return None
+        bold = all(s["flags"] & 16 or "bold" in s["font"].lower() for s in spans)
+        large = max(s["size"] for s in spans) >= body_size + HEADING_SIZE_DELTA
+        text = " ".join(s["text"].strip() for s in spans)
+        if (not (bold or large) or text[0].islower() or text.endswith(".")
+                or sum(c.isalpha() for c in text) < 3):
+            return None
+        heading = " ".join(self.__clean_paragraph(text).split())
+        if not 0 < len(heading.split()) <= HEADING_MAX_WORDS:
+            return None
+        return (1 if NUMBERED_HEADING.match(text) else 2), heading
+
+    # List of rows of tables obtained from the pdf
+    def extract_tables(self) -> list[list[str]]:
         """
-        return re.sub(r"[Kk][0-9]+", " ", text)
+        Extracts and returns a list of rows of tables from the PDF.
 
-    def __remove_non_ascii(self, text: str) -> str:
+        Returns:
+            list[list[str]]: A list of rows of tables extracted from the PDF.
         """
-        Removes non-ASCII characters from the given text.
+        import Table_Reader
+        return [table["rows"] for table in Table_Reader.Table_Reader().document_tables(self.path)]
+
+    def __clean_paragraph(self, paragraph) -> str:
+        """
+        Cleans the given paragraph by removing non-ASCII characters, specific substrings, punctuation, and grammar-related words.
 
         Args:
-            text (str): The text to be cleaned.
+            paragraph (str): The paragraph to be cleaned.
 
         Returns:
-            str: The cleaned text without non-ASCII characters.
+            str: The cleaned paragraph.
         """
-        return re.sub(r"[^\x00-\x7F]", " ", text)
+        return CLEANER(paragraph)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+import hashlib
+import os
+import sqlite3
+import time
+from settings import logger
+from typing import Dict, List, Tuple
+
+
+class QACache:
+    """
+    Persistent cache of extractive question answering results stored in SQLite.
+
+    Entries are keyed by model, question and the sha256 of the paragraph and hold the best
+    (score, answer) found for the pair, before any score threshold is applied. When the cache
+    grows beyond max_entries the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str, max_entries: int = 500000):
+        """
+        Initializes the cache at the given database path.
+
+        Args:
+            path (str): Path to the SQLite database file, created if missing.
+            max_entries (int): Maximum number of cached answers kept on disk.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.connection = None
+        self.pid = None
+
+    def __connect(self) -> sqlite3.Connection:
+        """
+        Returns the connection of the current process, opening it if needed.
+
+        Returns:
+            sqlite3.Connection: Connection to the cache database.
+        """
+        # Connections must not be shared with forked processes
+        if self.connection is None or self.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.connection = sqlite3.connect(self.path, timeout=30)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "model TEXT NOT NULL, question TEXT NOT NULL, paragraph TEXT NOT NULL, "
+                "score REAL NOT NULL, answer TEXT NOT NULL, last_used REAL NOT NULL, "
+                "PRIMARY KEY (model, question, paragraph))"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used)")
+            self.connection.commit()
+            self.pid = os.getpid()
+        return self.connection
+
+    @staticmethod
+    def paragraph_hash(paragraph: str) -> str:
+        """
+        Hashes a paragraph for use as cache key.
+
+        Args:
+            paragraph (str): The paragraph text.
+
+        Returns:
+            str: Hex sha256 digest of the paragraph.
+        """
+        return hashlib.sha256(paragraph.encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, pairs: List[Tuple[str, str]]) -> Dict[int, Tuple[float, str]]:
+        """
+        Looks up cached answers for (question, paragraph) pairs.
+
+        Args:
+            model (str): Key of the model that produced the answers.
+            pairs (List[Tuple[str, str]]): The (question, paragraph) pairs to look up.
+
+        Returns:
+            Dict[int, Tuple[float, str]]: Cached (score, answer) by index of the pair, misses are absent.
+        """
+        found = {}
+        try:
+            connection = self.__connect()
+            now = time.time()
+            for index, (question, paragraph) in enumerate(pairs):
+                key = (model, question, self.paragraph_hash(paragraph))
+                row = connection.execute(
+                    "SELECT score, answer FROM answers WHERE model=? AND question=? AND paragraph=?", key
+                ).fetchone()
+                if row is not None:
+                    found[index] = (row[0], row[1])
+                    connection.execute(
+                        "UPDATE answers SET last_used=? WHERE model=? AND question=? AND paragraph=?", (now,) + key
+                    )
+            connection.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"QA cache lookup failed: {e}")
+        return found
+
+    def put_many(self, model: str, entries: List[Tuple[str, str, Tuple[float, str]]]) -> None:
+        """
+        Stores answers and evicts the least recently used entries beyond the size bound.
+
+        Args:
+            model (str): Key of the model that produced the answers.
+            entries (List[Tuple[str, str, Tuple[float, str]]]): (question, paragraph, (score, answer)) to store.
+        """
+        if not entries:
+            return
+        try:
+            connection = self.__connect()
+            now = time.time()
+            connection.executemany(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (model, question, self.paragraph_hash(paragraph), float(result[0]), str(result[1]), now)
+                    for question, paragraph, result in entries
+                ],
+            )
+            count = connection.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            if count > self.max_entries:
+                connection.execute(
+                    "DELETE FROM answers WHERE rowid IN "
+                    "(SELECT rowid FROM answers ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+                logger.debug(f"QA cache evicted {count - self.max_entries} entries")
+            connection.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"QA cache update failed: {e}")
+
+    def close(self) -> None:
+        """
+        Closes the connection of the current process.
+        """
+        if self.connection is not None and self.pid == os.getpid():
+            self.connection.close()
+        self.connection = None
+        self.pid = None
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+import numpy as np
+import torch
+from settings import logger
+from typing import List, NamedTuple, Optional, Tuple
+
+
+class Feature(NamedTuple):
+    """One model input window of a (question, context) pair"""
+    pair: int
+    context: str
+    input_ids: List[int]
+    token_type_ids: List[int]
+    context_start: int  # Position of the first context token in input_ids
+    window_start: int  # Position of the first window token in the context encoding
+    window_len: int  # Number of context tokens in the window
+
+
+class QAEngine:
+    """
+    Extractive question answering engine scheduling many (question, context) pairs together.
+
+    Every distinct question and context is tokenized only once. The context encoding is then
+    windowed and combined with each question's ids, so asking several questions over the same
+    document does not re-tokenize its paragraphs. Scoring follows the transformers
+    question-answering pipeline so scores stay comparable with the 1e-2 threshold.
+    """
+
+    def __init__(self, model, tokenizer, batch_size: int = 16, max_seq_len: int = 384,
+                 doc_stride: int = 128, max_answer_len: int = 15):
+        """
+        Initializes the engine with an already loaded model and fast tokenizer.
+
+        Args:
+            model (transformers.PreTrainedModel | QA_Onnx.OnnxQAModel): Model with a question answering head.
+            tokenizer (transformers.PreTrainedTokenizerFast): Tokenizer of the model.
+            batch_size (int): Number of windows per forward pass.
+            max_seq_len (int): Maximum length of a window including question and special tokens.
+            doc_stride (int): Number of overlapping context tokens between consecutive windows.
+            max_answer_len (int): Maximum length of an answer span in tokens.
+        """
+        self.model = model
+        self.tokenizer = tokenizer
+        self.batch_size = max(1, batch_size)
+        self.max_seq_len = min(max_seq_len, tokenizer.model_max_length)
+        self.doc_stride = doc_stride
+        self.max_answer_len = max_answer_len
+        self.use_token_type_ids = "token_type_ids" in tokenizer.model_input_names
+        if isinstance(self.model, torch.nn.Module):
+            self.model.eval()
+
+    def run(self, pairs: List[Tuple[str, str]]) -> List[Optional[Tuple[float, str]]]:
+        """
+        Answers every (question, context) pair.
+
+        Args:
+            pairs (List[Tuple[str, str]]): The (question, context) pairs to answer.
+
+        Returns:
+            List[Optional[Tuple[float, str]]]: Best (score, answer) for each pair in input order,
+            None when no answer could be computed.
+        """
+        question_ids = {}
+        context_encodings = {}
+        features = []
+        for index, (question, context) in enumerate(pairs):
+            if question not in question_ids:
+                question_ids[question] = self.tokenizer(question, add_special_tokens=False)["input_ids"]
+            if context not in context_encodings:
+                context_encodings[context] = self.tokenizer(
+                    context, add_special_tokens=False, return_offsets_mapping=True, verbose=False
+                ).encodings[0]
+            features.extend(self.__build_features(index, question_ids[question], context, context_encodings[context]))
+
+        logger.debug(f"Scheduling {len(features)} windows for {len(pairs)} question-context pairs")
+
+        best: List[Optional[Tuple[float, str]]] = [None] * len(pairs)
+
+        # Length bucketing keeps padding inside a batch small
+        order = sorted(range(len(features)), key=lambda i: len(features[i].input_ids))
+        for start in range(0, len(order), self.batch_size):
+            batch = [features[i] for i in order[start:start + self.batch_size]]
+            try:
+                start_logits, end_logits = self.__forward(batch)
+            except Exception as e:
+                logger.warning(f"Error processing batch of {len(batch)} windows: {e}")
+                continue
+            for feature, feature_start, feature_end in zip(batch, start_logits, end_logits):
+                score, answer = self.__decode(
+                    feature, context_encodings[feature.context], feature_start, feature_end)
+                if best[feature.pair] is None or score > best[feature.pair][0]:
+                    best[feature.pair] = (score, answer)
+
+        return best
+
+    def __build_features(self, index: int, question_ids: List[int], context: str, encoding) -> List[Feature]:
+        """
+        Splits a context encoding into overlapping windows prefixed with the question.
+
+        Args:
+            index (int): Index of the pair the windows belong to.
+            question_ids (List[int]): Token ids of the question.
+            context (str): The context text.
+            encoding (tokenizers.Encoding): Encoding of the context without special tokens.
+
+        Returns:
+            List[Feature]: Model input windows for the pair.
+        """
+        context_ids = encoding.ids
+        if not context_ids:
+            return []
+
+        window = self.max_seq_len - len(question_ids) - self.tokenizer.num_special_tokens_to_add(pair=True)
+        if window <= 0:
+            logger.warning("Question too long for the model window, skipping")
+            return []
+        step = max(1, window - self.doc_stride)
+
+        # Marker id to locate where the context starts once special tokens are added
+        context_start = self.tokenizer.build_inputs_with_special_tokens(question_ids, [-1]).index(-1)
+
+        features = []
+        window_start = 0
+        while True:
+            window_ids = context_ids[window_start:window_start + window]
+            features.append(Feature(
+                pair=index,
+                context=context,
+                input_ids=self.tokenizer.build_inputs_with_special_tokens(question_ids, window_ids),
+                token_type_ids=self.tokenizer.create_token_type_ids_from_sequences(question_ids, window_ids),
+                context_start=context_start,
+                window_start=window_start,
+                window_len=len(window_ids),
+            ))
+            if window_start + window >= len(context_ids):
+                break
+            window_start += step
+        return features
+
+    def __forward(self, batch: List[Feature]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Runs the model on a padded batch of windows.
+
+        Args:
+            batch (List[Feature]): Windows to run.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Start and end logits of shape (batch, padded length).
+        """
+        length = max(len(f.input_ids) for f in batch)
+        pad_id = self.tokenizer.pad_token_id or 0
+        inputs = {
+            "input_ids": np.array(
+                [f.input_ids + [pad_id] * (length - len(f.input_ids)) for f in batch], dtype=np.int64),
+            "attention_mask": np.array(
+                [[1] * len(f.input_ids) + [0] * (length - len(f.input_ids)) for f in batch], dtype=np.int64),
+        }
+        if self.use_token_type_ids:
+            inputs["token_type_ids"] = np.array(
+                [f.token_type_ids + [0] * (length - len(f.token_type_ids)) for f in batch], dtype=np.int64)
+
+        # Non torch backends such as QA_Onnx.OnnxQAModel take and return numpy arrays
+        if not isinstance(self.model, torch.nn.Module):
+            return self.model(inputs)
+
+        with torch.inference_mode():
+            output = self.model(**{name: torch.from_numpy(array) for name, array in inputs.items()})
+        return output.start_logits.float().numpy(), output.end_logits.float().numpy()
+
+    def __decode(self, feature: Feature, encoding, start_logits: np.ndarray,
+                 end_logits: np.ndarray) -> Tuple[float, str]:
+        """
+        Finds the best answer span of a window the same way the transformers pipeline does.
+
+        Args:
+            feature (Feature): The window.
+            encoding (tokenizers.Encoding): Encoding of the window's context.
+            start_logits (np.ndarray): Start logits of the window.
+            end_logits (np.ndarray): End logits of the window.
+
+        Returns:
+            Tuple[float, str]: Score and text of the best answer span.
+        """
+        length = len(feature.input_ids)
+        window_len = feature.window_len
+
+        # Only context tokens and the CLS token take part in the softmax
+        desired = np.zeros(length, dtype=bool)
+        desired[feature.context_start:feature.context_start + window_len] = True
+        if self.tokenizer.cls_token_id is not None:
+            desired[np.array(feature.input_ids) == self.tokenizer.cls_token_id] = True
+
+        start = np.where(desired, start_logits[:length], -10000.0)
+        end = np.where(desired, end_logits[:length], -10000.0)
+        start = np.exp(start - start.max())
+        start = start / start.sum()
+        end = np.exp(end - end.max())
+        end = end / end.sum()
+        start[0] = end[0] = 0.0  # Mask CLS
+
+        candidates = np.tril(np.triu(np.outer(start, end)), self.max_answer_len - 1)
+        span_start, span_end = np.unravel_index(np.argmax(candidates), candidates.shape)
+        score = float(candidates[span_start, span_end])
+
+        first = span_start - feature.context_start
+        last = span_end - feature.context_start
+        if first < 0 or last >= window_len:
+            return 0.0, ""
+
+        token_start = feature.window_start + first
+        token_end = feature.window_start + last
+        char_start = encoding.offsets[token_start][0]
+        char_end = encoding.offsets[token_end][1]
+
+        # Align the answer to whole words like the pipeline does
+        start_word = encoding.word_ids[token_start]
+        end_word = encoding.word_ids[token_end]
+        if start_word is not None and end_word is not None:
+            start_chars = encoding.word_to_chars(start_word)
+            end_chars = encoding.word_to_chars(end_word)
+            if start_chars and end_chars:
+                char_start, char_end = start_chars[0], end_chars[1]
+
+        return score, feature.context[char_start:char_end]
+
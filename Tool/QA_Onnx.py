@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+import inspect
+import os
+import sys
+import time
+import numpy as np
+import torch
+import transformers
+import settings
+import QA_Engine
+from settings import logger
+from typing import Dict, List, Tuple
+
+
+class _ExportWrapper(torch.nn.Module):
+    """Exposes positional inputs and a (start_logits, end_logits) output for ONNX export"""
+
+    def __init__(self, model, use_token_type_ids: bool):
+        super().__init__()
+        self.model = model
+        self.use_token_type_ids = use_token_type_ids
+
+    def forward(self, input_ids, attention_mask, token_type_ids=None):
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if self.use_token_type_ids:
+            inputs["token_type_ids"] = token_type_ids
+        output = self.model(**inputs)
+        return output.start_logits, output.end_logits
+
+
+class OnnxQAModel:
+    """
+    Question answering model running through ONNX Runtime on the CPU.
+
+    Instances are callable with the numpy inputs built by QA_Engine.QAEngine and return the
+    start and end logits, so they can be used in place of the PyTorch model.
+    """
+
+    def __init__(self, path: str, threads: int = 0):
+        """
+        Loads an exported model into an ONNX Runtime session.
+
+        Args:
+            path (str): Path to the .onnx file.
+            threads (int): Intra op threads of the session, 0 lets ONNX Runtime decide.
+        """
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.path = path
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def __call__(self, inputs: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Runs the model.
+
+        Args:
+            inputs (Dict[str, np.ndarray]): int64 arrays of shape (batch, length) by input name.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Start and end logits of shape (batch, length).
+        """
+        start_logits, end_logits = self.session.run(
+            ["start_logits", "end_logits"], {name: inputs[name] for name in self.input_names})
+        return start_logits, end_logits
+
+
+def onnx_path(model_name: str, quantize: bool) -> str:
+    """
+    Returns where the ONNX export of a model is stored.
+
+    Args:
+        model_name (str): Name of the transformers model.
+        quantize (bool): Whether the int8 quantized export is meant.
+
+    Returns:
+        str: Path to the .onnx file inside settings.ONNX_DIR.
+    """
+    name = model_name.replace("/", "__")
+    return os.path.join(settings.ONNX_DIR, f"{name}{'-int8' if quantize else ''}.onnx")
+
+
+def export_model(model, tokenizer, path: str) -> str:
+    """
+    Exports a question answering model to ONNX with dynamic batch and sequence axes.
+
+    Args:
+        model (transformers.PreTrainedModel): Model with a question answering head.
+        tokenizer (transformers.PreTrainedTokenizerFast): Tokenizer of the model.
+        path (str): Output path of the .onnx file.
+
+    Returns:
+        str: The output path.
+    """
+    logger.info(f"Exporting {model.name_or_path} to ONNX at {path}...")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    use_token_type_ids = "token_type_ids" in tokenizer.model_input_names
+    input_names = ["input_ids", "attention_mask"] + (["token_type_ids"] if use_token_type_ids else [])
+
+    sample = tokenizer("What are the algorithms used?", "The device uses a neural network.", return_tensors="pt")
+    args = tuple(sample[name] for name in input_names)
+    axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["start_logits", "end_logits"]}
+
+    kwargs = {}
+    # Newer torch releases default to the dynamo exporter which handles dynamic_axes differently
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        kwargs["dynamo"] = False
+
+    model.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            _ExportWrapper(model, use_token_type_ids),
+            args,
+            path,
+            input_names=input_names,
+            output_names=["start_logits", "end_logits"],
+            dynamic_axes=axes,
+            opset_version=14,
+            **kwargs,
+        )
+    logger.success(f"Exported ONNX model to {path}")
+    return path
+
+
+def quantize_model(path: str, quantized_path: str) -> str:
+    """
+    Applies dynamic int8 quantization to the weights of an ONNX model.
+
+    Args:
+        path (str): Path to the fp32 .onnx file.
+        quantized_path (str): Output path of the quantized model.
+
+    Returns:
+        str: The output path.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    logger.info(f"Quantizing {path} to int8...")
+    quantize_dynamic(path, quantized_path, weight_type=QuantType.QInt8)
+    logger.success(f"Quantized ONNX model saved to {quantized_path}")
+    return quantized_path
+
+
+def load_onnx_model(model, tokenizer, model_name: str, quantize: bool) -> OnnxQAModel:
+    """
+    Loads the ONNX export of a model, exporting and quantizing it first when missing.
+
+    Args:
+        model (transformers.PreTrainedModel): The PyTorch model, used for the export.
+        tokenizer (transformers.PreTrainedTokenizerFast): Tokenizer of the model.
+        model_name (str): Name of the transformers model.
+        quantize (bool): Whether to use dynamic int8 quantization.
+
+    Returns:
+        OnnxQAModel: The model running through ONNX Runtime.
+    """
+    fp32_path = onnx_path(model_name, False)
+    path = onnx_path(model_name, quantize)
+    if not os.path.exists(path):
+        if not os.path.exists(fp32_path):
+            export_model(model, tokenizer, fp32_path)
+        if quantize:
+            quantize_model(fp32_path, path)
+    return OnnxQAModel(path, threads=getattr(settings, 'ONNX_THREADS', 0))
+
+
+def compare_backends(model_name: str, pages: List[str], questions: List[str],
+                     quantize: bool = True) -> Dict[str, float]:
+    """
+    Compares throughput and answers of the ONNX Runtime backend against PyTorch.
+
+    Args:
+        model_name (str): Name of the transformers model.
+        pages (List[str]): Paragraphs to run the questions over.
+        questions (List[str]): Questions to ask.
+        quantize (bool): Whether to compare the int8 quantized export.
+
+    Returns:
+        Dict[str, float]: Pairs per second of both backends, the speedup, the fraction of pairs with the
+        same answer and the mean absolute score difference.
+    """
+    tokenizer = transformers.AutoTokenizer.from_pretrained(model_name)
+    model = transformers.AutoModelForQuestionAnswering.from_pretrained(model_name)
+    onnx_model = load_onnx_model(model, tokenizer, model_name, quantize)
+
+    engine_kwargs = {
+        "batch_size": getattr(settings, 'QA_BATCH_SIZE', 16),
+        "max_seq_len": getattr(settings, 'QA_MAX_SEQ_LEN', 384),
+        "doc_stride": getattr(settings, 'QA_DOC_STRIDE', 128),
+        "max_answer_len": getattr(settings, 'QA_MAX_ANSWER_LEN', 15),
+    }
+    contexts = [p for p in pages if p and p.strip() != ""]
+    pairs = [(question, context) for question in questions for context in contexts]
+
+    timings = {}
+    results = {}
+    for backend, backend_model in (("pytorch", model), ("onnx", onnx_model)):
+        engine = QA_Engine.QAEngine(backend_model, tokenizer, **engine_kwargs)
+        engine.run(pairs[:engine.batch_size])  # Warm up
+        start = time.perf_counter()
+        results[backend] = engine.run(pairs)
+        timings[backend] = time.perf_counter() - start
+
+    agree = 0
+    score_diff = []
+    for reference, candidate in zip(results["pytorch"], results["onnx"]):
+        if reference is None or candidate is None:
+            agree += reference is candidate
+            continue
+        agree += reference[1] == candidate[1]
+        score_diff.append(abs(reference[0] - candidate[0]))
+
+    report = {
+        "pairs": len(pairs),
+        "pytorch_pairs_per_s": len(pairs) / timings["pytorch"] if timings["pytorch"] else 0.0,
+        "onnx_pairs_per_s": len(pairs) / timings["onnx"] if timings["onnx"] else 0.0,
+        "speedup": timings["pytorch"] / timings["onnx"] if timings["onnx"] else 0.0,
+        "answer_agreement": agree / len(pairs) if pairs else 1.0,
+        "mean_score_diff": float(np.mean(score_diff)) if score_diff else 0.0,
+    }
+    logger.info(
+        f"PyTorch: {report['pytorch_pairs_per_s']:.1f} pairs/s | "
+        f"ONNX{' int8' if quantize else ''}: {report['onnx_pairs_per_s']:.1f} pairs/s | "
+        f"Speedup: {report['speedup']:.2f}x | Answer agreement: {report['answer_agreement']:.1%} | "
+        f"Mean score difference: {report['mean_score_diff']:.4f}"
+    )
+    return report
+
+
+if __name__ == "__main__":
+    # Compare the backends over the given summaries, or over the first few in PDF_DIR
+    import PDF_Reader_2
+
+    paths = sys.argv[1:] or sorted(
+        os.path.join(settings.PDF_DIR, f) for f in os.listdir(settings.PDF_DIR) if f.endswith(".pdf")
+    )[:5]
+    pages = []
+    for path in paths:
+        with PDF_Reader_2.Reader(path) as reader:
+            pages.extend(reader.extract_paragraphs())
+    logger.info(f"Comparing backends on {len(pages)} paragraphs from {len(paths)} documents")
+    compare_backends(
+        settings.NLP_MODEL,
+        pages,
+        settings.ALGORITHM_QUESTIONS + [settings.QUESTION_4],
+        quantize=getattr(settings, 'QA_ONNX_QUANTIZE', True),
+    )
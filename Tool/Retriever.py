@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Words carrying no information for the questions we ask
+STOPWORDS = {
+    "a", "and", "are", "as", "at", "be", "by", "does", "for", "from", "in", "is", "it", "of", "on", "or",
+    "that", "this", "to", "used", "was", "were", "what", "which", "with",
+}
+
+# Section of the passages holding table rows, routed like the others but never deciding the fallback
+TABLE_SECTION = "table"
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# PDF_Reader_2 strips every "the" and "an" from the extracted text, doing the same on both sides
+# keeps query terms such as "learning" ("le rning" in the pages) matching
+GRAMMAR_PATTERN = re.compile(r"the|an")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits text into lowercase index terms.
+
+    Args:
+        text (str): The text to tokenize.
+
+    Returns:
+        List[str]: Terms of the text without stopwords and single characters.
+    """
+    text = GRAMMAR_PATTERN.sub(" ", text.lower())
+    return [t for t in TOKEN_PATTERN.findall(text) if len(t) > 1 and t not in STOPWORDS]
+
+
+def section_key(text: str) -> str:
+    """
+    Normalizes a section heading or routing keyword so both compare the same way.
+
+    Args:
+        text (str): The heading or keyword.
+
+    Returns:
+        str: Lowercase words of the text with "the" and "an" stripped like in the extracted pages.
+    """
+    return " ".join(TOKEN_PATTERN.findall(GRAMMAR_PATTERN.sub(" ", text.lower())))
+
+
+class Passage(str):
+    """
+    A context together with the sections of the document its text comes from.
+    """
+
+    def __new__(cls, text: str, sections: Iterable[str] = ()):
+        """
+        Creates the passage.
+
+        Args:
+            text (str): The context text.
+            sections (Iterable[str]): Sections the lines of the text belong to, in order.
+        """
+        passage = super().__new__(cls, text)
+        passage.sections = tuple(sections)
+        return passage
+
+
+def route(contexts: List[str], keywords: List[str]) -> List[str]:
+    """
+    Keeps the contexts coming from the sections a question is about.
+
+    Args:
+        contexts (List[str]): The contexts of a document, Passage for text of the PDF.
+        keywords (List[str]): Words looked up in the section names, e.g. "device description".
+
+    Returns:
+        List[str]: Passages of a section whose name contains one of the keywords together with the contexts
+        that are not passages. All contexts if no section of the text matches, so documents without recognised
+        headings are still analysed in full even when their tables match.
+    """
+    return [contexts[i] for i in route_indices(contexts, keywords)]
+
+
+def route_indices(contexts: List[str], keywords: List[str]) -> List[int]:
+    """
+    Same as route, returning the indices of the kept contexts.
+
+    Args:
+        contexts (List[str]): The contexts of a document, Passage for text of the PDF.
+        keywords (List[str]): Words looked up in the section names.
+
+    Returns:
+        List[int]: Indices of the kept contexts in document order.
+    """
+    keys = section_keys(keywords)
+    if not keys:
+        return list(range(len(contexts)))
+    matches = [section_match(context, keys) for context in contexts]
+    if not any(match for context, match in zip(contexts, matches) if not table_only(context)):
+        return list(range(len(contexts)))
+    return [i for i, match in enumerate(matches) if match is not False]
+
+
+def section_keys(keywords: List[str]) -> List[str]:
+    """
+    Normalizes routing keywords, see section_key.
+
+    Args:
+        keywords (List[str]): Words looked up in the section names.
+
+    Returns:
+        List[str]: The non empty keys.
+    """
+    return [key for key in map(section_key, keywords) if key]
+
+
+def section_match(context: str, keys: List[str]) -> Optional[bool]:
+    """
+    Checks whether a context comes from a section named by one of the keys.
+
+    Args:
+        context (str): A context, Passage for text of the PDF.
+        keys (List[str]): Keys from section_keys.
+
+    Returns:
+        Optional[bool]: Whether one of the sections of the passage matches, None for contexts that are not passages.
+    """
+    if not isinstance(context, Passage):
+        return None
+    return any(key in section_key(section) for section in context.sections for key in keys)
+
+
+def table_only(context: str) -> bool:
+    """
+    Checks whether a context only holds table rows, which never decide the routing fallback.
+
+    Args:
+        context (str): A context, Passage for text of the PDF.
+
+    Returns:
+        bool: True for passages of TABLE_SECTION alone.
+    """
+    return isinstance(context, Passage) and set(context.sections) == {TABLE_SECTION}
+
+
+class BM25Index:
+    """
+    Okapi BM25 index over the paragraphs of a single document.
+    """
+
+    def __init__(self, paragraphs: List[str], k1: float = 1.5, b: float = 0.75):
+        """
+        Builds the index.
+
+        Args:
+            paragraphs (List[str]): The paragraphs to index.
+            k1 (float): Term frequency saturation.
+            b (float): Length normalisation.
+        """
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(tokenize(p)) for p in paragraphs]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+        doc_freqs = Counter()
+        for tf in self.term_freqs:
+            doc_freqs.update(tf.keys())
+        n = len(paragraphs)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freqs.items()}
+
+    def scores(self, query: str) -> List[float]:
+        """
+        Scores every paragraph against a query.
+
+        Args:
+            query (str): The query text.
+
+        Returns:
+            List[float]: BM25 score of each paragraph in index order.
+        """
+        terms = set(tokenize(query))
+        scores = []
+        for tf, length in zip(self.term_freqs, self.lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_length) if self.avg_length else self.k1
+            for term in terms:
+                freq = tf.get(term, 0)
+                if freq:
+                    score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            scores.append(score)
+        return scores
+
+    def top_k(self, query: str, k: int, candidates: Optional[List[int]] = None) -> List[int]:
+        """
+        Returns the indices of the k best matching paragraphs.
+
+        Args:
+            query (str): The query text.
+            k (int): Number of paragraphs to return.
+            candidates (Optional[List[int]]): Indices of the paragraphs to choose from, all by default.
+
+        Returns:
+            List[int]: Indices of the selected paragraphs in document order.
+        """
+        scores = self.scores(query)
+        if candidates is None:
+            candidates = range(len(scores))
+        best = sorted(candidates, key=lambda i: (-scores[i], i))[:k]
+        return sorted(best)
+
+
+class StreamingBM25:
+    """
+    BM25 statistics of the paragraphs of a document updated as they arrive, so paragraphs are scored while
+    the document is still being read. Scores change as paragraphs are added and only compare between
+    paragraphs scored with the same statistics.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Initializes empty statistics.
+
+        Args:
+            k1 (float): Term frequency saturation.
+            b (float): Length normalisation.
+        """
+        self.k1 = k1
+        self.b = b
+        self.doc_freqs = Counter()
+        self.count = 0
+        self.total_length = 0
+
+    def add(self, paragraph: str) -> Counter:
+        """
+        Adds a paragraph to the statistics.
+
+        Args:
+            paragraph (str): The paragraph.
+
+        Returns:
+            Counter: Term frequencies of the paragraph, to score it with.
+        """
+        tf = Counter(tokenize(paragraph))
+        self.doc_freqs.update(tf.keys())
+        self.count += 1
+        self.total_length += sum(tf.values())
+        return tf
+
+    def score(self, tf: Counter, terms: Iterable[str]) -> float:
+        """
+        Scores a paragraph against query terms with the current statistics.
+
+        Args:
+            tf (Counter): Term frequencies of the paragraph, from add.
+            terms (Iterable[str]): Distinct terms of the query.
+
+        Returns:
+            float: The BM25 score.
+        """
+        avg_length = self.total_length / self.count if self.count else 0.0
+        norm = self.k1 * (1 - self.b + self.b * sum(tf.values()) / avg_length) if avg_length else self.k1
+        score = 0.0
+        for term in terms:
+            freq = tf.get(term, 0)
+            if freq:
+                df = self.doc_freqs[term]
+                idf = math.log(1 + (self.count - df + 0.5) / (df + 0.5))
+                score += idf * freq * (self.k1 + 1) / (freq + norm)
+        return score
+
+
+class StreamingTopK:
+    """
+    The k paragraphs of a stream that best match a query so far.
+
+    Whenever a paragraph arrives the selected ones are scored again with the current statistics and the
+    worst is evicted if the new paragraph beats it. An evicted paragraph does not come back, so the
+    selection approximates BM25Index.top_k over the whole document while holding k paragraphs only.
+    """
+
+    def __init__(self, index: StreamingBM25, query: str, k: int):
+        """
+        Initializes an empty selection.
+
+        Args:
+            index (StreamingBM25): Statistics of the stream, shared by the selections of every query.
+            query (str): The query text.
+            k (int): Number of paragraphs to keep, 0 or less keeps every paragraph offered.
+        """
+        self.index = index
+        self.terms = set(tokenize(query))
+        self.k = k
+        self.selected: Dict[int, Counter] = {}
+
+    def __contains__(self, position: int) -> bool:
+        return position in self.selected
+
+    def offer(self, position: int, tf: Counter) -> Tuple[bool, Optional[int]]:
+        """
+        Offers a paragraph to the selection, the paragraph must already be added to the statistics.
+
+        Args:
+            position (int): Position of the paragraph in the stream.
+            tf (Counter): Term frequencies of the paragraph, from StreamingBM25.add.
+
+        Returns:
+            Tuple[bool, Optional[int]]: Whether the paragraph was selected and the position of the paragraph it evicted.
+        """
+        if self.k <= 0 or len(self.selected) < self.k:
+            self.selected[position] = tf
+            return True, None
+        scores = {selected: self.index.score(selected_tf, self.terms) for selected, selected_tf in self.selected.items()}
+        # Ties keep the earlier paragraph like BM25Index.top_k
+        worst = min(scores, key=lambda selected: (scores[selected], -selected))
+        if self.index.score(tf, self.terms) <= scores[worst]:
+            return False, None
+        del self.selected[worst]
+        self.selected[position] = tf
+        return True, worst
+
+    def positions(self) -> List[int]:
+        """
+        Returns the selected paragraphs.
+
+        Returns:
+            List[int]: Positions of the selected paragraphs in stream order.
+        """
+        return sorted(self.selected)
@@ -1,19 +1,154 @@
-# usr/bin/python3
+#!/usr/bin/env python3
+import os
+import sys
+import fitz
+import PDF_Reader_2
+from settings import logger
+from typing import List, Optional
 
-import camelot
+# Pages before this one are the cover letter of the summary and are skipped like in PDF_Reader_2
+FIRST_PAGE = 2
 
-
-# Access individual tables if there are multiple
+# A table of at least two rows and one column is drawn with three horizontal and two vertical rulings,
+# pages with fewer are not searched
+MIN_HORIZONTAL_RULINGS = 3
+MIN_VERTICAL_RULINGS = 2
 
 
 class Table_Reader:
-    def __init__(self):
-        pass
-
-    def tables(self, path, pg_no):
-        tables = camelot.read_pdf(path, pages=pg_no)
-        for i in range(len(tables)):
-            tables.to_csv("table_{}_{}.csv".format(path, pg_no))
-        if len(tables) == 0:
-            return None
+    """
+    Finds the tables of PDF summaries with PyMuPDF.
+
+    Tables are located from the ruling lines drawn on a page, so pages without enough horizontal and
+    vertical strokes are skipped before the table finder runs. The tables of a PDF are cached with the
+    same record format as the text cache when a cache is given.
+    """
+
+    def __init__(self, cache=None):
+        """
+        Initializes the table reader.
+
+        Args:
+            cache (Text_Cache.TextCache): Cache of the tables of each PDF, None to always search.
+        """
+        self.cache = cache
+        self.pages_searched = 0
+        self.pages_skipped = 0
+
+    @staticmethod
+    def has_rulings(page: fitz.Page) -> bool:
+        """
+        Checks whether a page draws enough ruling lines to hold a table.
+
+        Args:
+            page (fitz.Page): The page to check.
+
+        Returns:
+            bool: True if the page can hold a table.
+        """
+        horizontal = 0
+        vertical = 0
+        for drawing in page.get_drawings():
+            for item in drawing["items"]:
+                if item[0] == "l":
+                    horizontal += abs(item[1].y - item[2].y) < 1
+                    vertical += abs(item[1].x - item[2].x) < 1
+                elif item[0] == "re":
+                    # Thin rectangles are strokes, others contribute their borders
+                    rect = item[1]
+                    horizontal += 1 if rect.height <= 2 else 0 if rect.width <= 2 else 2
+                    vertical += 1 if rect.width <= 2 else 0 if rect.height <= 2 else 2
+            if horizontal >= MIN_HORIZONTAL_RULINGS and vertical >= MIN_VERTICAL_RULINGS:
+                return True
+        return False
+
+    def page_tables(self, page: fitz.Page) -> List[List[List[str]]]:
+        """
+        Extracts the tables of a page.
+
+        Args:
+            page (fitz.Page): The page to search.
+
+        Returns:
+            List[List[List[str]]]: The cleaned cells of each row of each table with at least two rows.
+        """
+        if not self.has_rulings(page):
+            self.pages_skipped += 1
+            return []
+        self.pages_searched += 1
+        tables = []
+        for table in page.find_tables().tables:
+            rows = [[PDF_Reader_2.CLEANER(cell).strip() for cell in row] for row in table.extract()]
+            rows = [row for row in rows if any(row)]
+            if len(rows) >= 2:
+                tables.append(rows)
         return tables
+
+    def document_tables(self, path: str) -> List[dict]:
+        """
+        Extracts the tables of a PDF, from the cache when it is unchanged.
+
+        Args:
+            path (str): Path to the PDF file.
+
+        Returns:
+            List[dict]: {"page": page number, "rows": cleaned cells of each row} of every table in reading order.
+        """
+        if self.cache is not None:
+            record = self.cache.get_record(path)
+            if record is not None and "tables" in record:
+                return record["tables"]
+
+        tables = []
+        with fitz.open(path) as document:
+            for page_no in range(FIRST_PAGE, document.page_count):
+                for rows in self.page_tables(document.load_page(page_no)):
+                    tables.append({"page": page_no, "rows": rows})
+        if self.cache is not None:
+            self.cache.put_record(path, {"tables": tables})
+        return tables
+
+    def tables(self, path: str, pg_no: int) -> Optional[List[List[List[str]]]]:
+        """
+        Extracts the tables of one page of a PDF.
+
+        Args:
+            path (str): Path to the PDF file.
+            pg_no (int): The page number.
+
+        Returns:
+            Optional[List[List[List[str]]]]: The rows of each table on the page, None if it has none.
+        """
+        tables = [table["rows"] for table in self.document_tables(path) if table["page"] == pg_no]
+        return tables or None
+
+    @staticmethod
+    def row_lines(rows: List[List[str]]) -> List[str]:
+        """
+        Formats the rows of a table as lines for the question answering model, each cell is prefixed
+        with the header of its column so rows of comparison tables read as statements.
+
+        Args:
+            rows (List[List[str]]): The cleaned cells of each row, the first row being the header.
+
+        Returns:
+            List[str]: One line per row below the header.
+        """
+        header = rows[0]
+        lines = []
+        for row in rows[1:]:
+            cells = [f"{name}: {cell}" if name and name != cell else cell for name, cell in zip(header, row) if cell]
+            if cells:
+                lines.append("; ".join(cells))
+        return lines
+
+
+if __name__ == "__main__":
+    # Print the tables found in the given PDFs
+    reader = Table_Reader()
+    for path in sys.argv[1:]:
+        for table in reader.document_tables(path):
+            print(f"\n{os.path.basename(path)} page {table['page']}")
+            for line in Table_Reader.row_lines(table["rows"]):
+                print(f"  {line}")
+    logger.info(f"Searched {reader.pages_searched} pages, skipped {reader.pages_skipped} without ruling lines")
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from settings import logger
+from typing import List, Optional, Tuple
+
+# Bump when the extracted or cleaned text changes so older records are re-extracted
+FORMAT_VERSION = 4
+
+
+class TextCache:
+    """
+    On disk cache of the text extracted from PDF summaries.
+
+    Every PDF has one gzip compressed JSON record holding the cleaned lines and section headings of
+    each page and the PDF backend that read them, together with the sha256, modification time and size of
+    the file it was extracted from.
+    A record is used when the modification time and size still match, or else when the sha256 of the
+    file does, so touching a file without changing it does not invalidate its text. Other data
+    extracted from PDFs, such as tables, is cached the same way with get_record and put_record in a
+    directory of its own.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Initializes the cache in the given directory.
+
+        Args:
+            directory (str): Directory holding the records, created if missing.
+        """
+        self.directory = directory
+
+    def __record_path(self, path: str) -> str:
+        """
+        Returns the record path of a PDF.
+
+        Args:
+            path (str): Path to the PDF file.
+
+        Returns:
+            str: Path to the .json.gz record, named after the PDF and a hash of its absolute path, so PDFs of
+            the same name in different directories keep records of their own.
+        """
+        name = os.path.splitext(os.path.basename(path))[0]
+        location = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.directory, f"{name}-{location}.json.gz")
+
+    @staticmethod
+    def file_hash(path: str) -> str:
+        """
+        Hashes the content of a file.
+
+        Args:
+            path (str): Path to the file.
+
+        Returns:
+            str: Hex sha256 digest of the file.
+        """
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def get(self, path: str, backend: str = "pymupdf-dict") -> Optional[Tuple[List[List[str]], List[list]]]:
+        """
+        Looks up the text of a PDF.
+
+        Args:
+            path (str): Path to the PDF file.
+            backend (str): PDF backend the text must have been read with.
+
+        Returns:
+            Optional[Tuple[List[List[str]], List[list]]]: Cleaned lines and (line index, level, heading) of the
+            section headings of each page from the first extracted page on, None on a miss.
+        """
+        record = self.get_record(path)
+        if record is None or "pages" not in record or "headings" not in record:
+            return None
+        if record.get("backend", "pymupdf-dict") != backend:
+            return None
+        return record["pages"], record["headings"]
+
+    def put(self, path: str, pages: List[List[str]], headings: List[list], sha256: Optional[str] = None,
+            backend: str = "pymupdf-dict") -> None:
+        """
+        Stores the text of a PDF, replacing the record atomically.
+
+        Args:
+            path (str): Path to the PDF file.
+            pages (List[List[str]]): Cleaned lines of each page from the first extracted page on.
+            headings (List[list]): (line index, level, heading) of the section headings of each page.
+            sha256 (Optional[str]): sha256 of the file if already known.
+            backend (str): PDF backend the text was read with.
+        """
+        self.put_record(path, {"pages": pages, "headings": headings, "backend": backend}, sha256)
+
+    def get_record(self, path: str) -> Optional[dict]:
+        """
+        Looks up the record of a PDF, used directly by caches of other data extracted from PDFs.
+
+        Args:
+            path (str): Path to the PDF file.
+
+        Returns:
+            Optional[dict]: The fields the record was stored with, None on a miss.
+        """
+        record_path = self.__record_path(path)
+        try:
+            if not os.path.exists(record_path):
+                return None
+            with gzip.open(record_path, "rt", encoding="utf-8") as f:
+                record = json.load(f)
+            if record.get("version") != FORMAT_VERSION:
+                return None
+
+            stat = os.stat(path)
+            if record["mtime"] == stat.st_mtime_ns and record["size"] == stat.st_size:
+                return record["data"]
+            if record["sha256"] != self.file_hash(path):
+                return None
+            # Same content with a new timestamp, remember it so the next lookup skips hashing
+            self.put_record(path, record["data"], record["sha256"])
+            return record["data"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Text cache lookup failed for {path}: {e}")
+            return None
+
+    def put_record(self, path: str, fields: dict, sha256: Optional[str] = None) -> None:
+        """
+        Stores a record for a PDF, replacing the previous one atomically.
+
+        Args:
+            path (str): Path to the PDF file.
+            fields (dict): JSON serializable data of the record.
+            sha256 (Optional[str]): sha256 of the file if already known.
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            stat = os.stat(path)
+            record = {
+                "version": FORMAT_VERSION,
+                "sha256": sha256 or self.file_hash(path),
+                "mtime": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "data": fields,
+            }
+            # Written next to the record and renamed so concurrent readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as f:
+                    json.dump(record, f, separators=(",", ":"))
+                os.replace(tmp_path, self.__record_path(path))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logger.warning(f"Text cache update failed for {path}: {e}")
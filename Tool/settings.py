@@ -31,6 +31,32 @@ LLM_MODEL = "wizardlm-13b-v1.2.Q4_0.gguf"
 # LLM_MODEL = "orca-2-13b.Q4_0.gguf" # Not that great
 # LLM_MODEL = "nous-hermes-llama2-13b.Q4_0.gguf" # Bad
 
+# Question Answering inference
+
+QA_BATCH_SIZE = 16  # Model windows per forward pass
+QA_MAX_SEQ_LEN = 384  # Window length in tokens, same default as the transformers pipeline
+QA_DOC_STRIDE = 128  # Overlapping tokens between windows of a long paragraph
+QA_MAX_ANSWER_LEN = 15  # Maximum answer length in tokens
+CHUNKING_ENABLED = True  # Pack PDF lines into chunks filling one model window instead of one paragraph per page
+CHUNK_OVERLAP_TOKENS = 32  # Tokens of trailing lines repeated at the start of the next chunk
+STREAMING_ENABLED = True  # Read the pages of a document on a background thread while Level 1 answers the ones already read
+STREAM_QUEUE_PAGES = 8  # Pages read ahead of Level 1, bounds memory of large documents
+STREAM_BATCH_PAGES = 4  # Pages or chunks read between two runs of the model over the paragraphs newly selected for a question
+QA_BACKEND = "pytorch"  # "pytorch" or "onnx" (ONNX Runtime on CPU, compare with ./QA_Onnx.py)
+QA_ONNX_QUANTIZE = True  # Dynamic int8 quantization of the ONNX export
+ONNX_DIR = "/mnt/Data/Onnx/"
+ONNX_THREADS = 0  # ONNX Runtime intra op threads, 0 lets it decide
+QA_CACHE_ENABLED = True  # Reuse answers of unchanged paragraphs across runs
+QA_CACHE_FILE = "/mnt/Data/QA_cache.sqlite"
+QA_CACHE_MAX_ENTRIES = 500000  # Least recently used answers are evicted beyond this
+BOILERPLATE_ENABLED = True  # Drop template lines shared by many submissions before Level 1
+BOILERPLATE_FILE = "/mnt/Data/Boilerplate.sqlite"
+BOILERPLATE_MIN_DOCUMENTS = 5  # Other submissions that must share a line before it is dropped
+BOILERPLATE_MIN_FRACTION = 0.2  # Fraction of the other indexed submissions that must share a line
+BOILERPLATE_MIN_WORDS = 10  # Shorter lines, such as device classes or standard names, are never dropped
+BOILERPLATE_NUM_PERM = 32  # MinHash permutations per line
+BOILERPLATE_BANDS = 8  # LSH bands, more bands also catch less similar lines
+
 # Main Questions
 
 QUESTION_1 = "What are the algorithms used?"
@@ -39,12 +65,85 @@ QUESTION_3 = "What are machine learning techniques used?"
 QUESTION_4 = "What is the input format to the device?"
 QUESTION_5 = "Does this talk about attacks on AI techniques?"
 
+# Questions whose answers are collected as algorithms in Level 1, QUESTION_4 is asked alongside them
+ALGORITHM_QUESTIONS = [QUESTION_1, QUESTION_2, QUESTION_3]
+
+# Paragraph retrieval before question answering
+
+RETRIEVAL_TOP_K = 8  # Paragraphs per question passed to the model after BM25 ranking, 0 disables retrieval
+# Extra query terms appended to a question when ranking paragraphs
+RETRIEVAL_KEYWORDS = {
+    QUESTION_1: "algorithm model neural network deep learning classifier",
+    QUESTION_2: "technique method processing segmentation detection",
+    QUESTION_3: "machine learning artificial intelligence trained training model",
+    QUESTION_4: "input format image images dicom scan data acquired",
+}
+
+# Section routing before question answering
+
+SECTION_ROUTING_ENABLED = True  # Detect section headings from bold and numbered lines and ask each question only over its sections
+# Words looked up in the section headings for each question, documents without a matching section are analysed in full
+QUESTION_SECTIONS = {
+    QUESTION_1: ["description", "technolog", "principle", "software", "algorithm", "performance", "comparison", "equivalence",
+                 "table"],
+    QUESTION_2: ["description", "technolog", "principle", "software", "algorithm", "performance", "comparison", "equivalence",
+                 "table"],
+    QUESTION_3: ["description", "technolog", "principle", "software", "algorithm", "machine learning", "artificial intelligence",
+                 "training", "performance", "comparison", "equivalence", "table"],
+    QUESTION_4: ["description", "indication", "intended use", "technolog", "principle", "input", "comparison", "equivalence",
+                 "table"],
+}
+
 # URLs
 
 FDA_URL = "https://www.fda.gov/medical-devices/software-medical-device-samd/artificial-intelligence-and-machine-learning-aiml-enabled-medical-devices"
 DOWNLOAD_URL = "https://www.accessdata.fda.gov/cdrh_docs/pdf"
 MEDICAL_FUTURIST_URL = "https://medicalfuturist.com/fda-approved-ai-based-algorithms/"
 
+# Summary downloads of FDA_Scraper.py
+
+DOWNLOAD_CONCURRENCY = 8  # Submissions downloaded at once
+DOWNLOAD_RATE_PER_HOST = 2.0  # Requests per second to the same host, across all downloads, 0 disables the limit
+DOWNLOAD_MANIFEST_ENABLED = True  # Record every download and only fetch summaries that changed on later runs
+DOWNLOAD_MANIFEST_FILE = "/mnt/Data/Download_manifest.sqlite"
+DOWNLOAD_DIRECT_TRIES = 2  # Learned summary URL templates tried before the submission page is scraped, 0 always scrapes
+DOWNLOAD_DIRECT_MIN_RATE = 0.2  # Templates found to hold fewer summaries than this are not tried directly
+DOWNLOAD_HTML_RECHECK_DAYS = 7  # Days before a submission that fell back to its HTML page, when the page sends no validators, or whose existing PDF has no known URL is resolved again
+
+# HTTP session shared by the downloads and link checks, see HTTP_Session.py
+
+HTTP_POOL_CONNECTIONS = 10  # Hosts whose connections are kept
+HTTP_POOL_MAXSIZE = 16  # Connections kept open per host, at least DOWNLOAD_CONCURRENCY so no download opens a throwaway one
+HTTP_KEEP_ALIVE = True  # Reuse connections across requests, False closes each one after its response
+
+# Levels run by Model.py, overridden by --levels. Out of "1", "2alt", "2", "3", "4" and Level 1 is always needed
+
+LEVELS = ["1", "2alt", "2", "3", "4"]
+
+# Parallel execution
+
+WORKERS = 1  # Worker processes for range and file modes, overridden by --workers
+WORKER_TORCH_THREADS = 0  # Torch threads per worker, 0 splits the CPU cores evenly between workers
+EXTRACTION_WORKERS = 4  # Processes extracting PDF text, 1 extracts in the main process
+EXTRACTION_MAX_OPEN_DOCS = 4  # Documents kept open by each extraction process
+EXTRACTION_PAGES_PER_TASK = 8  # Pages extracted at once, smaller spreads single documents over more processes
+# PDF reader of the text extraction, one of "pymupdf-dict", "pymupdf-blocks", "pymupdf-text", "pypdf", "pypdf2".
+# Compare them with ./Benchmark.py backends, only "pymupdf-dict" reads fonts and finds the section headings
+# used by SECTION_ROUTING_ENABLED, although its get_text("dict") is the slowest PyMuPDF mode
+PDF_BACKEND = "pymupdf-dict"
+TEXT_CACHE_ENABLED = True  # Reuse the text of PDFs that did not change since they were last extracted
+TEXT_CACHE_DIR = "/mnt/Data/Text_cache/"
+OCR_ENABLED = True  # Recognize the pages of scanned summaries that have no text layer with Tesseract
+OCR_WORKERS = 2  # Processes running Tesseract, on top of the extraction processes, 1 recognizes in the calling process
+OCR_LANGUAGE = "eng"
+OCR_DPI = 300  # Resolution the scanned pages are rendered at before recognition
+OCR_TESSDATA = "/usr/share/tesseract-ocr/4.00/tessdata"  # Tesseract data directory, None to use TESSDATA_PREFIX
+OCR_MIN_CHARS = 20  # Pages with images and fewer characters of text, such as a stamped page number, are taken as scanned
+OCR_CACHE_ENABLED = True  # Recognize every scanned page only once
+OCR_CACHE_DIR = "/mnt/Data/OCR_cache/"
+TABLES_ENABLED = True  # Add the rows of ruled tables, such as predicate comparisons, to the Level 1 contexts
+TABLE_CACHE_DIR = "/mnt/Data/Table_cache/"  # Tables of unchanged PDFs, used when TEXT_CACHE_ENABLED
+
 # Selenium Config and other Search Config
 
 SELENIUM_URL = "http://browser:4444/wd/hub"
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+from Retriever import BM25Index, Passage, StreamingBM25, StreamingTopK, TABLE_SECTION, route
+
+KEYWORDS = ["description", "technolog", "table"]
+
+
+def test_route_keeps_matching_sections():
+    passages = [Passage("intro\n", ["Cover"]), Passage("device\n", ["Device Description"]), Passage("row\n", [TABLE_SECTION])]
+    assert route(passages, KEYWORDS) == ["device\n", "row\n"]
+
+
+def test_route_without_headings_keeps_text_next_to_a_table():
+    passages = [Passage("text\n", [""]), Passage("predicate\n", ["Predicate Device"]), Passage("row\n", [TABLE_SECTION])]
+    assert route(passages, KEYWORDS) == ["text\n", "predicate\n", "row\n"]
+
+
+def test_route_keeps_contexts_that_are_not_passages():
+    contexts = [Passage("device\n", ["Device Description"]), Passage("other\n", ["Contact"]), "description from another source"]
+    assert route(contexts, KEYWORDS) == ["device\n", "description from another source"]
+
+
+def stream_top_k(paragraphs, query, k):
+    index = StreamingBM25()
+    selection = StreamingTopK(index, query, k)
+    evicted = []
+    for position, paragraph in enumerate(paragraphs):
+        _, worst = selection.offer(position, index.add(paragraph))
+        if worst is not None:
+            evicted.append(worst)
+    return selection.positions(), evicted
+
+
+def test_streaming_top_k_evicts_worse_paragraphs_as_better_ones_arrive():
+    paragraphs = ["cover letter", "contact address", "neural network model", "device uses a neural network", "indications"]
+    positions, evicted = stream_top_k(paragraphs, "neural network", 2)
+    assert positions == BM25Index(paragraphs).top_k("neural network", 2) == [2, 3]
+    assert sorted(evicted) == [0, 1]
+
+
+def test_streaming_top_k_without_k_keeps_every_paragraph():
+    assert stream_top_k(["a b", "c d", "e f"], "neural", 0) == ([0, 1, 2], [])